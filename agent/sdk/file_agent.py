@@ -5,20 +5,43 @@ Extended to support PDFs, images, and CSVs for testing results extraction.
 """
 
 import os
+import sys
+import asyncio
 import base64
 import json
+import logging
+import time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Optional, Dict, Any, List, Tuple
 from agents import Agent, Runner, function_tool, trace
 from dotenv import load_dotenv
 load_dotenv()
 
-# Import OpenAI for vision API
+logger = logging.getLogger("file_agent")
+
+# Shared modules (usage accounting) and the agent/sdk helpers are imported from the repository root
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+from modules.observability.usage import record_usage, track_usage
+from modules.observability.latency import observe_latency
+from modules.observability.agent_trace import AgentRunTracer
+
+# Import the shared pooled OpenAI client for vision API
+OPENAI_AVAILABLE = False
 try:
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    from modules.llm.openai.async_client import get_async_openai_client
+    OPENAI_AVAILABLE = bool(os.getenv("OPENAI_API_KEY"))
 except ImportError:
-    openai_client = None
+    pass
+
+# Vision API settings for multi-page documents
+# Bump VISION_PROMPT_VERSION whenever the extraction prompts change, it is part of the cache key
+VISION_MODEL = "gpt-4o"
+VISION_PROMPT_VERSION = "v1"
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", "4"))
+VISION_PAGE_TIMEOUT_SECONDS = float(os.getenv("VISION_PAGE_TIMEOUT_SECONDS", "120"))
+VISION_PAGE_MAX_RETRIES = int(os.getenv("VISION_PAGE_MAX_RETRIES", "2"))
 
 # Import PDF libraries
 PDF_AVAILABLE = False
@@ -50,6 +73,26 @@ try:
 except ImportError:
     pass
 
+# Persistent cache for Vision API results (same page image -> no second API call)
+vision_cache = None
+if os.getenv("VISION_CACHE_ENABLED", "true").lower() == "true":
+    try:
+        from agent.sdk.vision_cache import VisionCache
+        vision_cache = VisionCache(
+            os.getenv("VISION_CACHE_PATH", str(Path(__file__).parent / ".cache" / "vision_cache.sqlite")),
+            max_bytes=int(os.getenv("VISION_CACHE_MAX_MB", "256")) * 1024 * 1024
+        )
+    except Exception as e:
+        logger.warning(f"Warning: Failed to initialize vision cache: {e}")
+
+# Import Pillow-based image preparation for Vision API payloads
+IMAGE_PREPARATION_AVAILABLE = False
+try:
+    from agent.sdk.image_preparation import prepare_image_file, render_page_for_vision
+    IMAGE_PREPARATION_AVAILABLE = True
+except ImportError:
+    pass
+
 @function_tool
 def read_file(file_path: str) -> str:
     """
@@ -65,8 +108,8 @@ def read_file(file_path: str) -> str:
         FileNotFoundError: If the file doesn't exist
         PermissionError: If the file cannot be read
     """
-    print(f"\n🔧 [TOOL CALL] read_file(file_path='{file_path}')")
-    print(f"   📍 Stage: Reading text file")
+    logger.info(f"🔧 [TOOL CALL] read_file(file_path='{file_path}')")
+    logger.debug(f"📍 Stage: Reading text file")
     try:
         path = Path(file_path)
         if not path.is_absolute():
@@ -74,21 +117,21 @@ def read_file(file_path: str) -> str:
             path = Path.cwd() / path
         
         if not path.exists():
-            print(f"   ❌ Error: File not found")
+            logger.error(f"❌ Error: File not found")
             raise FileNotFoundError(f"File not found: {file_path}")
         
         if not path.is_file():
-            print(f"   ❌ Error: Path is not a file")
+            logger.error(f"❌ Error: Path is not a file")
             raise ValueError(f"Path is not a file: {file_path}")
         
-        print(f"   📂 Reading file: {path}")
+        logger.debug(f"📂 Reading file: {path}")
         with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        print(f"   ✅ Successfully read {len(content)} characters")
+        logger.info(f"✅ Successfully read {len(content)} characters")
         return f"File content from {file_path}:\n\n{content}"
     except Exception as e:
-        print(f"   ❌ Error reading file: {str(e)}")
+        logger.error(f"❌ Error reading file: {str(e)}")
         return f"Error reading file {file_path}: {str(e)}"
 
 
@@ -108,9 +151,9 @@ def write_file(file_path: str, content: str, mode: str = "w") -> str:
     Raises:
         PermissionError: If the file cannot be written
     """
-    print(f"\n🔧 [TOOL CALL] write_file(file_path='{file_path}', mode='{mode}')")
-    print(f"   📍 Stage: Writing to file")
-    print(f"   📝 Content length: {len(content)} characters")
+    logger.info(f"🔧 [TOOL CALL] write_file(file_path='{file_path}', mode='{mode}')")
+    logger.debug(f"📍 Stage: Writing to file")
+    logger.debug(f"📝 Content length: {len(content)} characters")
     try:
         path = Path(file_path)
         if not path.is_absolute():
@@ -121,14 +164,14 @@ def write_file(file_path: str, content: str, mode: str = "w") -> str:
         path.parent.mkdir(parents=True, exist_ok=True)
         
         write_mode = 'a' if mode == 'a' else 'w'
-        print(f"   📂 Writing to: {path} (mode: {write_mode})")
+        logger.debug(f"📂 Writing to: {path} (mode: {write_mode})")
         with open(path, write_mode, encoding='utf-8') as f:
             f.write(content)
         
-        print(f"   ✅ Successfully wrote {len(content)} characters to file")
+        logger.info(f"✅ Successfully wrote {len(content)} characters to file")
         return f"Successfully wrote content to {file_path} (mode: {write_mode})"
     except Exception as e:
-        print(f"   ❌ Error writing file: {str(e)}")
+        logger.error(f"❌ Error writing file: {str(e)}")
         return f"Error writing file {file_path}: {str(e)}"
 
 
@@ -144,32 +187,32 @@ def list_files(directory_path: str = ".", pattern: Optional[str] = None) -> str:
     Returns:
         List of files in the directory
     """
-    print(f"\n🔧 [TOOL CALL] list_files(directory_path='{directory_path}', pattern='{pattern}')")
-    print(f"   📍 Stage: Listing files")
+    logger.info(f"🔧 [TOOL CALL] list_files(directory_path='{directory_path}', pattern='{pattern}')")
+    logger.debug(f"📍 Stage: Listing files")
     try:
         path = Path(directory_path)
         if not path.is_absolute():
             path = Path.cwd() / path
         
         if not path.exists():
-            print(f"   ❌ Error: Directory not found")
+            logger.error(f"❌ Error: Directory not found")
             return f"Directory not found: {directory_path}"
         
         if not path.is_dir():
-            print(f"   ❌ Error: Path is not a directory")
+            logger.error(f"❌ Error: Path is not a directory")
             return f"Path is not a directory: {directory_path}"
         
-        print(f"   📂 Listing files in: {path}")
+        logger.debug(f"📂 Listing files in: {path}")
         if pattern:
             files = list(path.glob(pattern))
-            print(f"   🔍 Filter pattern: {pattern}")
+            logger.debug(f"🔍 Filter pattern: {pattern}")
         else:
             files = list(path.iterdir())
         
         file_list = [str(f.relative_to(Path.cwd())) for f in files if f.is_file()]
         dir_list = [str(f.relative_to(Path.cwd())) + "/" for f in files if f.is_dir()]
         
-        print(f"   ✅ Found {len(file_list)} files and {len(dir_list)} directories")
+        logger.info(f"✅ Found {len(file_list)} files and {len(dir_list)} directories")
         
         result = f"Files in {directory_path}:\n"
         if dir_list:
@@ -179,7 +222,7 @@ def list_files(directory_path: str = ".", pattern: Optional[str] = None) -> str:
         
         return result
     except Exception as e:
-        print(f"   ❌ Error listing directory: {str(e)}")
+        logger.error(f"❌ Error listing directory: {str(e)}")
         return f"Error listing directory {directory_path}: {str(e)}"
 
 
@@ -194,10 +237,10 @@ def read_pdf(file_path: str) -> str:
     Returns:
         The text content extracted from the PDF
     """
-    print(f"\n🔧 [TOOL CALL] read_pdf(file_path='{file_path}')")
-    print(f"   📍 Stage: Reading PDF file")
+    logger.info(f"🔧 [TOOL CALL] read_pdf(file_path='{file_path}')")
+    logger.debug(f"📍 Stage: Reading PDF file")
     if not PDF_AVAILABLE:
-        print(f"   ❌ Error: PDF libraries not available")
+        logger.error(f"❌ Error: PDF libraries not available")
         return "Error: PDF libraries not available. Please install PyPDF2 or pdfplumber."
     
     try:
@@ -206,52 +249,52 @@ def read_pdf(file_path: str) -> str:
             path = Path.cwd() / path
         
         if not path.exists():
-            print(f"   ❌ Error: File not found")
+            logger.error(f"❌ Error: File not found")
             raise FileNotFoundError(f"File not found: {file_path}")
         
         if not path.is_file():
-            print(f"   ❌ Error: Path is not a file")
+            logger.error(f"❌ Error: Path is not a file")
             raise ValueError(f"Path is not a file: {file_path}")
         
-        print(f"   📂 Reading PDF: {path}")
-        print(f"   📚 Using library: {PDF_LIBRARY}")
+        logger.debug(f"📂 Reading PDF: {path}")
+        logger.debug(f"📚 Using library: {PDF_LIBRARY}")
         text_content = []
         
         if PDF_LIBRARY == 'pdfplumber':
             import pdfplumber
             with pdfplumber.open(str(path)) as pdf:
                 total_pages = len(pdf.pages)
-                print(f"   📄 Processing {total_pages} pages...")
+                logger.debug(f"📄 Processing {total_pages} pages...")
                 for page_num, page in enumerate(pdf.pages, 1):
                     text = page.extract_text()
                     if text:
                         text_content.append(text)
-                        print(f"   📄 Page {page_num}/{total_pages}: Extracted {len(text)} characters")
+                        logger.debug(f"📄 Page {page_num}/{total_pages}: Extracted {len(text)} characters")
         elif PDF_LIBRARY == 'pypdf2':
             # Use PyPDF2
             with open(path, 'rb') as f:
                 pdf_reader = PyPDF2.PdfReader(f)
                 total_pages = len(pdf_reader.pages)
-                print(f"   📄 Processing {total_pages} pages...")
+                logger.debug(f"📄 Processing {total_pages} pages...")
                 for page_num, page in enumerate(pdf_reader.pages, 1):
                     text = page.extract_text()
                     if text:
                         text_content.append(text)
-                        print(f"   📄 Page {page_num}/{total_pages}: Extracted {len(text)} characters")
+                        logger.debug(f"📄 Page {page_num}/{total_pages}: Extracted {len(text)} characters")
         else:
-            print(f"   ❌ Error: No PDF library available")
+            logger.error(f"❌ Error: No PDF library available")
             return "Error: No PDF library available. Please install PyPDF2 or pdfplumber."
         
         content = "\n\n".join(text_content)
-        print(f"   ✅ Successfully extracted {len(content)} characters from {len(text_content)} pages")
+        logger.info(f"✅ Successfully extracted {len(content)} characters from {len(text_content)} pages")
         return f"PDF content from {file_path}:\n\n{content}"
     except Exception as e:
-        print(f"   ❌ Error reading PDF: {str(e)}")
+        logger.error(f"❌ Error reading PDF: {str(e)}")
         return f"Error reading PDF {file_path}: {str(e)}"
 
 
 @function_tool
-def read_image(file_path: str) -> str:
+async def read_image(file_path: str) -> str:
     """
     Read text content from an image file using OpenAI Vision API.
     Supports common image formats: PNG, JPEG, JPG, GIF, WEBP
@@ -262,10 +305,10 @@ def read_image(file_path: str) -> str:
     Returns:
         The text content extracted from the image
     """
-    print(f"\n🔧 [TOOL CALL] read_image(file_path='{file_path}')")
-    print(f"   📍 Stage: Reading image file with Vision API")
-    if not openai_client:
-        print(f"   ❌ Error: OpenAI client not available")
+    logger.info(f"🔧 [TOOL CALL] read_image(file_path='{file_path}')")
+    logger.debug(f"📍 Stage: Reading image file with Vision API")
+    if not OPENAI_AVAILABLE:
+        logger.error(f"❌ Error: OpenAI client not available")
         return "Error: OpenAI client not available. Please set OPENAI_API_KEY environment variable."
     
     try:
@@ -274,20 +317,19 @@ def read_image(file_path: str) -> str:
             path = Path.cwd() / path
         
         if not path.exists():
-            print(f"   ❌ Error: File not found")
+            logger.error(f"❌ Error: File not found")
             raise FileNotFoundError(f"File not found: {file_path}")
         
         if not path.is_file():
-            print(f"   ❌ Error: Path is not a file")
+            logger.error(f"❌ Error: Path is not a file")
             raise ValueError(f"Path is not a file: {file_path}")
         
         # Read image and encode to base64
-        print(f"   📂 Reading image: {path}")
+        logger.debug(f"📂 Reading image: {path}")
         with open(path, 'rb') as image_file:
             image_data = image_file.read()
             image_size = len(image_data)
-            print(f"   📷 Image size: {image_size / 1024:.2f} KB")
-            base64_image = base64.b64encode(image_data).decode('utf-8')
+            logger.debug(f"📷 Image size: {image_size / 1024:.2f} KB")
         
         # Determine MIME type from extension
         ext = path.suffix.lower()
@@ -299,12 +341,32 @@ def read_image(file_path: str) -> str:
             '.webp': 'image/webp'
         }
         mime_type = mime_types.get(ext, 'image/png')
-        print(f"   🖼️  Image type: {mime_type}")
+        
+        # Shrink the payload (grayscale, cropped, downscaled, compressed)
+        if IMAGE_PREPARATION_AVAILABLE:
+            try:
+                image_data, mime_type = await asyncio.to_thread(prepare_image_file, path)
+                logger.debug(f"🗜️  Prepared image size: {len(image_data) / 1024:.2f} KB")
+            except Exception as e:
+                logger.warning(f"⚠️  Image preparation failed, sending original image: {str(e)}")
+        logger.debug(f"🖼️  Image type: {mime_type}")
+        
+        # Check the cache before paying for a Vision API call
+        cache_key = None
+        if vision_cache:
+            cache_key = VisionCache.make_key(image_data, VISION_MODEL, VISION_PROMPT_VERSION)
+            cached_content = await asyncio.to_thread(vision_cache.get, cache_key)
+            if cached_content is not None:
+                logger.debug(f"♻️  Vision cache hit, skipping Vision API call")
+                return f"Image content from {file_path}:\n\n{cached_content}"
+        
+        base64_image = base64.b64encode(image_data).decode('utf-8')
         
         # Use OpenAI Vision API
-        print(f"   🤖 Calling OpenAI Vision API (gpt-4o)...")
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
+        logger.debug(f"🤖 Calling OpenAI Vision API ({VISION_MODEL})...")
+        started = time.perf_counter()
+        response = await get_async_openai_client().chat.completions.create(
+            model=VISION_MODEL,
             messages=[
                 {
                     "role": "user",
@@ -324,20 +386,190 @@ def read_image(file_path: str) -> str:
             ],
             max_tokens=4000
         )
+        record_usage("vision_image", VISION_MODEL, response.usage, time.perf_counter() - started)
+        observe_latency("vision_image", time.perf_counter() - started)
         
         content = response.choices[0].message.content
-        print(f"   ✅ Successfully extracted {len(content)} characters from image")
+        if vision_cache and content:
+            await asyncio.to_thread(vision_cache.put, cache_key, content)
+        logger.info(f"✅ Successfully extracted {len(content)} characters from image")
         return f"Image content from {file_path}:\n\n{content}"
     except Exception as e:
-        print(f"   ❌ Error reading image: {str(e)}")
+        logger.error(f"❌ Error reading image: {str(e)}")
         return f"Error reading image {file_path}: {str(e)}"
 
 
+def count_pdf_pages(path: Path) -> int:
+    """Return the number of pages of a PDF."""
+    import fitz
+    with fitz.open(str(path)) as doc:
+        return len(doc)
+
+
+def _render_pdf_pages(path: Path, first_page: int = 0, last_page: Optional[int] = None) -> list:
+    """
+    Render pages of a PDF to images for the Vision API.
+    
+    Args:
+        path: Path to the PDF file
+        first_page: Zero-based index of the first page to render
+        last_page: Zero-based index after the last page to render (default: end of document)
+    
+    Returns:
+        List of (image bytes, MIME type) tuples, in page order
+    """
+    import fitz
+    doc = fitz.open(str(path))
+    try:
+        page_images = []
+        for page_num in range(first_page, min(last_page or len(doc), len(doc))):
+            page = doc[page_num]
+            render_started = time.perf_counter()
+            if IMAGE_PREPARATION_AVAILABLE:
+                # Resolution picked from text density, grayscale, cropped and compressed
+                img_data, mime_type = render_page_for_vision(page)
+            else:
+                # Convert page to image (PNG)
+                # Use zoom factor of 2.0 for better quality
+                mat = fitz.Matrix(2.0, 2.0)
+                img_data, mime_type = page.get_pixmap(matrix=mat).tobytes("png"), "image/png"
+            observe_latency("pdf_render_page", time.perf_counter() - render_started)
+            logger.debug(f"📷 Page {page_num + 1} image size: {len(img_data) / 1024:.2f} KB ({mime_type})")
+            page_images.append((img_data, mime_type))
+        return page_images
+    finally:
+        doc.close()
+
+
+async def _extract_page_with_vision(
+    image_data: bytes,
+    mime_type: str,
+    page_num: int,
+    total_pages: int,
+    semaphore: asyncio.Semaphore
+) -> str:
+    """
+    Extract the content of a single rendered PDF page with the Vision API.
+    The vision cache is checked first. Each attempt is bounded by VISION_PAGE_TIMEOUT_SECONDS and retried up to
+    VISION_PAGE_MAX_RETRIES times with exponential backoff. These are the only retries (the client's own are
+    off for these calls), and the semaphore is only held during an attempt, not during the backoff.
+    
+    Args:
+        image_data: The rendered page image
+        mime_type: MIME type of the page image
+        page_num: Zero-based page index
+        total_pages: Number of pages in the document
+        semaphore: Semaphore bounding the number of concurrent Vision API calls
+    
+    Returns:
+        The text content extracted from the page
+    """
+    cache_key = None
+    if vision_cache:
+        cache_key = VisionCache.make_key(image_data, VISION_MODEL, VISION_PROMPT_VERSION)
+        cached_content = await asyncio.to_thread(vision_cache.get, cache_key)
+        if cached_content is not None:
+            logger.debug(f"♻️  Page {page_num + 1}: Vision cache hit")
+            return cached_content
+    
+    base64_image = base64.b64encode(image_data).decode('utf-8')
+    client = get_async_openai_client().with_options(max_retries=0)
+    for attempt in range(VISION_PAGE_MAX_RETRIES + 1):
+        try:
+            logger.debug(f"🤖 Calling OpenAI Vision API for page {page_num + 1} (attempt {attempt + 1})...")
+            started = time.perf_counter()
+            async with semaphore:
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=VISION_MODEL,
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": [
+                                    {
+                                        "type": "text",
+                                        "text": f"Extract all text and structured data from this image (page {page_num + 1} of {total_pages}). If this is a medical testing results document, identify all test results with their values, units, and reference ranges. Return the content in a clear, structured format."
+                                    },
+                                    {
+                                        "type": "image_url",
+                                        "image_url": {
+                                            "url": f"data:{mime_type};base64,{base64_image}"
+                                        }
+                                    }
+                                ]
+                            }
+                        ],
+                        max_tokens=4000
+                    ),
+                    timeout=VISION_PAGE_TIMEOUT_SECONDS
+                )
+            record_usage("vision_page", VISION_MODEL, response.usage, time.perf_counter() - started)
+            observe_latency("vision_page", time.perf_counter() - started)
+            page_content = response.choices[0].message.content or ""
+            if vision_cache and page_content:
+                await asyncio.to_thread(vision_cache.put, cache_key, page_content)
+            logger.debug(f"✅ Page {page_num + 1}: Extracted {len(page_content)} characters")
+            return page_content
+        except Exception as e:
+            error = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            if attempt >= VISION_PAGE_MAX_RETRIES:
+                logger.error(f"❌ Page {page_num + 1}: Giving up after {attempt + 1} attempt(s): {error}")
+                raise
+            backoff = 2 ** attempt
+            logger.warning(f"⚠️  Page {page_num + 1}: Attempt {attempt + 1} failed ({error}), retrying in {backoff}s")
+            await asyncio.sleep(backoff)
+
+
+async def extract_pdf_pages_with_vision(
+    path: Path,
+    first_page: int = 0,
+    last_page: Optional[int] = None,
+    total_pages: Optional[int] = None
+) -> Tuple[List[str], List[int]]:
+    """
+    Render a range of PDF pages and extract their content with the Vision API concurrently.
+    A page that fails is marked in its content instead of failing the whole range.
+    
+    Args:
+        path: Path to the PDF file
+        first_page: Zero-based index of the first page
+        last_page: Zero-based index after the last page (default: end of document)
+        total_pages: Number of pages in the document, used in the prompt
+    
+    Returns:
+        Tuple of (content of each page with a "--- Page N ---" header, failed page numbers)
+    """
+    # Render pages off the event loop, then fan out the Vision API calls
+    page_images = await asyncio.to_thread(_render_pdf_pages, path, first_page, last_page)
+    total_pages = total_pages or first_page + len(page_images)
+    
+    semaphore = asyncio.Semaphore(VISION_MAX_CONCURRENCY)
+    page_results = await asyncio.gather(
+        *[
+            _extract_page_with_vision(image_data, mime_type, page_num, total_pages, semaphore)
+            for page_num, (image_data, mime_type) in enumerate(page_images, first_page)
+        ],
+        return_exceptions=True
+    )
+    
+    # gather keeps the input order, so pages are reassembled in page order
+    all_content = []
+    failed_pages = []
+    for page_num, page_result in enumerate(page_results, first_page):
+        if isinstance(page_result, BaseException):
+            failed_pages.append(page_num + 1)
+            all_content.append(f"--- Page {page_num + 1} ---\n[Extraction failed: {page_result}]")
+        else:
+            all_content.append(f"--- Page {page_num + 1} ---\n{page_result}")
+    return all_content, failed_pages
+
+
 @function_tool
-def read_pdf_with_vision(file_path: str) -> str:
+async def read_pdf_with_vision(file_path: str) -> str:
     """
     Read PDF file by converting pages to images and using OpenAI Vision API.
     This is better for scanned/image-based PDFs that don't have extractable text.
+    Pages are sent to the Vision API concurrently and reassembled in page order.
     
     Args:
         file_path: Path to the PDF file to read (can be relative or absolute)
@@ -345,15 +577,15 @@ def read_pdf_with_vision(file_path: str) -> str:
     Returns:
         The text content extracted from the PDF using Vision API
     """
-    print(f"\n🔧 [TOOL CALL] read_pdf_with_vision(file_path='{file_path}')")
-    print(f"   📍 Stage: Reading PDF with Vision API (converting pages to images)")
+    logger.info(f"🔧 [TOOL CALL] read_pdf_with_vision(file_path='{file_path}')")
+    logger.debug(f"📍 Stage: Reading PDF with Vision API (converting pages to images)")
     
-    if not openai_client:
-        print(f"   ❌ Error: OpenAI client not available")
+    if not OPENAI_AVAILABLE:
+        logger.error(f"❌ Error: OpenAI client not available")
         return "Error: OpenAI client not available. Please set OPENAI_API_KEY environment variable."
     
     if not PDF_TO_IMAGE_AVAILABLE:
-        print(f"   ❌ Error: PyMuPDF not available for PDF-to-image conversion")
+        logger.error(f"❌ Error: PyMuPDF not available for PDF-to-image conversion")
         return "Error: PyMuPDF (fitz) not available. Please install PyMuPDF: pip install PyMuPDF"
     
     try:
@@ -362,76 +594,34 @@ def read_pdf_with_vision(file_path: str) -> str:
             path = Path.cwd() / path
         
         if not path.exists():
-            print(f"   ❌ Error: File not found")
+            logger.error(f"❌ Error: File not found")
             raise FileNotFoundError(f"File not found: {file_path}")
         
         if not path.is_file():
-            print(f"   ❌ Error: Path is not a file")
+            logger.error(f"❌ Error: Path is not a file")
             raise ValueError(f"Path is not a file: {file_path}")
         
-        print(f"   📂 Reading PDF: {path}")
-        
-        # Open PDF and convert pages to images
-        import fitz
-        doc = fitz.open(str(path))
-        total_pages = len(doc)
-        print(f"   📄 PDF has {total_pages} page(s)")
+        logger.debug(f"📂 Reading PDF: {path}")
         
-        all_content = []
+        total_pages = await asyncio.to_thread(count_pdf_pages, path)
+        logger.debug(f"📄 PDF has {total_pages} page(s), processing up to {VISION_MAX_CONCURRENCY} concurrently")
         
-        for page_num in range(total_pages):
-            print(f"   📄 Processing page {page_num + 1}/{total_pages}...")
-            page = doc[page_num]
-            
-            # Convert page to image (PNG)
-            # Use zoom factor of 2.0 for better quality
-            mat = fitz.Matrix(2.0, 2.0)
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            
-            # Encode to base64
-            base64_image = base64.b64encode(img_data).decode('utf-8')
-            image_size = len(img_data)
-            print(f"   📷 Page {page_num + 1} image size: {image_size / 1024:.2f} KB")
-            
-            # Use OpenAI Vision API
-            print(f"   🤖 Calling OpenAI Vision API for page {page_num + 1}...")
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": f"Extract all text and structured data from this image (page {page_num + 1} of {total_pages}). If this is a medical testing results document, identify all test results with their values, units, and reference ranges. Return the content in a clear, structured format."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=4000
-            )
-            
-            page_content = response.choices[0].message.content
-            all_content.append(f"--- Page {page_num + 1} ---\n{page_content}")
-            print(f"   ✅ Page {page_num + 1}: Extracted {len(page_content)} characters")
+        all_content, failed_pages = await extract_pdf_pages_with_vision(path, total_pages=total_pages)
         
-        doc.close()
+        if failed_pages and len(failed_pages) == total_pages:
+            raise RuntimeError(f"Vision API failed for all {total_pages} page(s)")
+        if failed_pages:
+            logger.warning(f"⚠️  Failed page(s): {failed_pages}")
         
         combined_content = "\n\n".join(all_content)
-        print(f"   ✅ Successfully extracted {len(combined_content)} characters from {total_pages} page(s)")
+        logger.info(f"✅ Successfully extracted {len(combined_content)} characters from {total_pages - len(failed_pages)}/{total_pages} page(s)")
+        if vision_cache:
+            cache_stats = vision_cache.stats()
+            logger.debug(f"♻️  Vision cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es)")
         return f"PDF content from {file_path} (extracted with Vision API):\n\n{combined_content}"
         
     except Exception as e:
-        print(f"   ❌ Error reading PDF with Vision API: {str(e)}")
-        import traceback
-        print(f"   Traceback:\n{traceback.format_exc()}")
+        logger.exception(f"❌ Error reading PDF with Vision API: {str(e)}")
         return f"Error reading PDF {file_path} with Vision API: {str(e)}"
 
 
@@ -446,10 +636,10 @@ def read_csv(file_path: str) -> str:
     Returns:
         The content of the CSV file as formatted text
     """
-    print(f"\n🔧 [TOOL CALL] read_csv(file_path='{file_path}')")
-    print(f"   📍 Stage: Reading CSV file")
+    logger.info(f"🔧 [TOOL CALL] read_csv(file_path='{file_path}')")
+    logger.debug(f"📍 Stage: Reading CSV file")
     if not PANDAS_AVAILABLE:
-        print(f"   ⚠️  Pandas not available, falling back to read_file")
+        logger.warning(f"⚠️  Pandas not available, falling back to read_file")
         # Fallback to regular file reading
         return read_file(file_path)
     
@@ -459,25 +649,25 @@ def read_csv(file_path: str) -> str:
             path = Path.cwd() / path
         
         if not path.exists():
-            print(f"   ❌ Error: File not found")
+            logger.error(f"❌ Error: File not found")
             raise FileNotFoundError(f"File not found: {file_path}")
         
         if not path.is_file():
-            print(f"   ❌ Error: Path is not a file")
+            logger.error(f"❌ Error: Path is not a file")
             raise ValueError(f"Path is not a file: {file_path}")
         
         # Read CSV with pandas
-        print(f"   📂 Reading CSV: {path}")
+        logger.debug(f"📂 Reading CSV: {path}")
         df = pd.read_csv(path)
-        print(f"   📊 CSV dimensions: {len(df)} rows × {len(df.columns)} columns")
-        print(f"   📋 Columns: {', '.join(df.columns.tolist())}")
+        logger.debug(f"📊 CSV dimensions: {len(df)} rows × {len(df.columns)} columns")
+        logger.debug(f"📋 Columns: {', '.join(df.columns.tolist())}")
         
         # Convert to string representation
         content = df.to_string(index=False)
-        print(f"   ✅ Successfully read CSV with {len(df)} rows")
+        logger.info(f"✅ Successfully read CSV with {len(df)} rows")
         return f"CSV content from {file_path}:\n\n{content}\n\nColumns: {', '.join(df.columns.tolist())}"
     except Exception as e:
-        print(f"   ❌ Error reading CSV: {str(e)}")
+        logger.error(f"❌ Error reading CSV: {str(e)}")
         return f"Error reading CSV {file_path}: {str(e)}"
 
 
@@ -513,6 +703,30 @@ For testing results extraction, use the appropriate tool based on file type:
 )
 
 
+def record_agent_usage(result, agent: Agent, started: float, stage: str = "agent") -> Dict[str, Any]:
+    """
+    Record the token usage of a finished agent run (all of its model calls).
+    The wall time includes tool execution, e.g. Vision API calls, which are recorded separately.
+    
+    Args:
+        result: The run result returned by Runner.run, Runner.run_sync or Runner.run_streamed
+        agent: The agent that was run
+        started: time.perf_counter() value at the start of the run
+        stage: Pipeline stage the run belongs to
+    
+    Returns:
+        The recorded entry
+    """
+    usage = result.context_wrapper.usage
+    return record_usage(
+        stage,
+        str(agent.model or "default"),
+        usage,
+        time.perf_counter() - started,
+        calls=getattr(usage, "requests", 1) or 1
+    )
+
+
 def run_agent_sync(input_text: str) -> str:
     """
     Run the agent synchronously with the given input.
@@ -524,15 +738,12 @@ def run_agent_sync(input_text: str) -> str:
     Returns:
         The final output from the agent
     """
-    print("\n" + "=" * 80)
-    print("🔍 AGENT RUN STARTED")
-    print("=" * 80)
     with trace("File Agent Workflow") as current_trace:
-        print(f"📊 Trace ID: {current_trace.trace_id}")
+        logger.info("🔍 Agent run started", extra={"trace_id": current_trace.trace_id})
+        started = time.perf_counter()
         result = Runner.run_sync(file_agent, input_text)
-    print("=" * 80)
-    print("✅ AGENT RUN COMPLETED")
-    print("=" * 80 + "\n")
+        record_agent_usage(result, file_agent, started)
+    logger.info("✅ Agent run completed", extra={"trace_id": current_trace.trace_id})
     return result.final_output
 
 
@@ -547,170 +758,152 @@ async def run_agent_async(input_text: str) -> str:
     Returns:
         The final output from the agent
     """
-    print("\n" + "=" * 80)
-    print("🔍 AGENT RUN STARTED")
-    print("=" * 80)
     with trace("File Agent Workflow") as current_trace:
-        print(f"📊 Trace ID: {current_trace.trace_id}")
+        logger.info("🔍 Agent run started", extra={"trace_id": current_trace.trace_id})
+        started = time.perf_counter()
         result = await Runner.run(file_agent, input_text)
-    print("=" * 80)
-    print("✅ AGENT RUN COMPLETED")
-    print("=" * 80 + "\n")
+        record_agent_usage(result, file_agent, started)
+    logger.info("✅ Agent run completed", extra={"trace_id": current_trace.trace_id})
     return result.final_output
 
 
-async def run_agent_async_with_trace(input_text: str) -> Dict[str, Any]:
+def build_trace_info(result, tracer: AgentRunTracer, current_trace=None) -> Dict[str, Any]:
     """
-    Run the agent asynchronously and return result with trace information.
-    Uses native tracing system for logging and extracts trace info for API response.
+    Build trace information (tool calls and model turns with timings, usage summary)
+    of a finished agent run from the tracer that followed its stream events.
+    Individual tool calls are only logged at DEBUG level.
     
     Args:
-        input_text: The instruction or question for the agent
+        result: The run result returned by Runner.run_streamed
+        tracer: The tracer all stream events of the run were fed to
+        current_trace: The active trace, used to attach the trace ID
     
     Returns:
         Dictionary containing final_output and trace information
     """
     trace_info = {
-        "final_output": "",
-        "tool_calls": [],
-        "tool_usage_summary": {},
-        "messages_count": 0
+        "final_output": result.final_output,
+        "messages_count": len(result.to_input_list()),
+        **tracer.summary(),
     }
+    if current_trace:
+        trace_info["trace_id"] = current_trace.trace_id
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        for call in trace_info["tool_calls"]:
+            args_str = json.dumps(call["arguments"], default=str)
+            if len(args_str) > 300:
+                args_str = args_str[:300] + "... (truncated)"
+            logger.debug(
+                f"🔧 Tool Call: {call['tool_name']} ({call['duration_seconds']}s)",
+                extra={"arguments": args_str, "result_preview": (call["result"] or "")[:200]}
+            )
+    return trace_info
+
+
+def print_trace_statistics(trace_info: Dict[str, Any]):
+    """
+    Log the final summary statistics of an agent run as a single record.
     
-    print("\n" + "=" * 80)
-    print("🔍 AGENT RUN WITH TRACE STARTED")
-    print("=" * 80)
+    Args:
+        trace_info: Trace information as returned by build_trace_info
+    """
+    logger.info(
+        f"📊 Agent run finished: {trace_info.get('messages_count', 0)} messages, "
+        f"{len(trace_info.get('tool_calls', []))} tool calls, "
+        f"{len(trace_info.get('model_turns', []))} model turns",
+        extra={
+            "messages_count": trace_info.get("messages_count", 0),
+            "tool_calls": len(trace_info.get("tool_calls", [])),
+            "tool_usage_summary": trace_info.get("tool_usage_summary", {}),
+            "timing": trace_info.get("timing"),
+            "trace_id": trace_info.get("trace_id"),
+            "usage": trace_info.get("usage", {}).get("totals"),
+        }
+    )
+
+
+async def run_agent_async_with_trace(input_text: str) -> Dict[str, Any]:
+    """
+    Run the agent asynchronously and return result with trace information.
+    Uses native tracing system for logging and extracts trace info for API response.
     
+    Args:
+        input_text: The instruction or question for the agent
+    
+    Returns:
+        Dictionary containing final_output and trace information
+    """
     try:
-        with trace("File Agent Workflow") as current_trace:
-            print(f"📊 Trace ID: {current_trace.trace_id}")
-            print(f"📝 Input: {input_text[:200]}..." if len(input_text) > 200 else f"📝 Input: {input_text}")
-            print()
-            
-            result = await Runner.run(file_agent, input_text)
-            trace_info["final_output"] = result.final_output
+        # Reuses the tracker of the calling request, if there is one
+        with track_usage("file_agent") as usage_tracker, trace("File Agent Workflow") as current_trace:
+            logger.info(
+                "🔍 Agent run with trace started",
+                extra={"trace_id": current_trace.trace_id, "input_chars": len(input_text)}
+            )
+            logger.debug(f"📝 Input: {input_text[:200]}")
             
-            # Extract trace information from conversation history and log in real-time
-            if hasattr(result, 'to_input_list'):
-                try:
-                    input_list = result.to_input_list()
-                    trace_info["messages_count"] = len(input_list)
-                    
-                    print(f"📨 Processing {len(input_list)} messages from conversation...")
-                    print()
-                    
-                    # Extract tool calls from conversation history and log them
-                    for idx, item in enumerate(input_list, 1):
-                        if isinstance(item, dict):
-                            role = item.get('role', 'unknown')
-                            
-                            # Log tool calls as they appear
-                            if role == 'assistant':
-                                tool_calls = item.get('tool_calls', [])
-                                if tool_calls:
-                                    for tool_call in tool_calls:
-                                        tool_call_info = {
-                                            "tool_name": None,
-                                            "arguments": None,
-                                            "result": None
-                                        }
-                                        
-                                        if isinstance(tool_call, dict) and 'function' in tool_call:
-                                            func = tool_call['function']
-                                            tool_name = func.get('name', 'unknown')
-                                            tool_call_info["tool_name"] = tool_name
-                                            
-                                            args = func.get('arguments', '')
-                                            if isinstance(args, str):
-                                                try:
-                                                    parsed_args = json.loads(args)
-                                                    tool_call_info["arguments"] = parsed_args
-                                                except:
-                                                    tool_call_info["arguments"] = args
-                                            else:
-                                                tool_call_info["arguments"] = args
-                                            
-                                            tool_call_info["id"] = tool_call.get('id')
-                                            trace_info["tool_calls"].append(tool_call_info)
-                                            
-                                            # Log tool call in real-time
-                                            print(f"🔧 [{idx}] Tool Call: {tool_name}")
-                                            if tool_call_info["arguments"]:
-                                                args_str = json.dumps(tool_call_info["arguments"], indent=2)
-                                                if len(args_str) > 300:
-                                                    args_str = args_str[:300] + "... (truncated)"
-                                                print(f"   Arguments: {args_str}")
-                                            
-                            # Log tool results as they appear
-                            elif role == 'tool':
-                                tool_result_id = item.get('tool_call_id')
-                                tool_result_content = item.get('content', '')
-                                tool_name = item.get('name', 'unknown')
-                                
-                                # Match tool result with tool call
-                                for tc in trace_info["tool_calls"]:
-                                    if tc.get("id") == tool_result_id:
-                                        tc["result"] = tool_result_content[:500] if tool_result_content else None
-                                        
-                                        # Log tool result
-                                        print(f"✅ [{idx}] Tool Result: {tool_name}")
-                                        if tool_result_content:
-                                            result_preview = tool_result_content[:200] + "..." if len(tool_result_content) > 200 else tool_result_content
-                                            print(f"   Result Preview: {result_preview}")
-                                        break
-                    
-                    # Create tool usage summary
-                    if trace_info["tool_calls"]:
-                        tool_usage_summary = {}
-                        for tc in trace_info["tool_calls"]:
-                            tool_name = tc.get("tool_name", "unknown")
-                            tool_usage_summary[tool_name] = tool_usage_summary.get(tool_name, 0) + 1
-                        trace_info["tool_usage_summary"] = tool_usage_summary
-                    
-                    # Store trace ID for reference
-                    if current_trace:
-                        trace_info["trace_id"] = current_trace.trace_id
-                        
-                except Exception as e:
-                    print(f"⚠️  Error extracting trace information: {str(e)}")
-                    trace_info["trace_extraction_error"] = str(e)
-            else:
-                print("⚠️  Result object does not have 'to_input_list' method")
+            started = time.perf_counter()
+            # Streamed, so model turns and tool calls are timed while the run is in progress
+            tracer = AgentRunTracer()
+            result = Runner.run_streamed(file_agent, input_text, hooks=tracer.hooks)
+            async for event in result.stream_events():
+                tracer.on_event(event)
+            record_agent_usage(result, file_agent, started)
+            trace_info = build_trace_info(result, tracer, current_trace)
+            trace_info["usage"] = usage_tracker.summary()
     
     except Exception as e:
-        print(f"\n❌ ERROR during agent execution: {str(e)}")
-        print(f"   Error type: {type(e).__name__}")
-        import traceback
-        print(f"   Traceback:\n{traceback.format_exc()}")
+        logger.exception(f"❌ ERROR during agent execution: {type(e).__name__}: {str(e)}")
         raise  # Re-raise to let API handle it
     
-    # Log final summary statistics
-    print()
-    print("=" * 80)
-    print("📊 FINAL STATISTICS")
-    print("=" * 80)
-    print(f"📨 Total Messages: {trace_info.get('messages_count', 0)}")
-    print(f"🔧 Total Tool Calls: {len(trace_info.get('tool_calls', []))}")
-    
-    if trace_info.get("tool_usage_summary"):
-        print(f"\n📋 Tool Usage Summary:")
-        for tool_name, count in trace_info["tool_usage_summary"].items():
-            print(f"   - {tool_name}: {count} time(s)")
-    
-    if trace_info.get("trace_id"):
-        print(f"\n📊 Trace ID: {trace_info['trace_id']}")
-        print(f"   View full trace at: https://platform.openai.com/traces")
-    
-    print("=" * 80)
-    print("✅ AGENT RUN WITH TRACE COMPLETED")
-    print("=" * 80 + "\n")
-    
+    print_trace_statistics(trace_info)
     return trace_info
 
 
+async def stream_agent_events(input_text: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the agent streamed and yield its progress events as they happen:
+    run_started, tool_call_started, tool_call_finished (with its wall time),
+    model_turn_finished, agent_updated and answer_delta (answer tokens), followed
+    by one done event with the final output, timings and token usage, or an error event.
+    
+    Args:
+        input_text: The instruction or question for the agent
+    """
+    try:
+        # Reuses the tracker of the calling request, if there is one
+        with track_usage("file_agent") as usage_tracker, trace("File Agent Workflow") as current_trace:
+            logger.info("🔍 Streamed agent run started", extra={"trace_id": current_trace.trace_id})
+            yield {"type": "run_started", "trace_id": current_trace.trace_id}
+
+            started = time.perf_counter()
+            tracer = AgentRunTracer()
+            result = Runner.run_streamed(file_agent, input_text, hooks=tracer.hooks)
+            async for event in result.stream_events():
+                progress = tracer.on_event(event)
+                if progress is not None:
+                    yield progress
+
+            record_agent_usage(result, file_agent, started)
+            usage = usage_tracker.summary()
+        logger.info("✅ Streamed agent run completed", extra={"trace_id": current_trace.trace_id})
+        yield {
+            "type": "done",
+            "result": str(result.final_output),
+            "trace_id": current_trace.trace_id,
+            "timing": tracer.summary()["timing"],
+            "usage": usage,
+        }
+    except Exception as e:
+        logger.exception(f"❌ ERROR during streamed agent execution: {type(e).__name__}: {str(e)}")
+        yield {"type": "error", "error": str(e)}
+
+
 if __name__ == "__main__":
     # Example usage
     import sys
+    logging.basicConfig(level=logging.INFO)
     
     if len(sys.argv) > 1:
         instruction = " ".join(sys.argv[1:])
@@ -0,0 +1,152 @@
+"""
+Image preparation for Vision API calls.
+Turns PDF pages and uploaded images into small grayscale JPEG/WebP payloads:
+margins are cropped, the resolution is chosen from the page's text density and
+nothing larger than what the Vision API actually looks at is sent.
+"""
+
+import io
+import os
+from typing import Tuple
+
+from PIL import Image, ImageOps
+
+# The Vision API (detail=high) scales images to fit 2048x2048 and then scales the
+# shortest side down to 768px, so larger payloads only cost upload time.
+VISION_MAX_LONG_SIDE = int(os.getenv("VISION_MAX_LONG_SIDE", "2048"))
+VISION_MAX_SHORT_SIDE = int(os.getenv("VISION_MAX_SHORT_SIDE", "768"))
+# Pages with little text (large fonts, cover pages) are readable at a lower resolution
+VISION_SPARSE_SHORT_SIDE = int(os.getenv("VISION_SPARSE_SHORT_SIDE", "512"))
+SPARSE_WORDS_PER_SQ_INCH = float(os.getenv("VISION_SPARSE_WORDS_PER_SQ_INCH", "3.0"))
+
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg").lower()
+VISION_IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "80"))
+
+# Pixels darker than this count as content when cropping white margins
+MARGIN_THRESHOLD = 245
+MARGIN_PADDING = 16
+
+# Render at this multiple of the target size so downscaling can antialias the text
+RENDER_OVERSAMPLING = 1.5
+MIN_ZOOM = 0.5
+MAX_ZOOM = 4.0
+
+MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+def _target_short_side(page) -> int:
+    """
+    Pick the target resolution for a PDF page from its text density.
+
+    Args:
+        page: A PyMuPDF page
+
+    Returns:
+        Target length of the shortest image side in pixels
+    """
+    words = page.get_text("words")
+    if not words:
+        # No text layer (scanned page), we cannot tell how dense it is
+        return VISION_MAX_SHORT_SIDE
+
+    area_sq_in = (page.rect.width / 72) * (page.rect.height / 72)
+    words_per_sq_in = len(words) / area_sq_in if area_sq_in else 0
+    if words_per_sq_in < SPARSE_WORDS_PER_SQ_INCH:
+        return VISION_SPARSE_SHORT_SIDE
+    return VISION_MAX_SHORT_SIDE
+
+
+def _crop_margins(image: Image.Image) -> Image.Image:
+    """Crop white margins around the content of a grayscale image."""
+    mask = image.point(lambda p: 255 if p < MARGIN_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        # Blank image, nothing to crop
+        return image
+    left, top, right, bottom = bbox
+    return image.crop((
+        max(left - MARGIN_PADDING, 0),
+        max(top - MARGIN_PADDING, 0),
+        min(right + MARGIN_PADDING, image.width),
+        min(bottom + MARGIN_PADDING, image.height),
+    ))
+
+
+def _downscale(image: Image.Image, max_short_side: int) -> Image.Image:
+    """Downscale an image so it fits the Vision API limits. Never upscales."""
+    scale = min(
+        1.0,
+        max_short_side / min(image.width, image.height),
+        VISION_MAX_LONG_SIDE / max(image.width, image.height),
+    )
+    if scale >= 1.0:
+        return image
+    size = (max(int(image.width * scale), 1), max(int(image.height * scale), 1))
+    return image.resize(size, Image.LANCZOS)
+
+
+def _encode(image: Image.Image) -> Tuple[bytes, str]:
+    """Compress an image to the configured format."""
+    image_format = VISION_IMAGE_FORMAT if VISION_IMAGE_FORMAT in MIME_TYPES else "jpeg"
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        image.save(buffer, format="WEBP", quality=VISION_IMAGE_QUALITY, method=4)
+    else:
+        image.save(buffer, format="JPEG", quality=VISION_IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue(), MIME_TYPES[image_format]
+
+
+def prepare_image(image: Image.Image, max_short_side: int = VISION_MAX_SHORT_SIDE) -> Tuple[bytes, str]:
+    """
+    Prepare an image for the Vision API: grayscale, crop margins, downscale, compress.
+
+    Args:
+        image: The image to prepare
+        max_short_side: Maximum length of the shortest side in pixels
+
+    Returns:
+        Tuple of (image bytes, MIME type)
+    """
+    image = ImageOps.exif_transpose(image).convert("L")
+    image = _crop_margins(image)
+    image = _downscale(image, max_short_side)
+    return _encode(image)
+
+
+def prepare_image_file(path) -> Tuple[bytes, str]:
+    """
+    Prepare an uploaded image file (PNG, JPEG, GIF, WEBP) for the Vision API.
+
+    Args:
+        path: Path to the image file
+
+    Returns:
+        Tuple of (image bytes, MIME type)
+    """
+    with Image.open(path) as image:
+        # Animated GIFs: only the first frame is sent
+        image.seek(0)
+        return prepare_image(image)
+
+
+def render_page_for_vision(page) -> Tuple[bytes, str]:
+    """
+    Render a PDF page for the Vision API, with a resolution based on its text density.
+
+    Args:
+        page: A PyMuPDF page
+
+    Returns:
+        Tuple of (image bytes, MIME type)
+    """
+    import fitz
+
+    target_short_side = _target_short_side(page)
+    zoom = target_short_side * RENDER_OVERSAMPLING / min(page.rect.width, page.rect.height)
+    zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    return prepare_image(image, max_short_side=target_short_side)
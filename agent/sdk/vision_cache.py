@@ -0,0 +1,126 @@
+"""
+Persistent cache for Vision API extractions.
+Results are stored in SQLite, keyed by a hash of the prepared image, the model and
+the prompt version, and evicted least-recently-used once the cache grows over its size limit.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+class VisionCache:
+    """
+    Disk-backed LRU cache mapping prepared images to Vision API output.
+    Safe to share between threads; hit/miss counters are kept per process.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 256 * 1024 * 1024):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: Path to the SQLite file
+            max_bytes: Maximum total size of cached content before LRU eviction
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS vision_cache (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS vision_cache_last_access ON vision_cache (last_access)"
+            )
+
+    @staticmethod
+    def make_key(image_data: bytes, model: str, prompt_version: str) -> str:
+        """
+        Build the cache key for a prepared image.
+
+        Args:
+            image_data: The image bytes exactly as sent to the Vision API
+            model: Vision model name
+            prompt_version: Version of the extraction prompt
+
+        Returns:
+            Hex digest identifying the extraction
+        """
+        digest = hashlib.sha256(image_data)
+        digest.update(f"|{model}|{prompt_version}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached content for a key and mark it as recently used."""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT content FROM vision_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE vision_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        """Store content for a key, evicting least recently used entries if over the size limit."""
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO vision_cache (key, content, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, content, size, now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        """Delete the least recently used entries that do not fit into max_bytes."""
+        self._connection.execute(
+            """
+            DELETE FROM vision_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS running_size
+                    FROM vision_cache
+                )
+                WHERE running_size > ?
+            )
+            """,
+            (self.max_bytes,),
+        )
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current cache size."""
+        with self._lock:
+            entries, total_bytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM vision_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+        }
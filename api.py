@@ -1,18 +1,18 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Dict, List
 from sqlalchemy import text
 import sys
 import os
 from pathlib import Path
-import csv
-import io
 import uuid
-import pandas as pd
+import asyncio
 import json
+import pandas as pd
 import logging
-from logging.handlers import RotatingFileHandler
 from datetime import datetime
 
 # Add current directory to path for imports
@@ -23,40 +23,22 @@ from modules.ai_doctor.ask.schema_extractor import extract_schema
 from modules.youtube_summarizer.src.utils.psql_client import PSQLClient
 from modules.matcher.testing_results_unit_converter import TestingResultsUnitConverter
 from modules.matcher.testing_object_matcher import TestingObjectMatcher
+from modules.testing_results.validation import validate_rows
+from modules.testing_results.writer import bulk_upsert_testing_results, ensure_writer_schema
+from modules.llm.openai.answer_cache import answer_cache
+from modules.llm.openai.sql_cache import collect_read_tables, sql_result_cache
+from modules.llm.openai.schema_digest import write_schema_digest
+from modules.llm.openai.tools import stream_completion_with_tools
+from modules.observability.logging_setup import setup_logging, truncate
+from modules.observability.usage import current_usage_summary, track_usage, usage_totals
+from modules.observability.latency import latency_histograms
 
-# Setup logging
+# Setup logging (queued: file and console I/O happen on a background thread)
 logs_dir = Path(__file__).parent / "logs"
-logs_dir.mkdir(exist_ok=True)
+setup_logging(logs_dir)
 
 # Create logger for API
 api_logger = logging.getLogger("api")
-api_logger.setLevel(logging.INFO)
-
-# Create file handler with rotation (max 10MB per file, keep 5 backups)
-log_file = logs_dir / "api.log"
-file_handler = RotatingFileHandler(
-    log_file,
-    maxBytes=10*1024*1024,  # 10MB
-    backupCount=5,
-    encoding='utf-8'
-)
-file_handler.setLevel(logging.INFO)
-
-# Create console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-
-# Create formatter
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
-
-# Add handlers to logger
-api_logger.addHandler(file_handler)
-api_logger.addHandler(console_handler)
 
 # Redirect print statements to logger
 class PrintLogger:
@@ -87,6 +69,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Collect token usage and model latency of every request (see /metrics/usage)
+@app.middleware("http")
+async def track_usage_middleware(request, call_next):
+    with track_usage(request.url.path):
+        return await call_next(request)
+
 # Extract schema on startup
 schema_path = Path(__file__).parent / "ask" / "cache" / "db_schema.txt"
 try:
@@ -111,27 +99,17 @@ class AskRequest(BaseModel):
     prompt: str
     preferences: Optional[PreferencesRequest] = None
     max_iterations: Optional[int] = None
+    use_cache: Optional[bool] = True
 
 class AgentRequest(BaseModel):
     prompt: str
     include_trace: Optional[bool] = False
 
-class TestingResultRow(BaseModel):
-    # id is auto-generated by database, not included in CSV
-    test_object: Optional[str] = None
-    result_value: Optional[float] = None
-    result_unit: Optional[str] = None
-    reference_value: Optional[float] = None
-    comments: Optional[str] = None
-    flag: Optional[str] = None
-    testing_date: Optional[str] = None  # DATE format: YYYY-MM-DD
-    testing_institution: Optional[str] = None
-    testing_location: Optional[str] = None
-
 class TestingResultsResponse(BaseModel):
     success: bool
     message: str
     rows_inserted: Optional[int] = None
+    rows_skipped: Optional[int] = None
     rows_invalid: Optional[int] = None
     invalid_row_numbers: Optional[List[int]] = None
     trace: Optional[Dict] = None
@@ -152,20 +130,84 @@ async def ask_endpoint(request: AskRequest):
         prompt = request.prompt
         preferences = request.preferences.model_dump() if request.preferences else None
         max_iterations = request.max_iterations
-        response = ask_instance.ask_directly(
-            prompt=prompt, 
-            preferences=preferences,
-            max_iterations=max_iterations
-        )
+        if request.use_cache:
+            cached = answer_cache.get(prompt, preferences)
+            if cached is not None:
+                return {"response": cached, "cached": True}
+        # The tool loop blocks, keep it off the event loop
+        with collect_read_tables() as tables:
+            response = await run_in_threadpool(
+                ask_instance.ask_directly,
+                prompt=prompt, 
+                preferences=preferences,
+                max_iterations=max_iterations
+            )
+        if response:
+            answer_cache.put(prompt, preferences, response, tables)
         return {"response": response}
     except Exception as e:
         return {"error": str(e)}, 500
 
 
+def sse_event(event: Dict) -> str:
+    """Encode an event as a server-sent event (event name = event type)."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    """Stream an async iterator of events as text/event-stream."""
+    async def body():
+        async for event in events:
+            yield sse_event(event)
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Disable buffering of reverse proxies, events must reach the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/ask/stream")
+async def ask_stream_endpoint(request: AskRequest):
+    """
+    Streaming variant of /ask (server-sent events): tool_call_started, sql_executed,
+    tool_call_finished and answer_delta events while the tool loop runs, then done
+    (or error).
+    """
+    prompt = request.prompt
+    if request.preferences:
+        preferences = request.preferences.model_dump(exclude_none=True)
+        if preferences:
+            prompt = f"{prompt}\n\nMy preferences: {json.dumps(preferences)}"
+    return sse_response(stream_completion_with_tools(prompt, request.max_iterations))
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics/usage")
+async def get_usage_metrics():
+    """
+    Token usage and model wall time since startup, per endpoint and pipeline stage.
+    """
+    return usage_totals.snapshot()
+
+@app.get("/metrics/latency")
+async def get_latency_metrics():
+    """
+    Latency histograms since startup: agent tools ("tool:<name>"), model turns,
+    rendered PDF pages and Vision API calls.
+    """
+    return latency_histograms.snapshot()
+
+@app.get("/metrics/cache")
+async def get_cache_metrics():
+    """
+    Hit rates and sizes of the /ask answer cache and the SQL result cache.
+    """
+    return {"answers": answer_cache.stats(), "sql": sql_result_cache.stats()}
+
 # Initialize PSQL client for testing results
 psql_client = None
 try:
@@ -175,6 +217,23 @@ try:
 except Exception as e:
     api_logger.warning(f"Failed to initialize PSQL client: {e}")
 
+# The writer's ON CONFLICT needs the natural key index; without it uploads fail fast
+testing_results_schema_error = None
+if psql_client is not None:
+    try:
+        ensure_writer_schema(psql_client)
+    except Exception as e:
+        testing_results_schema_error = str(e)
+        api_logger.error(f"❌ {testing_results_schema_error}")
+
+# Compact, timestamp-free schema digest for the prompt prefix of the tool loop
+if psql_client is not None:
+    try:
+        if write_schema_digest(psql_client):
+            api_logger.info("Schema digest updated")
+    except Exception as e:
+        api_logger.warning(f"Failed to write schema digest: {e}")
+
 @app.post("/agent")
 async def agent_endpoint(request: AgentRequest):
     """
@@ -183,11 +242,8 @@ async def agent_endpoint(request: AgentRequest):
     Optionally includes trace information if include_trace is True.
     """
     try:
-        # Import agent from SDK
-        sys.path.insert(0, os.path.join(current_dir, "agent", "sdk"))
-        
         if request.include_trace:
-            from file_agent import run_agent_async_with_trace
+            from agent.sdk.file_agent import run_agent_async_with_trace
             agent_result = await run_agent_async_with_trace(request.prompt)
             return {
                 "response": agent_result["final_output"],
@@ -195,16 +251,68 @@ async def agent_endpoint(request: AgentRequest):
                     "tool_calls": agent_result.get("tool_calls", []),
                     "tool_usage_summary": agent_result.get("tool_usage_summary", {}),
                     "messages_count": agent_result.get("messages_count", 0),
-                    "trace_id": agent_result.get("trace_id")
+                    "trace_id": agent_result.get("trace_id"),
+                    "model_turns": agent_result.get("model_turns", []),
+                    "timing": agent_result.get("timing"),
+                    "usage": agent_result.get("usage")
                 }
             }
         else:
-            from file_agent import run_agent_async
+            from agent.sdk.file_agent import run_agent_async
             response = await run_agent_async(request.prompt)
             return {"response": response}
     except Exception as e:
         return {"error": str(e)}, 500
 
+@app.post("/agent/stream")
+async def agent_stream_endpoint(request: AgentRequest):
+    """
+    Streaming variant of /agent (server-sent events): tool_call_started,
+    tool_call_finished and answer_delta events while the agent runs, then done
+    (or error).
+    """
+    from agent.sdk.file_agent import stream_agent_events
+    return sse_response(stream_agent_events(request.prompt))
+
+TESTING_RESULTS_EXTENSIONS = ['.pdf', '.csv', '.png', '.jpg', '.jpeg', '.gif', '.webp']
+# Shared by all batch uploads, so concurrent requests together stay within the limit
+TESTING_RESULTS_MAX_CONCURRENCY = int(os.getenv("TESTING_RESULTS_MAX_CONCURRENCY", "4"))
+testing_results_semaphore = asyncio.Semaphore(TESTING_RESULTS_MAX_CONCURRENCY)
+
+
+def require_testing_results_schema():
+    """Fail fast (503) if the writer's migrations could not be applied at startup."""
+    if testing_results_schema_error:
+        raise HTTPException(status_code=503, detail=testing_results_schema_error)
+
+
+def get_testing_results_dir() -> Path:
+    """Directory of uploaded testing results files (next to preferences)."""
+    frontend_dist_path = Path(current_dir) / "modules" / "frontend" / "dist"
+    testing_results_dir = frontend_dist_path / "testing_results"
+    testing_results_dir.mkdir(parents=True, exist_ok=True)
+    return testing_results_dir
+
+
+async def save_testing_results_file(file: UploadFile) -> Dict:
+    """Store an uploaded testing results file under a new file ID."""
+    # Generate unique filename
+    file_ext = Path(file.filename).suffix
+    file_id = str(uuid.uuid4())
+    file_path = get_testing_results_dir() / f"{file_id}{file_ext}"
+    
+    # Save file
+    with open(file_path, "wb") as f:
+        content = await file.read()
+        f.write(content)
+    
+    return {
+        "file_id": file_id,
+        "file_path": str(file_path),
+        "filename": file.filename
+    }
+
+
 @app.post("/upload-testing-results")
 async def upload_testing_results(file: UploadFile = File(...)):
     """
@@ -212,30 +320,131 @@ async def upload_testing_results(file: UploadFile = File(...)):
     Stores the file in the testing_results directory next to preferences.
     """
     try:
-        # Determine file storage location (next to preferences)
-        frontend_dist_path = Path(current_dir) / "modules" / "frontend" / "dist"
-        testing_results_dir = frontend_dist_path / "testing_results"
-        testing_results_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate unique filename
-        file_ext = Path(file.filename).suffix
-        file_id = str(uuid.uuid4())
-        file_path = testing_results_dir / f"{file_id}{file_ext}"
-        
-        # Save file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        return {
-            "success": True,
-            "file_id": file_id,
-            "file_path": str(file_path),
-            "filename": file.filename
-        }
+        saved = await save_testing_results_file(file)
+        return {"success": True, **saved}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
+@app.post("/upload-testing-results/batch")
+async def upload_testing_results_batch(files: List[UploadFile] = File(...)):
+    """
+    Upload and process several testing results files at once.
+    Files are extracted concurrently (at most TESTING_RESULTS_MAX_CONCURRENCY at a time
+    across all requests) and their valid rows are inserted with one bulk upsert.
+    Returns a summary per file; a failing file does not fail the batch.
+    """
+    if not psql_client:
+        api_logger.error("Database connection not available")
+        raise HTTPException(status_code=500, detail="Database connection not available")
+    require_testing_results_schema()
+    
+    from modules.testing_results.pipeline import new_file_result, process_testing_results_files
+    
+    # One summary per uploaded file, in upload order
+    summary: List[Optional[Dict]] = [None] * len(files)
+    saved_indices, saved_paths, saved_names = [], [], []
+    try:
+        for index, file in enumerate(files):
+            file_ext = Path(file.filename or "").suffix.lower()
+            if file_ext not in TESTING_RESULTS_EXTENSIONS:
+                summary[index] = new_file_result(file.filename)
+                summary[index]["error"] = (
+                    f"Unsupported file type '{file_ext or 'none'}' "
+                    f"(supported: {', '.join(TESTING_RESULTS_EXTENSIONS)})"
+                )
+                api_logger.warning(f"⚠️ [BATCH] Skipping unsupported file {file.filename}")
+                continue
+            saved = await save_testing_results_file(file)
+            saved_indices.append(index)
+            saved_paths.append(Path(saved["file_path"]))
+            saved_names.append(file.filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uploading files: {str(e)}")
+    
+    api_logger.info(
+        f"📁 [BATCH] Processing {len(saved_paths)} files",
+        extra={"files": saved_names, "max_concurrency": TESTING_RESULTS_MAX_CONCURRENCY}
+    )
+    
+    if saved_paths:
+        try:
+            file_results = await process_testing_results_files(
+                psql_client, saved_paths, saved_names, testing_results_semaphore
+            )
+        except Exception as e:
+            error_msg = f"Error processing files: {str(e)}"
+            api_logger.exception(f"Unexpected Error: {error_msg}")
+            raise HTTPException(status_code=500, detail=error_msg)
+        for index, file_result in zip(saved_indices, file_results):
+            summary[index] = file_result
+    
+    successful = [r for r in summary if r["success"]]
+    rows_inserted = sum(r["rows_inserted"] for r in successful)
+    rows_skipped = sum(r["rows_skipped"] for r in successful)
+    api_logger.info(
+        f"💾 [BATCH] {len(successful)}/{len(summary)} files succeeded, {rows_inserted} rows inserted",
+        extra={"rows_inserted": rows_inserted, "rows_skipped": rows_skipped}
+    )
+    
+    return {
+        "success": len(successful) == len(summary),
+        "message": f"Processed {len(successful)}/{len(summary)} files, inserted {rows_inserted} rows",
+        "files_succeeded": len(successful),
+        "files_failed": len(summary) - len(successful),
+        "rows_inserted": rows_inserted,
+        "rows_skipped": rows_skipped,
+        "files": summary,
+        "trace": {"usage": current_usage_summary()}
+    }
+
+async def process_testing_results_by_pages(file_id: str, file_path: Path, ingest_pdf_by_pages) -> Dict:
+    """
+    Process a long PDF page by page: each group of pages is inserted as soon as it is
+    extracted, so partial progress is kept if later pages fail.
+    """
+    if not psql_client:
+        api_logger.error("Database connection not available")
+        raise HTTPException(status_code=500, detail="Database connection not available")
+    summary = await ingest_pdf_by_pages(psql_client, file_path)
+    chunks_failed = summary["chunks_failed"]
+    api_logger.info(
+        f"💾 [PAGE INGESTION] Inserted {summary['rows_inserted']} rows from {summary['total_pages']} pages",
+        extra={
+            "file_id": file_id,
+            "ingestion_id": summary["ingestion_id"],
+            "rows_inserted": summary["rows_inserted"],
+            "rows_skipped": summary["rows_skipped"],
+            "rows_invalid": summary["rows_invalid"],
+            "chunks_failed": chunks_failed,
+        }
+    )
+    
+    if summary["rows_extracted"] == 0:
+        raise HTTPException(
+            status_code=422 if not chunks_failed else 500,
+            detail=f"No data rows extracted from {summary['total_pages']} pages ({chunks_failed} page groups failed)"
+        )
+    
+    response_message = f"Successfully inserted {summary['rows_inserted']} rows"
+    if summary["rows_skipped"]:
+        response_message += f" ({summary['rows_skipped']} rows already existed)"
+    if summary["rows_invalid"]:
+        response_message += f" ({summary['rows_invalid']} invalid rows were removed)"
+    if chunks_failed:
+        response_message += f" ({chunks_failed} page groups failed)"
+    
+    return {
+        "success": chunks_failed == 0,
+        "message": response_message,
+        "rows_inserted": summary["rows_inserted"],
+        "rows_skipped": summary["rows_skipped"],
+        "rows_invalid": summary["rows_invalid"],
+        "invalid_row_numbers": summary["invalid_row_numbers"],
+        "ingestion_id": summary["ingestion_id"],
+        "chunks": summary["chunks"],
+        "trace": {"usage": current_usage_summary()}
+    }
+
 @app.post("/process-testing-results")
 async def process_testing_results(request: ProcessTestingResultsRequest):
     """
@@ -246,12 +455,11 @@ async def process_testing_results(request: ProcessTestingResultsRequest):
         file_id = request.file_id
         
         # Find the uploaded file
-        frontend_dist_path = Path(current_dir) / "modules" / "frontend" / "dist"
-        testing_results_dir = frontend_dist_path / "testing_results"
+        testing_results_dir = get_testing_results_dir()
         
         # Find file by ID (check common extensions)
         file_path = None
-        for ext in ['.pdf', '.csv', '.png', '.jpg', '.jpeg', '.gif', '.webp']:
+        for ext in TESTING_RESULTS_EXTENSIONS:
             candidate = testing_results_dir / f"{file_id}{ext}"
             if candidate.exists():
                 file_path = candidate
@@ -260,323 +468,136 @@ async def process_testing_results(request: ProcessTestingResultsRequest):
         if not file_path or not file_path.exists():
             raise HTTPException(status_code=404, detail=f"File with ID {file_id} not found")
         
-        # Load agent instructions
-        instructions_path = Path(current_dir) / "agent" / "sdk" / "testing_results_instructions.txt"
-        instructions = ""
-        if instructions_path.exists():
-            with open(instructions_path, 'r', encoding='utf-8') as f:
-                instructions = f.read()
+        # Nothing can be written without the writer's migrations, fail before extracting
+        require_testing_results_schema()
         
-        # Determine file type and construct agent prompt
-        # NOTE: For PDFs, we now use Vision API (read_pdf_with_vision) instead of read_pdf
-        # to handle scanned/image-based PDFs better. The read_pdf tool is kept but deactivated.
-        file_ext = file_path.suffix.lower()
-        if file_ext == '.pdf':
-            read_command = f"read_pdf_with_vision('{file_path}')"
-        elif file_ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']:
-            read_command = f"read_image('{file_path}')"
-        elif file_ext == '.csv':
-            read_command = f"read_csv('{file_path}')"
-        else:
-            read_command = f"read_file('{file_path}')"
-        
-        # Create agent prompt
-        agent_prompt = f"""{instructions}
-
-Now, please read the file at '{file_path}' using the {read_command} tool and extract all testing results. Return ONLY a valid CSV string matching the exact schema specified above, with no additional text or markdown formatting.
-
-IMPORTANT: You MUST extract at least one test result row. If you cannot find any test results, explain why in your response."""
+        # Long PDFs are extracted and inserted a few pages at a time
+        from modules.testing_results.page_ingestion import ingest_pdf_by_pages, should_ingest_by_pages
+        if should_ingest_by_pages(file_path):
+            return await process_testing_results_by_pages(file_id, file_path, ingest_pdf_by_pages)
         
-        print(f"\n📝 [AGENT PROMPT] Created agent prompt")
-        print(f"   📏 Prompt length: {len(agent_prompt)} characters")
-        print(f"   📄 File to process: {file_path}")
-        print(f"   🔧 Read command: {read_command}")
+        # Load agent instructions and build the agent prompt
+        from modules.testing_results.extraction import (
+            build_agent_prompt,
+            extract_testing_results,
+            load_instructions,
+        )
+        agent_prompt, read_command = build_agent_prompt(file_path, load_instructions())
         
-        # Run agent with trace information
-        sys.path.insert(0, os.path.join(current_dir, "agent", "sdk"))
-        from file_agent import run_agent_async_with_trace
+        api_logger.info(
+            f"📝 [AGENT PROMPT] Processing {file_path.name} with {read_command}",
+            extra={"file_id": file_id, "prompt_chars": len(agent_prompt)}
+        )
         
         try:
-            print(f"\n🤖 [AGENT EXECUTION] Starting agent...")
-            agent_result = await run_agent_async_with_trace(agent_prompt)
-            agent_response = agent_result["final_output"]
+            api_logger.info("🤖 [AGENT EXECUTION] Starting agent...", extra={"file_id": file_id})
+            rows_list, agent_notes, agent_result = await extract_testing_results(agent_prompt)
             
-            print(f"\n📤 [AGENT RESPONSE] Received agent response")
-            print(f"   📏 Response length: {len(agent_response)} characters")
-            print(f"   📋 Response type: {type(agent_response)}")
-            print(f"   📄 Full response:\n{'='*80}\n{agent_response}\n{'='*80}")
-            
-            # Check if response is empty or only contains header
-            if len(agent_response.strip()) < 100:
-                print(f"\n⚠️  WARNING: Agent response is very short ({len(agent_response)} chars)")
-                print(f"   This might indicate the agent didn't extract any data")
+            api_logger.info(
+                f"📤 [AGENT RESPONSE] Received {len(rows_list)} rows",
+                extra={"file_id": file_id, "rows_extracted": len(rows_list)}
+            )
+            if agent_notes:
+                api_logger.info(f"📝 Agent notes: {truncate(agent_notes)}", extra={"file_id": file_id})
             
             trace_info = {
                 "tool_calls": agent_result.get("tool_calls", []),
                 "tool_usage_summary": agent_result.get("tool_usage_summary", {}),
                 "messages_count": agent_result.get("messages_count", 0),
-                "trace_id": agent_result.get("trace_id")
+                "trace_id": agent_result.get("trace_id"),
+                "usage": agent_result.get("usage")
             }
         except Exception as e:
             error_msg = f"Agent execution failed: {str(e)}"
-            api_logger.error(f"Agent Error: {error_msg}")
-            import traceback
-            api_logger.error(f"Traceback:\n{traceback.format_exc()}")
+            api_logger.exception(f"Agent Error: {error_msg}", extra={"file_id": file_id})
             raise HTTPException(
                 status_code=500,
                 detail=error_msg
             )
         
-        # Extract CSV from response (remove markdown code blocks if present)
-        print(f"\n📄 [CSV EXTRACTION] Extracting CSV from agent response")
-        print(f"   📏 Agent response length: {len(agent_response)} characters")
-        print(f"   📋 Full agent response:\n{'='*80}\n{agent_response}\n{'='*80}")
-        
-        csv_content = agent_response.strip()
-        
-        # Try to extract CSV from markdown code blocks
-        if "```csv" in csv_content:
-            print(f"   🔍 Found markdown CSV block (```csv)")
-            parts = csv_content.split("```csv")
-            if len(parts) > 1:
-                csv_content = parts[1].split("```")[0].strip()
-                print(f"   ✅ Extracted CSV from markdown block")
-        elif "```" in csv_content:
-            print(f"   🔍 Found generic markdown code block (```)")
-            # Look for CSV content between code blocks
-            parts = csv_content.split("```")
-            for i, part in enumerate(parts):
-                if i % 2 == 1:  # Odd indices are code blocks
-                    if "test_object" in part and "," in part:
-                        csv_content = part.strip()
-                        print(f"   ✅ Extracted CSV from code block")
-                        break
-        
-        # If still no CSV header found, try to find lines starting with CSV header
-        if "test_object" not in csv_content:
-            print(f"   ⚠️  'test_object' not found in content, searching for header pattern...")
-            # Look for CSV header pattern in the response
-            lines = csv_content.split('\n')
-            header_line_idx = None
-            for idx, line in enumerate(lines):
-                if 'test_object' in line.lower() and ',' in line:
-                    header_line_idx = idx
-                    print(f"   ✅ Found header at line {idx}: {line[:100]}")
-                    break
-            
-            if header_line_idx is not None:
-                csv_content = '\n'.join(lines[header_line_idx:])
-            else:
-                print(f"   ❌ No CSV header found in response")
-        
-        # Clean up: remove any leading text before the header
-        # Look for header starting with test_object (id column is optional/removed)
-        if "test_object," in csv_content:
-            # Find the header line
-            lines = csv_content.split('\n')
-            for idx, line in enumerate(lines):
-                if line.strip().startswith("test_object,"):
-                    csv_content = '\n'.join(lines[idx:])
-                    print(f"   ✅ Cleaned CSV starting from header line {idx}")
-                    break
-        
-        print(f"\n   📋 Final CSV content to parse ({len(csv_content)} chars):")
-        print(f"   {'='*80}")
-        print(csv_content[:1000] if len(csv_content) > 1000 else csv_content)
-        print(f"   {'='*80}")
-        
-        # Parse CSV and validate with Pydantic
-        print(f"\n📋 [CSV PARSING] Parsing CSV content")
-        print(f"   📍 Stage: Parsing and validating CSV")
-        print(f"   📏 CSV content length: {len(csv_content)} characters")
-        print(f"   📋 CSV content lines: {len(csv_content.split(chr(10)))}")
-        
-        try:
-            csv_reader = csv.DictReader(io.StringIO(csv_content))
-            # Log the detected columns
-            if csv_reader.fieldnames:
-                print(f"   📊 Detected CSV columns: {csv_reader.fieldnames}")
-            else:
-                print(f"   ⚠️  No columns detected in CSV!")
-            print(f"   ✅ CSV parsed successfully")
-        except Exception as e:
-            # If CSV parsing fails, return error with proper status code
-            error_msg = f"Failed to parse CSV: {str(e)}. Agent response preview: {agent_response[:500]}"
-            api_logger.error(f"CSV Parsing Error: {error_msg}")
-            raise HTTPException(
-                status_code=422, 
-                detail=error_msg
-            )
-        validated_rows = []
-        invalid_rows = []
-        
-        # Convert csv_reader to list to check if it's empty and allow multiple iterations
-        rows_list = list(csv_reader)
-        print(f"   📊 Total rows read from CSV: {len(rows_list)}")
-        
         if len(rows_list) == 0:
-            print(f"   ⚠️  WARNING: CSV reader returned 0 rows!")
-            print(f"   📋 CSV content was:\n{csv_content}")
+            api_logger.warning("⚠️  Agent returned 0 rows", extra={"file_id": file_id})
             raise HTTPException(
                 status_code=422,
-                detail=f"No data rows found in CSV. CSV content: {csv_content[:200]}"
+                detail=f"No data rows extracted. Agent notes: {agent_notes or 'none'}"
             )
         
-        print(f"   🔍 Validating rows with Pydantic...")
-        for idx, row in enumerate(rows_list, start=2):  # Start at 2 (header is row 1)
-            print(f"   📝 Processing row {idx}: {dict(row)}")
-            try:
-                # Convert empty strings to None for optional fields (except numeric fields)
-                cleaned_row = {}
-                for k, v in row.items():
-                    # Skip id if present (auto-generated by database)
-                    if k == 'id':
-                        continue
-                    # Skip reference_unit if present (removed from schema)
-                    if k == 'reference_unit':
-                        continue
-                    cleaned_row[k] = (v if v else None)
-                
-                # Convert numeric fields - must be valid floats if present
-                if cleaned_row.get('result_value'):
-                    try:
-                        cleaned_row['result_value'] = float(cleaned_row['result_value'])
-                    except (ValueError, TypeError) as e:
-                        raise ValueError(f"result_value must be a valid float, got: {cleaned_row.get('result_value')}")
-                else:
-                    cleaned_row['result_value'] = None
-                
-                if cleaned_row.get('reference_value'):
-                    try:
-                        cleaned_row['reference_value'] = float(cleaned_row['reference_value'])
-                    except (ValueError, TypeError) as e:
-                        raise ValueError(f"reference_value must be a valid float, got: {cleaned_row.get('reference_value')}")
-                else:
-                    cleaned_row['reference_value'] = None
-                
-                # Validate testing_date format if present (YYYY-MM-DD)
-                if cleaned_row.get('testing_date'):
-                    import re
-                    date_pattern = r'^\d{4}-\d{2}-\d{2}$'
-                    if not re.match(date_pattern, cleaned_row['testing_date']):
-                        raise ValueError(f"testing_date must be in YYYY-MM-DD format, got: {cleaned_row.get('testing_date')}")
-                else:
-                    cleaned_row['testing_date'] = None
-                
-                # Validate with Pydantic
-                validated_row = TestingResultRow(**cleaned_row)
-                validated_rows.append(validated_row.model_dump())
-                if idx % 10 == 0 or idx == 2:  # Log every 10th row or first row
-                    print(f"   ✅ Validated row {idx}")
-            except Exception as e:
-                # Collect invalid row info but continue processing
-                invalid_row_info = {
-                    "row_number": idx,
-                    "error": str(e),
-                    "row_data": dict(row)  # Store original row data for logging
-                }
-                invalid_rows.append(invalid_row_info)
-                print(f"   ⚠️  Row {idx} INVALID - will be skipped: {str(e)}")
-                # Log the problematic row data
-                test_obj = row.get('test_object', 'N/A')
-                result_val = row.get('result_value', 'N/A')
-                print(f"      Row data: test_object='{test_obj}', result_value='{result_val}'")
+        # Validate all rows at once (numeric coercion, date format, flag values)
+        validated_df, invalid_rows = validate_rows(rows_list)
+        invalid_row_numbers = [r['row_number'] for r in invalid_rows]
         
-        # Log summary of invalid rows
-        if invalid_rows:
-            print(f"\n⚠️  VALIDATION SUMMARY - Invalid Rows Removed:")
-            print(f"   Total invalid rows: {len(invalid_rows)}")
-            print(f"   Invalid row numbers: {[r['row_number'] for r in invalid_rows]}")
+        # Row level details only at DEBUG
+        if invalid_rows and api_logger.isEnabledFor(logging.DEBUG):
             for invalid_row in invalid_rows:
-                print(f"   ❌ Row {invalid_row['row_number']}: {invalid_row['error']}")
-                test_obj = invalid_row['row_data'].get('test_object', 'N/A')
-                result_val = invalid_row['row_data'].get('result_value', 'N/A')
-                print(f"      Data: test_object='{test_obj}', result_value='{result_val}'")
+                api_logger.debug(
+                    f"❌ Row {invalid_row['row_number']}: {invalid_row['error']}",
+                    extra={"file_id": file_id, "row_data": truncate(invalid_row['row_data'])}
+                )
+        
+        api_logger.info(
+            f"🔍 [VALIDATION] {len(validated_df)} valid, {len(invalid_rows)} invalid rows",
+            extra={
+                "file_id": file_id,
+                "rows_valid": len(validated_df),
+                "rows_invalid": len(invalid_rows),
+                "invalid_row_numbers": truncate(invalid_row_numbers, 200),
+            }
+        )
         
-        if not validated_rows:
-            error_msg = "No valid rows found in CSV after validation"
-            print(f"\n❌ Validation Error: {error_msg}")
-            if invalid_rows:
-                print(f"   All {len(invalid_rows)} rows were invalid and removed")
+        if validated_df.empty:
+            error_msg = "No valid rows found after validation"
+            api_logger.warning(f"❌ Validation Error: {error_msg}", extra={"file_id": file_id})
             raise HTTPException(
                 status_code=422,
                 detail=error_msg
             )
         
-        # Log success summary
-        print(f"\n✅ VALIDATION SUMMARY - Valid Rows:")
-        print(f"   Total valid rows: {len(validated_rows)}")
-        if invalid_rows:
-            print(f"   Total invalid rows removed: {len(invalid_rows)}")
-            print(f"   Success rate: {len(validated_rows)}/{len(validated_rows) + len(invalid_rows)} ({100 * len(validated_rows) / (len(validated_rows) + len(invalid_rows)):.1f}%)")
-        
         # Insert into database
-        print(f"\n💾 [DATABASE WRITE] psql_client.write()")
-        print(f"   📍 Stage: Writing to PostgreSQL database")
         if not psql_client:
             api_logger.error("Database connection not available")
             raise HTTPException(status_code=500, detail="Database connection not available")
         
-        print(f"   📊 Preparing DataFrame with {len(validated_rows)} rows")
-        df = pd.DataFrame(validated_rows)
-        print(f"   📋 DataFrame columns: {', '.join(df.columns.tolist())}")
-        print(f"   📏 DataFrame shape: {df.shape[0]} rows × {df.shape[1]} columns")
-        
-        print(f"\n   💾 Database Write Parameters:")
-        print(f"      Table: public.testing_results")
-        print(f"      Write disposition: append")
-        print(f"      Conflict handling: error (all rows will be inserted)")
-        print(f"      Rows to insert: {len(df)}")
-        print(f"      Note: 'id' column will be auto-generated by database")
-        
-        print(f"   🔌 Connecting to database...")
         try:
-            # Note: id is auto-generated, so we use 'error' conflict handling which doesn't require index_columns
-            # This will insert all rows (duplicates allowed since id is auto-generated)
-            psql_client.write(
-                df,
-                "testing_results",
-                "public",
-                write_disposition="append",
-                on_conflict="error"
-            )
-            print(f"   ✅ Successfully inserted {len(validated_rows)} rows into database")
-            print(f"   📊 Database operation completed")
+            # Rows that already exist (same natural key) are skipped, so retries are safe.
+            # COPY and INSERT block, keep them off the event loop
+            write_result = await asyncio.to_thread(bulk_upsert_testing_results, psql_client, validated_df)
+            rows_inserted = write_result["inserted"]
+            rows_skipped = write_result["skipped"]
         except Exception as e:
-            print(f"   ❌ Database write error: {str(e)}")
-            import traceback
-            print(f"   📋 Traceback:\n{traceback.format_exc()}")
+            api_logger.exception(f"❌ Database write error: {str(e)}", extra={"file_id": file_id})
             raise HTTPException(
                 status_code=500,
                 detail=f"Database write failed: {str(e)}"
             )
         
         # Log final statistics
-        print("\n" + "=" * 80)
-        print("📊 API RESPONSE STATISTICS")
-        print("=" * 80)
-        print(f"✅ Success: True")
-        print(f"📝 Message: Successfully inserted {len(validated_rows)} rows")
-        print(f"📊 Rows Inserted: {len(validated_rows)}")
-        if invalid_rows:
-            print(f"⚠️  Invalid Rows Removed: {len(invalid_rows)}")
-            print(f"📋 Invalid Row Numbers: {[r['row_number'] for r in invalid_rows]}")
-        print(f"🔧 Tool Calls: {len(trace_info.get('tool_calls', []))}")
-        print(f"📨 Messages: {trace_info.get('messages_count', 0)}")
-        if trace_info.get('tool_usage_summary'):
-            print(f"📋 Tool Usage: {json.dumps(trace_info['tool_usage_summary'], indent=2)}")
-        print("=" * 80 + "\n")
+        api_logger.info(
+            f"💾 [DATABASE WRITE] Inserted {rows_inserted} rows, skipped {rows_skipped} existing rows",
+            extra={
+                "file_id": file_id,
+                "rows_inserted": rows_inserted,
+                "rows_skipped": rows_skipped,
+                "rows_invalid": len(invalid_rows),
+                "tool_calls": len(trace_info.get('tool_calls', [])),
+                "messages_count": trace_info.get('messages_count', 0),
+                "tool_usage_summary": trace_info.get('tool_usage_summary', {}),
+                "trace_id": trace_info.get('trace_id'),
+            }
+        )
         
-        response_message = f"Successfully inserted {len(validated_rows)} rows"
+        response_message = f"Successfully inserted {rows_inserted} rows"
+        if rows_skipped:
+            response_message += f" ({rows_skipped} rows already existed)"
         if invalid_rows:
             response_message += f" ({len(invalid_rows)} invalid rows were removed)"
         
         return {
             "success": True,
             "message": response_message,
-            "rows_inserted": len(validated_rows),
+            "rows_inserted": rows_inserted,
+            "rows_skipped": rows_skipped,
             "rows_invalid": len(invalid_rows) if invalid_rows else 0,
-            "invalid_row_numbers": [r['row_number'] for r in invalid_rows] if invalid_rows else [],
+            "invalid_row_numbers": invalid_row_numbers,
             "trace": trace_info
         }
         
@@ -584,9 +605,7 @@ IMPORTANT: You MUST extract at least one test result row. If you cannot find any
         raise
     except Exception as e:
         error_msg = f"Error processing file: {str(e)}"
-        api_logger.error(f"Unexpected Error: {error_msg}")
-        import traceback
-        api_logger.error(f"Traceback:\n{traceback.format_exc()}")
+        api_logger.exception(f"Unexpected Error: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
 # Initialize unit converter
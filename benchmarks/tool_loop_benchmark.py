@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of our own overhead in the ask tool loop and the file agent.
+
+Component benchmarks run offline on deterministic synthetic data and measure the
+per-iteration work the loop does around the model calls:
+    context     token counting and budget enforcement of TokenBudgetContext
+    serialize   JSON encoding of the input list sent with every request
+    format      compact CSV / summary formatting and truncation of SQL results
+    sql         query normalization, table extraction, LIMIT wrapping and cache lookups
+
+End-to-end benchmarks (--loop, --agent) run the real loop against recorded OpenAI
+traffic (OPENAI_HTTP_MODE=replay, see modules/llm/openai/replay.py) and report the
+wall time that is not spent waiting for the model, per iteration. Record fixtures
+once with OPENAI_HTTP_MODE=record against the live API. The tool loop's SQL still
+runs against PSQL_CONNECTION_STRING.
+
+Usage:
+    python benchmarks/tool_loop_benchmark.py
+    OPENAI_HTTP_MODE=replay python benchmarks/tool_loop_benchmark.py --loop --prompt "..."
+"""
+
+import os
+import sys
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import string
+import time
+from typing import Callable, Dict, List
+
+# Add the repository root to path for imports
+current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, current_dir)
+
+import pandas as pd
+
+from modules.llm.openai.context import TokenBudgetContext
+from modules.llm.openai.sql_cache import SQLResultCache, normalize_sql, referenced_tables
+from modules.llm.openai.sql_output import format_result, limit_query
+
+SEED = 7
+QUERIES = [
+    "SELECT video_id, title FROM v_video_topic WHERE topic_name = 'detox' AND value",
+    "SELECT channel_id, COUNT(*) FROM videos GROUP BY channel_id ORDER BY 2 DESC LIMIT 20",
+    """
+    WITH recent AS (SELECT * FROM testing_results WHERE testing_date > '2024-01-01')
+    SELECT test_object, AVG(result_value) FROM recent r JOIN testing_results_units u ON u.unit = r.result_unit
+    GROUP BY test_object
+    """,
+]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(string.ascii_lowercase + "     ") for _ in range(length))
+
+
+def synthetic_frame(rng: random.Random, rows: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "video_id": [f"vid{index:05d}" for index in range(rows)],
+        "title": [random_text(rng, 60) for _ in range(rows)],
+        "subtitles": [random_text(rng, 3000) for _ in range(rows)],
+        "views": [rng.randint(0, 10 ** 6) for _ in range(rows)],
+    })
+
+
+def measure(function: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Run a function repeatedly and return median, p95 and max in milliseconds."""
+    function()  # warm up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "max_ms": round(samples[-1], 4),
+    }
+
+
+def build_turns(rng: random.Random, iterations: int, output_chars: int) -> List[Dict]:
+    """Response outputs and tool outputs of a tool loop with one SQL call per iteration."""
+    turns = []
+    for index in range(iterations):
+        call_id = f"call_{index}"
+        turns.append({
+            "output": [{
+                "type": "function_call",
+                "call_id": call_id,
+                "name": "execute_sql_query",
+                "arguments": json.dumps({"query": QUERIES[index % len(QUERIES)]}),
+            }],
+            "tool_outputs": [{
+                "type": "function_call_output",
+                "call_id": call_id,
+                "output": json.dumps({"result": random_text(rng, output_chars)}),
+            }],
+        })
+    return turns
+
+
+def component_benchmarks(repeat: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(SEED)
+    turns = build_turns(rng, iterations, output_chars=8000)
+    system_prompt = random_text(rng, 12000)
+
+    def run_context():
+        context = TokenBudgetContext(max_tokens=20000)
+        context.append({"role": "system", "content": system_prompt})
+        context.append({"role": "user", "content": "Which videos are about detox?"})
+        for turn in turns:
+            context.add_response_output(turn["output"])
+            context.add_tool_outputs(turn["tool_outputs"])
+            context.items()
+        return context
+
+    context = run_context()
+    items = context.items()
+    frames = {rows: synthetic_frame(rng, rows) for rows in (10, 60, 501)}
+    cache = SQLResultCache(ttl_seconds=300, max_entries=256)
+    for query in QUERIES:
+        cache.put(limit_query(query), frames[10])
+
+    def run_sql():
+        for query in QUERIES:
+            limited = limit_query(query)
+            referenced_tables(normalize_sql(limited))
+            cache.get(limited)
+
+    results = {
+        f"context ({iterations} iterations, per iteration)": {
+            key: round(value / iterations, 4) for key, value in measure(run_context, repeat).items()
+        },
+        "serialize input list": measure(lambda: json.dumps(items), repeat),
+        "sql (normalize, tables, limit, cache hit) x3": measure(run_sql, repeat),
+    }
+    for rows, frame in frames.items():
+        results[f"format result ({rows} rows)"] = measure(lambda frame=frame: format_result(frame), repeat)
+    return results
+
+
+async def loop_benchmark(prompt: str, runs: int, max_iterations: int) -> Dict[str, float]:
+    """Run the tool loop against the configured OpenAI traffic and split model time from our overhead."""
+    from modules.llm.openai.tools import generate_completion_with_tools_async
+
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = await generate_completion_with_tools_async(prompt, max_iterations)
+        total = time.perf_counter() - started
+        totals = result.usage["totals"]
+        overhead = total - totals["wall_time_seconds"]
+        samples.append((total, overhead, max(1, totals["calls"])))
+    return {
+        "runs": runs,
+        "wall_time_s": round(statistics.median(total for total, _, _ in samples), 4),
+        "overhead_s": round(statistics.median(overhead for _, overhead, _ in samples), 4),
+        "overhead_per_iteration_ms": round(
+            statistics.median(overhead / calls * 1000 for _, overhead, calls in samples), 4
+        ),
+    }
+
+
+async def agent_benchmark(prompt: str, runs: int) -> Dict[str, float]:
+    """Run the file agent against the configured OpenAI traffic and split model time from our overhead."""
+    from agents import set_default_openai_client, set_tracing_disabled
+    from modules.llm.openai.async_client import get_async_openai_client
+    from agent.sdk.file_agent import run_agent_async_with_trace
+
+    # The agents SDK uses its own client unless told otherwise; traces are not uploaded
+    set_default_openai_client(get_async_openai_client(), use_for_tracing=False)
+    set_tracing_disabled(True)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        trace_info = await run_agent_async_with_trace(prompt)
+        total = time.perf_counter() - started
+        totals = trace_info["usage"]["totals"]
+        samples.append((total, total - totals["wall_time_seconds"], max(1, totals["calls"])))
+    return {
+        "runs": runs,
+        "wall_time_s": round(statistics.median(total for total, _, _ in samples), 4),
+        "overhead_s": round(statistics.median(overhead for _, overhead, _ in samples), 4),
+        "overhead_per_iteration_ms": round(
+            statistics.median(overhead / calls * 1000 for _, overhead, calls in samples), 4
+        ),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of the ask tool loop and the file agent")
+    parser.add_argument("--repeat", type=int, default=50, help="Repetitions per component benchmark")
+    parser.add_argument("--iterations", type=int, default=10, help="Simulated tool loop iterations")
+    parser.add_argument("--loop", action="store_true", help="Run the tool loop end to end")
+    parser.add_argument("--agent", action="store_true", help="Run the file agent end to end")
+    parser.add_argument("--prompt", default="For the channel id: ByronHerbalist give me all video titles about the topic: detox")
+    parser.add_argument("--runs", type=int, default=3, help="End-to-end runs (each needs recorded responses)")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    results = {"components": component_benchmarks(args.repeat, args.iterations)}
+    if args.loop:
+        results["tool_loop"] = await loop_benchmark(args.prompt, args.runs, args.iterations)
+    if args.agent:
+        results["file_agent"] = await agent_benchmark(args.prompt, args.runs)
+
+    for section, entries in results.items():
+        print(f"\n=== {section} ===")
+        for name, values in entries.items():
+            if isinstance(values, dict):
+                print(f"{name:55s} " + "  ".join(f"{key} {value}" for key, value in values.items()))
+            else:
+                print(f"{name:55s} {values}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,5 @@
+-- Document-level ID of the upload that inserted a row.
+-- Long PDFs are ingested page by page; all rows of one document share the ID.
+ALTER TABLE testing_results ADD COLUMN IF NOT EXISTS ingestion_id uuid;
+
+CREATE INDEX IF NOT EXISTS testing_results_ingestion_id_idx ON testing_results (ingestion_id);
@@ -0,0 +1,20 @@
+-- Natural key for idempotent testing_results imports.
+-- Must stay in sync with NATURAL_KEY_SQL in modules/testing_results/writer.py
+ALTER TABLE testing_results ADD COLUMN IF NOT EXISTS natural_key text;
+
+-- Backfill: only the oldest row of each group of existing duplicates gets the key
+UPDATE testing_results t
+SET natural_key = k.natural_key
+FROM (
+    SELECT DISTINCT ON (natural_key) id, natural_key
+    FROM (
+        SELECT id, md5(concat_ws('|', coalesce(test_object, ''), coalesce(testing_date::text, ''), coalesce(result_value::text, ''), coalesce(result_unit, ''), coalesce(testing_institution, ''))) AS natural_key
+        FROM testing_results
+        WHERE natural_key IS NULL
+    ) s
+    ORDER BY natural_key, id
+) k
+WHERE t.id = k.id
+AND NOT EXISTS (SELECT 1 FROM testing_results e WHERE e.natural_key = k.natural_key);
+
+CREATE UNIQUE INDEX IF NOT EXISTS testing_results_natural_key_idx ON testing_results (natural_key);
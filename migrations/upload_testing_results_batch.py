@@ -3,73 +3,86 @@
 Batch upload script for testing results files.
 Processes all files from data/testing_results directory using the same logic
 as the frontend CSV uploader.
+
+Files are processed concurrently (--concurrency) and the status of every file is
+recorded in a checkpoint manifest keyed by file hash, so an interrupted run can be
+continued with --resume: completed files are skipped, failed and unfinished ones
+are processed again. Re-processing a file is safe, rows that already exist are skipped.
 """
 
 import os
 import sys
+import argparse
 import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone
 from pathlib import Path
-import uuid
-import csv
-import io
-import pandas as pd
 from typing import Dict, List, Optional
 import dotenv
 
-# Add current directory to path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
+# Add the repository root to path for imports
+current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, current_dir)
 
-from modules.ai_doctor.ask.ask import Ask
+# Add the agent SDK's .venv site-packages to path if it exists
+agent_sdk_path = os.path.join(current_dir, "agent", "sdk")
+venv_lib_path = os.path.join(agent_sdk_path, ".venv", "lib")
+if os.path.exists(venv_lib_path):
+    # Find the Python version directory
+    python_dirs = [d for d in os.listdir(venv_lib_path) if d.startswith("python")]
+    if python_dirs:
+        python_version_dir = python_dirs[0]  # Use the first Python version found
+        site_packages_path = os.path.join(venv_lib_path, python_version_dir, "site-packages")
+        if os.path.exists(site_packages_path):
+            sys.path.insert(0, site_packages_path)
+
 from modules.youtube_summarizer.src.utils.psql_client import PSQLClient
-from pydantic import BaseModel
-from typing import Optional
+from modules.testing_results.extraction import SUPPORTED_EXTENSIONS, load_instructions
+from modules.testing_results.pipeline import extract_and_validate_file
+from modules.testing_results.writer import bulk_upsert_testing_results
 
-# Define TestingResultRow locally to avoid importing api.py (which triggers FastAPI initialization)
-class TestingResultRow(BaseModel):
-    # id is auto-generated by database, not included in CSV
-    test_object: Optional[str] = None
-    result_value: Optional[float] = None
-    result_unit: Optional[str] = None
-    reference_value: Optional[float] = None
-    comments: Optional[str] = None
-    flag: Optional[str] = None
-    testing_date: Optional[str] = None  # DATE format: YYYY-MM-DD
-    testing_institution: Optional[str] = None
-    testing_location: Optional[str] = None
+DEFAULT_MANIFEST_PATH = Path(__file__).parent / "upload_testing_results_manifest.json"
 
 # Load environment variables
 dotenv.load_dotenv()
 
-# Initialize components
 psql_client = None
-try:
-    connection_string = os.getenv("PSQL_CONNECTION_STRING")
-    if connection_string:
-        psql_client = PSQLClient(connection_string)
-        print("✅ Connected to database")
-    else:
-        print("❌ Error: PSQL_CONNECTION_STRING not set")
+
+
+def connect():
+    """Connect to the database or exit."""
+    global psql_client
+    try:
+        connection_string = os.getenv("PSQL_CONNECTION_STRING")
+        if connection_string:
+            psql_client = PSQLClient(connection_string)
+            print("✅ Connected to database")
+        else:
+            print("❌ Error: PSQL_CONNECTION_STRING not set")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error connecting to database: {e}")
         sys.exit(1)
-except Exception as e:
-    print(f"❌ Error connecting to database: {e}")
-    sys.exit(1)
 
 
 def run_migrations():
     """Run all necessary migrations for testing_results table."""
     migrations_dir = Path(current_dir) / "modules" / "youtube_summarizer" / "sql" / "migrations"
+    local_migrations_dir = Path(__file__).parent / "sql"
     
     # List of migrations to run in order
     migration_files = [
-        "add_testing_date_column.sql",
-        "add_testing_institution_location_columns.sql"
+        migrations_dir / "add_testing_date_column.sql",
+        migrations_dir / "add_testing_institution_location_columns.sql",
+        local_migrations_dir / "add_testing_results_natural_key.sql",
+        local_migrations_dir / "add_testing_results_ingestion_id.sql"
     ]
     
     print(f"\n📋 Running migrations...")
     
-    for migration_file_name in migration_files:
-        migration_file = migrations_dir / migration_file_name
+    for migration_file in migration_files:
+        migration_file_name = migration_file.name
         
         if not migration_file.exists():
             print(f"⚠️  Migration file not found: {migration_file_name}, skipping...")
@@ -113,242 +126,159 @@ def run_migrations():
         return True  # Continue anyway
 
 
-async def process_file(file_path: Path) -> Dict:
+def file_hash(file_path: Path) -> str:
+    """SHA-256 of the file content, used as its key in the manifest."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Checkpoint manifest: a JSON file mapping file hashes to their processing status
+    ("running", "done" or "failed") and results. Saved atomically after every change.
     """
-    Process a single testing results file.
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def is_done(self, key: str) -> bool:
+        return self.entries.get(key, {}).get("status") == "done"
+
+    def update(self, key: str, **fields):
+        entry = self.entries.setdefault(key, {})
+        entry.update(fields, updated_at=datetime.now(timezone.utc).isoformat())
+        self.save()
+
+    def save(self):
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+async def process_file(
+    file_path: Path,
+    key: str,
+    instructions: str,
+    manifest: Manifest,
+    semaphore: asyncio.Semaphore,
+) -> Dict:
+    """
+    Process a single testing results file and record its status in the manifest.
     Returns a dict with success status and details.
     """
     file_name = file_path.name
-    print(f"\n{'='*80}")
-    print(f"📄 Processing: {file_name}")
-    print(f"{'='*80}")
     
-    result = {
-        "file": file_name,
-        "success": False,
-        "rows_inserted": 0,
-        "rows_invalid": 0,
-        "error": None
-    }
+    async with semaphore:
+        print(f"📄 Processing: {file_name}")
+        manifest.update(key, file=file_name, status="running", error=None)
+        result, validated_df = await extract_and_validate_file(file_path, instructions)
     
-    try:
-        # Load agent instructions
-        instructions_path = Path(current_dir) / "agent" / "sdk" / "testing_results_instructions.txt"
-        instructions = ""
-        if instructions_path.exists():
-            with open(instructions_path, 'r', encoding='utf-8') as f:
-                instructions = f.read()
-        else:
-            result["error"] = f"Instructions file not found: {instructions_path}"
-            return result
-        
-        # Determine file type and construct agent prompt
-        file_ext = file_path.suffix.lower()
-        if file_ext == '.pdf':
-            read_command = f"read_pdf_with_vision('{file_path}')"
-        elif file_ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']:
-            read_command = f"read_image('{file_path}')"
-        elif file_ext == '.csv':
-            read_command = f"read_csv('{file_path}')"
-        else:
-            read_command = f"read_file('{file_path}')"
-        
-        # Create agent prompt
-        agent_prompt = f"""{instructions}
-
-Now, please read the file at '{file_path}' using the {read_command} tool and extract all testing results. Return ONLY a valid CSV string matching the exact schema specified above, with no additional text or markdown formatting.
-
-IMPORTANT: You MUST extract at least one test result row. If you cannot find any test results, explain why in your response."""
-        
-        # Run agent - need to use the agent SDK's virtual environment
-        agent_sdk_path = os.path.join(current_dir, "agent", "sdk")
-        sys.path.insert(0, agent_sdk_path)
-        
-        # Add the agent SDK's .venv site-packages to path if it exists
-        venv_lib_path = os.path.join(agent_sdk_path, ".venv", "lib")
-        if os.path.exists(venv_lib_path):
-            # Find the Python version directory
-            python_dirs = [d for d in os.listdir(venv_lib_path) if d.startswith("python")]
-            if python_dirs:
-                python_version_dir = python_dirs[0]  # Use the first Python version found
-                site_packages_path = os.path.join(venv_lib_path, python_version_dir, "site-packages")
-                if os.path.exists(site_packages_path):
-                    sys.path.insert(0, site_packages_path)
-        
-        from file_agent import run_agent_async_with_trace
-        
-        print(f"🤖 Running agent...")
-        agent_result = await run_agent_async_with_trace(agent_prompt)
-        agent_response = agent_result["final_output"]
-        
-        print(f"📤 Agent response received ({len(agent_response)} chars)")
-        
-        # Extract CSV from response
-        csv_content = agent_response.strip()
-        
-        # Try to extract CSV from markdown code blocks
-        if "```csv" in csv_content:
-            parts = csv_content.split("```csv")
-            if len(parts) > 1:
-                csv_content = parts[1].split("```")[0].strip()
-        elif "```" in csv_content:
-            parts = csv_content.split("```")
-            for i, part in enumerate(parts):
-                if i % 2 == 1:  # Odd indices are code blocks
-                    if "test_object" in part and "," in part:
-                        csv_content = part.strip()
-                        break
-        
-        # Find CSV header
-        if "test_object" not in csv_content:
-            lines = csv_content.split('\n')
-            header_line_idx = None
-            for idx, line in enumerate(lines):
-                if 'test_object' in line.lower() and ',' in line:
-                    header_line_idx = idx
-                    break
-            
-            if header_line_idx is not None:
-                csv_content = '\n'.join(lines[header_line_idx:])
-        
-        # Clean up: remove any leading text before the header
-        if "test_object," in csv_content:
-            lines = csv_content.split('\n')
-            for idx, line in enumerate(lines):
-                if line.strip().startswith("test_object,"):
-                    csv_content = '\n'.join(lines[idx:])
-                    break
-        
-        # Parse CSV and validate with Pydantic
-        print(f"📋 Parsing CSV...")
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
-        rows_list = list(csv_reader)
-        
-        if len(rows_list) == 0:
-            result["error"] = "No data rows found in CSV"
-            return result
-        
-        print(f"📊 Found {len(rows_list)} rows in CSV")
-        
-        validated_rows = []
-        invalid_rows = []
-        
-        for idx, row in enumerate(rows_list, start=2):  # Start at 2 (header is row 1)
-            try:
-                # Convert empty strings to None for optional fields
-                cleaned_row = {}
-                for k, v in row.items():
-                    # Skip id if present (auto-generated by database)
-                    if k == 'id':
-                        continue
-                    # Skip reference_unit if present (removed from schema)
-                    if k == 'reference_unit':
-                        continue
-                    cleaned_row[k] = (v if v else None)
-                
-                # Convert numeric fields - must be valid floats if present
-                if cleaned_row.get('result_value'):
-                    try:
-                        cleaned_row['result_value'] = float(cleaned_row['result_value'])
-                    except (ValueError, TypeError):
-                        raise ValueError(f"result_value must be a valid float, got: {cleaned_row.get('result_value')}")
-                else:
-                    cleaned_row['result_value'] = None
-                
-                if cleaned_row.get('reference_value'):
-                    try:
-                        cleaned_row['reference_value'] = float(cleaned_row['reference_value'])
-                    except (ValueError, TypeError):
-                        raise ValueError(f"reference_value must be a valid float, got: {cleaned_row.get('reference_value')}")
-                else:
-                    cleaned_row['reference_value'] = None
-                
-                # Validate testing_date format if present (YYYY-MM-DD)
-                if cleaned_row.get('testing_date'):
-                    import re
-                    date_pattern = r'^\d{4}-\d{2}-\d{2}$'
-                    if not re.match(date_pattern, cleaned_row['testing_date']):
-                        raise ValueError(f"testing_date must be in YYYY-MM-DD format, got: {cleaned_row.get('testing_date')}")
-                else:
-                    cleaned_row['testing_date'] = None
-                
-                # Validate with Pydantic
-                validated_row = TestingResultRow(**cleaned_row)
-                validated_rows.append(validated_row.model_dump())
-            except Exception as e:
-                invalid_rows.append({
-                    "row_number": idx,
-                    "error": str(e)
-                })
-        
-        if not validated_rows:
-            result["error"] = "No valid rows found in CSV after validation"
-            if invalid_rows:
-                result["error"] += f" ({len(invalid_rows)} rows were invalid)"
-            return result
-        
-        print(f"✅ Validated {len(validated_rows)} rows")
-        if invalid_rows:
-            print(f"⚠️  Skipped {len(invalid_rows)} invalid rows")
-        
-        # Insert into database
-        print(f"💾 Inserting into database...")
-        df = pd.DataFrame(validated_rows)
-        
-        psql_client.write(
-            df,
-            "testing_results",
-            "public",
-            write_disposition="append",
-            on_conflict="error"
-        )
-        
-        result["success"] = True
-        result["rows_inserted"] = len(validated_rows)
-        result["rows_invalid"] = len(invalid_rows)
-        print(f"✅ Successfully inserted {len(validated_rows)} rows")
-        
-    except Exception as e:
-        result["error"] = str(e)
-        print(f"❌ Error processing file: {e}")
-        import traceback
-        traceback.print_exc()
+    if validated_df is not None:
+        try:
+            # Insert into database (rows that already exist are skipped)
+            write_result = await asyncio.to_thread(bulk_upsert_testing_results, psql_client, validated_df)
+            result["success"] = True
+            result["rows_inserted"] = write_result["inserted"]
+            result["rows_skipped"] = write_result["skipped"]
+        except Exception as e:
+            result["error"] = f"Database write failed: {str(e)}"
     
+    if result["success"]:
+        print(f"✅ {file_name}: inserted {result['rows_inserted']} rows ({result['rows_skipped']} already existed)")
+    else:
+        print(f"❌ {file_name}: {result['error']}")
+    
+    manifest.update(
+        key,
+        status="done" if result["success"] else "failed",
+        rows_inserted=result["rows_inserted"],
+        rows_skipped=result["rows_skipped"],
+        rows_invalid=result["rows_invalid"],
+        error=result["error"],
+    )
     return result
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch upload testing results files")
+    parser.add_argument(
+        "--data-dir", type=Path, default=Path(current_dir) / "data" / "testing_results",
+        help="Directory with the testing results files"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Number of files processed at the same time (default: 4)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Skip files the manifest records as done"
+    )
+    parser.add_argument(
+        "--manifest", type=Path, default=DEFAULT_MANIFEST_PATH,
+        help=f"Checkpoint manifest path (default: {DEFAULT_MANIFEST_PATH.name})"
+    )
+    return parser.parse_args()
+
+
 async def main():
     """Main function to process all files."""
+    args = parse_args()
+    
     print("="*80)
     print("🚀 Batch Testing Results Upload Script")
     print("="*80)
     
+    connect()
+    
     # Run migrations first
     run_migrations()
     
     # Get all files from data/testing_results
-    data_dir = Path(current_dir) / "data" / "testing_results"
+    data_dir = args.data_dir
     
     if not data_dir.exists():
         print(f"❌ Directory not found: {data_dir}")
         sys.exit(1)
     
     # Find all PDF, CSV, and image files
-    valid_extensions = ['.pdf', '.csv', '.png', '.jpg', '.jpeg', '.gif', '.webp']
-    files = [f for f in data_dir.iterdir() if f.is_file() and f.suffix.lower() in valid_extensions]
+    files = sorted(f for f in data_dir.iterdir() if f.is_file() and f.suffix.lower() in SUPPORTED_EXTENSIONS)
     
     if not files:
         print(f"❌ No valid files found in {data_dir}")
         sys.exit(1)
     
-    print(f"\n📁 Found {len(files)} files to process")
+    try:
+        instructions = load_instructions()
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    manifest = Manifest(args.manifest)
+    keyed_files = {}
+    for file_path in files:
+        # Identical files are processed once
+        keyed_files.setdefault(file_hash(file_path), file_path)
+    
+    pending = {
+        key: path for key, path in keyed_files.items()
+        if not (args.resume and manifest.is_done(key))
+    }
+    print(f"\n📁 Found {len(files)} files, {len(keyed_files) - len(pending)} already done, {len(pending)} to process")
+    print(f"   Concurrency: {args.concurrency}, manifest: {args.manifest}")
     
-    # Process files sequentially (to avoid overwhelming the API)
-    results = []
-    for i, file_path in enumerate(files, 1):
-        print(f"\n[{i}/{len(files)}] Processing {file_path.name}...")
-        result = await process_file(file_path)
-        results.append(result)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = await asyncio.gather(*[
+        process_file(path, key, instructions, manifest, semaphore)
+        for key, path in pending.items()
+    ])
     
     # Print summary
     print("\n" + "="*80)
@@ -366,6 +296,8 @@ async def main():
         print("\n   Files:")
         for r in successful:
             print(f"   - {r['file']}: {r['rows_inserted']} rows inserted")
+            if r['rows_skipped'] > 0:
+                print(f"     (♻️  {r['rows_skipped']} rows already existed)")
             if r['rows_invalid'] > 0:
                 print(f"     (⚠️  {r['rows_invalid']} invalid rows skipped)")
     
@@ -374,10 +306,10 @@ async def main():
         print("\n   Files:")
         for r in failed:
             print(f"   - {r['file']}: {r['error']}")
+        print("\n   Re-run with --resume to retry only the failed files")
     
     print("\n" + "="*80)
 
 
 if __name__ == "__main__":
     asyncio.run(main())
-
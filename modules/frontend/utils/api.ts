@@ -97,6 +97,69 @@ export async function askQuestion(prompt: string, preferences?: any, maxIteratio
     }
 }
 
+export interface AskStreamEvent {
+    type: 'tool_call_started' | 'tool_call_finished' | 'sql_executed' | 'answer_delta' | 'done' | 'error';
+    [key: string]: any;
+}
+
+export async function askQuestionStream(
+    prompt: string,
+    onEvent: (event: AskStreamEvent) => void,
+    preferences?: any,
+    maxIterations?: number
+): Promise<string> {
+    const requestBody: any = { prompt };
+    if (preferences) {
+        requestBody.preferences = preferences;
+    }
+    if (maxIterations !== undefined) {
+        requestBody.max_iterations = maxIterations;
+    }
+
+    const response = await fetch('http://localhost:3002/ask/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(requestBody),
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    // Server-sent events: "event: <type>\ndata: <json>\n\n"
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        let separator;
+        while ((separator = buffer.indexOf('\n\n')) !== -1) {
+            const chunk = buffer.slice(0, separator);
+            buffer = buffer.slice(separator + 2);
+            const data = chunk.split('\n').find(line => line.startsWith('data: '));
+            if (!data) {
+                continue;
+            }
+            const event: AskStreamEvent = JSON.parse(data.slice(6));
+            onEvent(event);
+            if (event.type === 'answer_delta') {
+                answer += event.delta;
+            } else if (event.type === 'done') {
+                answer = event.result || answer;
+            } else if (event.type === 'error') {
+                throw new Error(event.error);
+            }
+        }
+    }
+    return answer;
+}
+
 export async function uploadTestingResults(file: File): Promise<{success: boolean, file_id?: string, file_path?: string, filename?: string}> {
     try {
         const formData = new FormData();
@@ -120,6 +183,41 @@ export async function uploadTestingResults(file: File): Promise<{success: boolea
     }
 }
 
+export interface TestingResultsFileSummary {
+    file: string;
+    success: boolean;
+    rows_extracted?: number;
+    rows_inserted?: number;
+    rows_skipped?: number;
+    rows_invalid?: number;
+    invalid_row_numbers?: number[];
+    trace_id?: string | null;
+    error?: string | null;
+}
+
+export async function uploadTestingResultsBatch(files: File[]): Promise<{success: boolean, message: string, rows_inserted: number, rows_skipped: number, files: TestingResultsFileSummary[]}> {
+    try {
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file));
+
+        const response = await fetch('http://localhost:3002/upload-testing-results/batch', {
+            method: 'POST',
+            body: formData,
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.detail || errorData.error || `HTTP error! status: ${response.status}`);
+        }
+
+        const data = await response.json();
+        return data;
+    } catch (error) {
+        console.error('Error uploading testing results batch:', error);
+        throw error;
+    }
+}
+
 export async function processTestingResults(fileId: string): Promise<{success: boolean, message: string, rows_inserted?: number}> {
     try {
         const response = await fetch('http://localhost:3002/process-testing-results', {
@@ -1,11 +1,17 @@
-from llm.openai.client import OpenAIClient
+from modules.llm.openai.client import OpenAIClient
 from dotenv import load_dotenv
 import os
+import re
 import json
-from typing import Tuple
+import time
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import hashlib
 from modules.youtube_summarizer.src.utils.psql_client import PSQLClient
+from modules.llm.openai.async_client import run_sync
+from modules.llm.memo_store import LLMMemoStore, memo_key
 
 load_dotenv()
 
@@ -16,16 +22,112 @@ class LLMResult(BaseModel):
     template_path: str
     injecting: dict
     answer: str
+    error: Optional[str] = None
+
+
+PLACEHOLDER_PATTERN = re.compile(r"\*\* (.+?) \*\*")
+
+
+class CompiledTemplate:
+    """
+    A prompt template split once into literal text and ** key ** placeholders,
+    so rendering is a single join instead of one str.replace per placeholder.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # split() with a capturing group puts the placeholder keys at odd indices
+        self.parts = PLACEHOLDER_PATTERN.split(text)
+        self.keys = set(self.parts[1::2])
+
+    def render(self, injecting_text: dict) -> str:
+        """
+        Inject the values into the placeholders. Placeholders without a value are
+        kept as written.
+        """
+        for key in injecting_text:
+            if key not in self.keys:
+                print(f"WARNING: Placeholder ** {key} ** not found in text. Cant inject.")
+        return "".join(
+            str(injecting_text.get(part, f"** {part} **")) if index % 2 else part
+            for index, part in enumerate(self.parts)
+        )
+
+
+# Template path -> (mtime, compiled template); a changed file is compiled again
+_template_cache: Dict[str, Tuple[float, CompiledTemplate]] = {}
+_template_cache_lock = threading.Lock()
+
+
+def load_template(template_path: str) -> CompiledTemplate:
+    """Return the compiled template of a file, read only when the file changed."""
+    mtime = os.path.getmtime(template_path)
+    with _template_cache_lock:
+        cached = _template_cache.get(template_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(template_path, "r") as f:
+        template = CompiledTemplate(f.read())
+    with _template_cache_lock:
+        _template_cache[template_path] = (mtime, template)
+    return template
+
+
+class AsyncRateLimiter:
+    """Spaces out calls to at most requests_per_minute (None: no limit)."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
 
 
 class LLMProcessor:
-    def __init__(self, client: str, use_tools: bool = False, use_response_api: bool = False):
+    def __init__(
+        self,
+        client: str,
+        use_tools: bool = False,
+        use_response_api: bool = False,
+        memo_store: Optional[LLMMemoStore] = None
+    ):
+        """
+        Args:
+            client: LLM provider, only "openai" is supported
+            use_tools: Answer with the SQL tool loop
+            use_response_api: Use the Responses API instead of chat completions
+            memo_store: Store of previous answers; identical prompts are answered from
+                it. Defaults to the store configured by LLM_MEMO_PATH, if any.
+        """
         if client == "openai":
             API_KEY = os.getenv("OPENAI_API_KEY")
             self.openai_client = OpenAIClient(API_KEY, use_tools=use_tools, use_response_api=use_response_api)
         else:
             raise ValueError(f"Client {client} not supported")
         self.psql_client = PSQLClient(os.getenv("PSQL_CONNECTION_STRING"))
+        self.memo_store = memo_store if memo_store is not None else LLMMemoStore.from_env()
+
+    def _model_name(self) -> str:
+        """Model and mode the answers come from (part of the memo key)."""
+        if self.openai_client.use_tools:
+            return "gpt-5:tools"
+        if self.openai_client.use_response_api:
+            return "gpt-5:responses"
+        return f"{self.openai_client.model}:chat"
+
+    def _memo_key(self, template: "CompiledTemplate", injecting: dict, return_format: str) -> Optional[str]:
+        if self.memo_store is None:
+            return None
+        return memo_key(template.text, injecting, self._model_name(), return_format)
 
     def _validate_return_format(self, return_format: str):
         accepted_return_formats = ["json", "text"]
@@ -38,12 +140,7 @@ class LLMProcessor:
         """
         Injecting text into the prompt for placeholders.
         """
-        for key, value in injecting_text.items():
-            placeholder = f"** {key} **"
-            if placeholder not in text:
-                print(f"WARNING: Placeholder {placeholder} not found in text. Cant inject.")
-            text = text.replace(f"** {key} **", value)
-        return text
+        return CompiledTemplate(text).render(injecting_text)
 
     def _clean_response(self, response: str, return_format: str) -> dict:
         if return_format == "json":
@@ -52,14 +149,31 @@ class LLMProcessor:
             response = response
         return response
 
-    def _return_valid_json(self, response: str) -> str:
+    def _parse_json(self, response: str) -> Optional[str]:
+        """The reply as compact JSON, or None if it is not valid JSON."""
         response = response.replace("```json", "").replace("```", "").replace("\n", "")
         try:
-            response = json.loads(response)
-            response = json.dumps(response)
-        except Exception as e:
+            return json.dumps(json.loads(response))
+        except Exception:
+            return None
+
+    def _return_valid_json(self, response: str) -> str:
+        parsed = self._parse_json(response)
+        if parsed is None:
             print("WARNING: Response is not a valid JSON: ", response)
             return '{}'
+        return parsed
+
+    def _memoizable_answer(self, response: str, return_format: str) -> Optional[str]:
+        """
+        The cleaned answer if it is worth storing in the memo store, else None.
+        The '{}' fallback of an unparsable JSON reply is not stored, so the prompt is
+        asked again on the next run instead of failing until the entry expires.
+        """
+        if not response:
+            return None
+        if return_format == "json":
+            return self._parse_json(response)
         return response
 
     def start(
@@ -70,10 +184,15 @@ class LLMProcessor:
         max_iterations: int = None
     ) -> LLMResult:
         self._validate_return_format(return_format)
-        prompt = open(template_path, "r").read()
-        prompt = self._prepare_prompt(prompt, injecting)
-        response = self.openai_client.ask(prompt, max_iterations=max_iterations)
-        response = self._clean_response(response, return_format)
+        template = load_template(template_path)
+        key = self._memo_key(template, injecting, return_format)
+        response = self.memo_store.get(key) if key else None
+        if response is None:
+            raw_response = self.openai_client.ask(template.render(injecting), max_iterations=max_iterations)
+            response = self._clean_response(raw_response, return_format)
+            memo_answer = self._memoizable_answer(raw_response, return_format) if key else None
+            if memo_answer:
+                self.memo_store.put(key, memo_answer, self._model_name())
         llm_result = {
             "template_path": template_path,
             "injecting": injecting,
@@ -82,6 +201,78 @@ class LLMProcessor:
         llm_result = LLMResult(**llm_result)
         return llm_result
 
+    async def start_many_async(
+        self,
+        template_path: str,
+        injections: List[dict],
+        return_format: str,
+        concurrency: int = 8,
+        requests_per_minute: Optional[float] = None,
+        max_iterations: int = None
+    ) -> List[LLMResult]:
+        """
+        Run the template for many injections concurrently.
+
+        Args:
+            template_path: Prompt template with ** key ** placeholders
+            injections: One dict of placeholder values per prompt
+            return_format: "json" or "text"
+            concurrency: Maximum number of prompts in flight
+            requests_per_minute: Maximum rate at which prompts are started (None: no limit)
+            max_iterations: Maximum tool iterations per prompt (tools clients only)
+
+        Returns:
+            One result per injection, in the order of the injections. A failed prompt
+            has an empty answer and the error message in error. Prompts answered
+            before are served from the memo store (if there is one) without a call.
+        """
+        self._validate_return_format(return_format)
+        template = load_template(template_path)
+        semaphore = asyncio.Semaphore(concurrency)
+        rate_limiter = AsyncRateLimiter(requests_per_minute)
+
+        async def run_one(injecting: dict) -> LLMResult:
+            key = self._memo_key(template, injecting, return_format)
+            if key:
+                answer = await asyncio.to_thread(self.memo_store.get, key)
+                if answer is not None:
+                    return LLMResult(template_path=template_path, injecting=injecting, answer=answer)
+            async with semaphore:
+                await rate_limiter.wait()
+                try:
+                    response = await self.openai_client.ask_async(
+                        template.render(injecting), max_iterations=max_iterations
+                    )
+                    answer, error = self._clean_response(response, return_format), None
+                    memo_answer = self._memoizable_answer(response, return_format) if key else None
+                    if memo_answer:
+                        await asyncio.to_thread(self.memo_store.put, key, memo_answer, self._model_name())
+                except Exception as e:
+                    print(f"WARNING: Prompt failed for injection {list(injecting.keys())}: {e}")
+                    answer, error = "", str(e)
+            return LLMResult(template_path=template_path, injecting=injecting, answer=answer, error=error)
+
+        return list(await asyncio.gather(*[run_one(injecting) for injecting in injections]))
+
+    def start_many(
+        self,
+        template_path: str,
+        injections: List[dict],
+        return_format: str,
+        concurrency: int = 8,
+        requests_per_minute: Optional[float] = None,
+        max_iterations: int = None
+    ) -> List[LLMResult]:
+        """Blocking start_many_async, runs on the shared background event loop."""
+        return run_sync(self.start_many_async(
+            template_path,
+            injections,
+            return_format,
+            concurrency=concurrency,
+            requests_per_minute=requests_per_minute,
+            max_iterations=max_iterations,
+        ))
+
 
 if __name__ == "__main__":
     template_path = "youtube_summarizer/llm/prompts/tools.txt"
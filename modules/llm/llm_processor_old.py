@@ -1,7 +1,7 @@
 
 
 
-from llm.openai.client import OpenAIClient
+from modules.llm.openai.client import OpenAIClient
 from dotenv import load_dotenv
 import os
 import json
@@ -0,0 +1,136 @@
+"""
+Persistent memo store for LLM answers (SQLite).
+Answers are keyed by a hash of the template content, the injected values, the
+model and the return format, so re-running a prompt pipeline only pays for the
+prompts that are new. Entries expire after a TTL, the least recently used entries
+are evicted above max_entries, and hits and misses are counted in the database so
+hit rates survive restarts.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def memo_key(template_text: str, injecting: dict, model: str, return_format: str) -> str:
+    """SHA-256 of everything that determines the answer of a prompt."""
+    payload = json.dumps(
+        {
+            "template": hashlib.sha256(template_text.encode("utf-8")).hexdigest(),
+            "injecting": injecting,
+            "model": model,
+            "return_format": return_format,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMMemoStore:
+    """Thread-safe SQLite store of LLM answers with TTL, LRU eviction and hit counters."""
+
+    def __init__(self, path: str, ttl_seconds: float = 30 * 24 * 3600, max_entries: int = 100000):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            ttl_seconds: Time after which an answer is no longer returned
+            max_entries: Maximum number of stored answers
+        """
+        self.path = str(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_memo (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS llm_memo_last_used ON llm_memo (last_used_at)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_memo_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self._connection.execute(
+                "INSERT OR IGNORE INTO llm_memo_stats (name, value) VALUES ('hits', 0), ('misses', 0)"
+            )
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMMemoStore"]:
+        """Store configured by LLM_MEMO_PATH (and LLM_MEMO_TTL_SECONDS, LLM_MEMO_MAX_ENTRIES), or None."""
+        path = os.getenv("LLM_MEMO_PATH")
+        if not path:
+            return None
+        return cls(
+            path,
+            ttl_seconds=float(os.getenv("LLM_MEMO_TTL_SECONDS", str(30 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_MEMO_MAX_ENTRIES", "100000")),
+        )
+
+    def _count(self, name: str):
+        self._connection.execute("UPDATE llm_memo_stats SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored answer, or None if there is none or it expired."""
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT answer FROM llm_memo WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            self._connection.execute("UPDATE llm_memo SET last_used_at = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return row[0]
+
+    def put(self, key: str, answer: str, model: str = ""):
+        """Store an answer, then drop expired entries and the least recently used ones above max_entries."""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_memo (key, model, answer, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, answer, now, now),
+            )
+            self._connection.execute("DELETE FROM llm_memo WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._connection.execute(
+                """
+                DELETE FROM llm_memo WHERE key IN (
+                    SELECT key FROM llm_memo ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters (since the store was created) and the number of answers."""
+        with self._lock:
+            counters = dict(self._connection.execute("SELECT name, value FROM llm_memo_stats").fetchall())
+            entries = self._connection.execute("SELECT COUNT(*) FROM llm_memo").fetchone()[0]
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
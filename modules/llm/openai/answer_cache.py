@@ -0,0 +1,216 @@
+"""
+Answer cache for /ask (the "question cacher" of the backlog).
+Answers are keyed by the normalized prompt plus the preference payload. A lookup
+tries the exact key first and then a local TF-IDF cosine match against the cached
+prompts with the same preferences and the same content words (only filler words may
+differ). Entries expire after a TTL, the least recently
+used entry is evicted when the cache is full, and writers invalidate the answers
+that read from the tables they change.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Filler words that do not change what a question asks for. Everything else (entities such
+# as topics and channel ids, numbers, negations, comparisons, question words) is content,
+# and a similar prompt must have exactly the same content words
+STOPWORDS = frozenset({
+    "a", "an", "the", "of", "for", "to", "in", "on", "about", "by", "with", "from", "at", "as",
+    "is", "are", "was", "were", "be", "been", "do", "does", "did", "me", "my", "i", "you", "your",
+    "we", "us", "our", "please", "can", "could", "would", "will", "give", "show", "list", "tell",
+    "find", "get", "all", "there", "that", "this", "these", "those", "it", "its", "their", "them",
+    "they", "has", "have", "had",
+})
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Fold case and whitespace and drop trailing punctuation of a prompt."""
+    return re.sub(r"\s+", " ", prompt.lower()).strip().rstrip("?!. ")
+
+
+def preferences_key(preferences: Optional[Dict]) -> str:
+    """Stable hash of the preference payload (None and empty preferences are the same)."""
+    if not preferences:
+        return ""
+    payload = json.dumps(preferences, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def tokenize(normalized_prompt: str) -> Counter:
+    return Counter(TOKEN_PATTERN.findall(normalized_prompt))
+
+
+def content_tokens(tokens: Counter) -> FrozenSet[str]:
+    """The words of a prompt that are not STOPWORDS, which a similar prompt must share exactly."""
+    return frozenset(token for token in tokens if token not in STOPWORDS)
+
+
+class AnswerCache:
+    """
+    Thread-safe TTL + LRU cache of /ask answers with exact and similarity lookup.
+    Cached answers are shared, callers must not modify them.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 500, similarity_threshold: float = 0.9):
+        """
+        Args:
+            ttl_seconds: Time after which an entry is no longer returned
+            max_entries: Maximum number of cached answers
+            similarity_threshold: Minimum TF-IDF cosine similarity (0-1) of a prompt
+                to a cached prompt to reuse its answer; above 1 disables similarity lookup
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        # Inverted index token -> keys and document frequencies for the similarity lookup
+        self._keys_by_token: Dict[str, set] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key)
+        for token in entry["tokens"]:
+            keys = self._keys_by_token[token]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_token[token]
+
+    def _idf(self, token: str) -> float:
+        return math.log((len(self._entries) + 1) / (len(self._keys_by_token.get(token, ())) + 1)) + 1
+
+    def _cosine(self, a: Counter, b: Counter) -> float:
+        weights = {token: self._idf(token) for token in a.keys() | b.keys()}
+        dot = sum(a[token] * b[token] * weights[token] ** 2 for token in a.keys() & b.keys())
+        norm_a = math.sqrt(sum((count * weights[token]) ** 2 for token, count in a.items()))
+        norm_b = math.sqrt(sum((count * weights[token]) ** 2 for token, count in b.items()))
+        return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+    def _find_similar(self, prefs: str, tokens: Counter) -> Optional[Tuple[str, str]]:
+        # TF-IDF gives a single swapped entity ("detox" -> "sleep") almost no weight, so
+        # only prompts with the same content words are compared, on their content words
+        content = content_tokens(tokens)
+        content_counts = Counter({token: count for token, count in tokens.items() if token in content})
+        candidates = set()
+        for token in tokens:
+            candidates.update(key for key in self._keys_by_token.get(token, ()) if key[1] == prefs)
+        best_key, best_score = None, self.similarity_threshold
+        for key in candidates:
+            entry = self._entries[key]
+            if entry["content"] != content:
+                continue
+            entry_counts = Counter({token: count for token, count in entry["tokens"].items() if token in content})
+            score = self._cosine(content_counts, entry_counts)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, prompt: str, preferences: Optional[Dict] = None) -> Optional[Any]:
+        """Return the cached answer to a prompt (or a similar one), or None."""
+        normalized = normalize_prompt(prompt)
+        prefs = preferences_key(preferences)
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry["expires_at"] < now]
+            for key in expired:
+                self._remove(key)
+
+            key = (normalized, prefs)
+            if key in self._entries:
+                self.exact_hits += 1
+            elif self.similarity_threshold <= 1:
+                key = self._find_similar(prefs, tokenize(normalized))
+                if key is not None:
+                    self.similar_hits += 1
+            else:
+                key = None
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]["answer"]
+
+    def put(self, prompt: str, preferences: Optional[Dict], answer: Any, tables: Iterable[str] = ()):
+        """
+        Cache the answer to a prompt.
+
+        Args:
+            prompt: The question as asked
+            preferences: Preference payload the answer was generated with
+            answer: The answer
+            tables: Tables and views the answer was generated from
+        """
+        normalized = normalize_prompt(prompt)
+        key = (normalized, preferences_key(preferences))
+        tokens = tokenize(normalized)
+        entry = {
+            "expires_at": time.monotonic() + self.ttl_seconds,
+            "tables": frozenset(table.split(".")[-1].lower() for table in tables),
+            "tokens": tokens,
+            "content": content_tokens(tokens),
+            "answer": answer,
+        }
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for token in entry["tokens"]:
+                self._keys_by_token[token].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        Drop the answers that read from any of the given tables.
+        Answers that read from views (v_*) or whose tables are unknown are dropped as well.
+
+        Returns:
+            Number of dropped entries
+        """
+        tables: FrozenSet[str] = frozenset(table.split(".")[-1].lower() for table in tables)
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if not entry["tables"]
+                or entry["tables"] & tables
+                or any(table.startswith("v_") for table in entry["tables"])
+            ]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_token.clear()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the number of cached answers."""
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+
+answer_cache = AnswerCache(
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500")),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.9")),
+)
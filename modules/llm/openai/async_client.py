@@ -0,0 +1,140 @@
+"""
+Shared, pooled OpenAI clients.
+All modules get their OpenAI client here instead of constructing their own, so HTTP
+connections (and TLS sessions) are kept alive and reused, and pool limits, timeouts
+and retries are configured in one place (OPENAI_* env vars).
+With OPENAI_HTTP_MODE=record|replay the clients record or replay their traffic
+(see replay.py).
+
+An AsyncOpenAI client's connection pool is bound to the event loop it is used on,
+so one client is kept per event loop and API key (OPENAI_API_KEY unless another key
+is passed or set with use_openai_api_key). Sync code runs coroutines with run_sync
+on a long-lived background loop, which keeps its own pooled clients.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Coroutine, Dict, Optional, TypeVar
+
+import httpx
+from openai import AsyncOpenAI
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "600"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "10"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_HTTP_MODE = os.getenv("OPENAI_HTTP_MODE", "live")
+OPENAI_FIXTURE_PATH = os.getenv("OPENAI_FIXTURE_PATH", "benchmarks/fixtures/openai.jsonl")
+OPENAI_REPLAY_LATENCY_SECONDS = os.getenv("OPENAI_REPLAY_LATENCY_SECONDS", "0")
+
+T = TypeVar("T")
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Optional[str], AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_clients_lock = threading.Lock()
+# API key of the current request, for code that gets its client without passing one
+_api_key: ContextVar[Optional[str]] = ContextVar("openai_api_key", default=None)
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _create_transport(mode: str) -> httpx.AsyncBaseTransport:
+    # Imported here, replay.py is only needed for recording and benchmarks
+    from modules.llm.openai.replay import RecordingTransport, ReplayTransport
+
+    if mode == "replay":
+        latency = OPENAI_REPLAY_LATENCY_SECONDS
+        return ReplayTransport(OPENAI_FIXTURE_PATH, latency if latency == "recorded" else float(latency))
+    if mode == "record":
+        return RecordingTransport(OPENAI_FIXTURE_PATH, httpx.AsyncHTTPTransport(limits=_limits()))
+    raise ValueError(f"Unknown OPENAI_HTTP_MODE: {mode}")
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def create_async_openai_client(
+    api_key: Optional[str] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> AsyncOpenAI:
+    """
+    Create an AsyncOpenAI client with the configured pool limits, timeouts and retries.
+    A transport (e.g. a ReplayTransport) replaces the network connection pool.
+    """
+    if transport is None and OPENAI_HTTP_MODE != "live":
+        transport = _create_transport(OPENAI_HTTP_MODE)
+    http_client = httpx.AsyncClient(
+        limits=_limits(),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+        transport=transport,
+    )
+    return AsyncOpenAI(
+        # Replayed traffic needs no key, the SDK only requires one to be set
+        api_key=api_key or os.getenv("OPENAI_API_KEY") or ("replay" if transport is not None else None),
+        http_client=http_client,
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+
+
+@contextmanager
+def use_openai_api_key(api_key: Optional[str]):
+    """Make the shared clients fetched in this context use the given API key."""
+    token = _api_key.set(api_key)
+    try:
+        yield
+    finally:
+        _api_key.reset(token)
+
+
+def get_async_openai_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client of the running event loop for an API key
+    (default: the key set with use_openai_api_key, then OPENAI_API_KEY).
+    Must be called from a coroutine (or a callback) running on that loop.
+    """
+    api_key = api_key or _api_key.get()
+    if api_key == os.getenv("OPENAI_API_KEY"):
+        # The environment key shares the default client
+        api_key = None
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = _clients.get(loop)
+        if clients is None:
+            clients = _clients[loop] = {}
+        client = clients.get(api_key)
+        if client is None:
+            client = clients[api_key] = create_async_openai_client(api_key)
+        return client
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever, name="openai-client-loop", daemon=True
+            ).start()
+        return _background_loop
+
+
+def run_sync(coroutine: Coroutine[None, None, T]) -> T:
+    """
+    Run a coroutine from sync code on the shared background event loop and wait for it.
+    The caller's context variables (e.g. the usage tracker) are visible to the coroutine.
+    Must not be called from a coroutine running on the background loop itself.
+    """
+    loop = _get_background_loop()
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
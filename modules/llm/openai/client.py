@@ -1,6 +1,6 @@
-from openai import OpenAI
 from typing import List, Optional
-from llm.openai.tools import generate_completion_with_tools
+from modules.llm.openai.async_client import get_async_openai_client, run_sync, use_openai_api_key
+from modules.llm.openai.tools import generate_completion_with_tools_async
 import os
 
 class OpenAIClient:
@@ -14,13 +14,19 @@ class OpenAIClient:
         model="gpt-5-mini-2025-08-07" # gpt-5-mini # o4-mini-2025-04-16
     ):
         """Initialize OpenAI client with API key."""
-        self.client = OpenAI(api_key=api_key)
+        # Requests go through the shared pooled client of this key (see async_client.py)
+        self.api_key = api_key
         self.model = model
         self.use_tools = use_tools
         self.use_response_api = use_response_api
         self.max_iterations = max_iterations
 
-    def _generate_completion(
+    @property
+    def client(self):
+        """Shared pooled AsyncOpenAI client of the running event loop for this client's API key."""
+        return get_async_openai_client(self.api_key)
+
+    async def _generate_completion(
         self,
         prompt: str,
         tools: list = [],
@@ -39,9 +45,7 @@ class OpenAIClient:
         Returns:
             Generated text response
         """
-        from openai import OpenAI
-        client = OpenAI()
-        completion = client.chat.completions.create(
+        completion = await self.client.chat.completions.create(
             model=self.model,
             store=True,
             messages=[
@@ -51,28 +55,34 @@ class OpenAIClient:
 
         return completion.choices[0].message.content
 
-    def _response_api(self, prompt: str):
+    async def _response_api(self, prompt: str):
 
-        response = self.client.responses.create(
+        response = await self.client.responses.create(
             model="gpt-5",
             input=prompt
         )
 
         return response.output_text
 
-    def _wrapped_generate_completion_with_tools(self, prompt: str, max_iterations: int = None):
+    async def _wrapped_generate_completion_with_tools(self, prompt: str, max_iterations: int = None):
         # Use instance max_iterations if not provided
         iterations = max_iterations if max_iterations is not None else self.max_iterations
-        response = generate_completion_with_tools(prompt, max_iterations=iterations)
+        response = await generate_completion_with_tools_async(prompt, max_iterations=iterations)
         return response.result if hasattr(response, 'result') else str(response)
 
+    async def ask_async(self, prompt: str, max_iterations: int = None) -> str:
+        # The tool loop gets its client itself, so it takes the key from the context
+        with use_openai_api_key(self.api_key):
+            if self.use_tools:
+                return await self._wrapped_generate_completion_with_tools(prompt, max_iterations=max_iterations)
+            elif self.use_response_api:
+                return await self._response_api(prompt)
+            else:
+                return await self._generate_completion(prompt)
+
     def ask(self, prompt: str, max_iterations: int = None) -> str:
-        if self.use_tools:
-            return self._wrapped_generate_completion_with_tools(prompt, max_iterations=max_iterations)
-        elif self.use_response_api:
-            return self._response_api(prompt)
-        else:
-            return self._generate_completion(prompt)
+        """Blocking ask, runs ask_async on the shared background event loop."""
+        return run_sync(self.ask_async(prompt, max_iterations=max_iterations))
 
 
 if __name__ == "__main__":
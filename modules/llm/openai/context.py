@@ -0,0 +1,147 @@
+"""
+Token-budgeted conversation context for the Responses API tool loop.
+Every item is counted once when it is added (tiktoken if installed, otherwise about
+four characters per token) and a running total is kept. When the total exceeds the
+budget, old tool outputs are shortened first and whole old turns are dropped next.
+The items of one model response (reasoning, function calls, message) and the outputs
+of its function calls form one turn and are only ever dropped together, so a
+function_call is never separated from its function_call_output.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "150000"))
+STUB_PREVIEW_CHARS = 200
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens of a text (estimated if tiktoken is not installed)."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def _field(item, name: str, default=None):
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+def item_text(item) -> str:
+    """The part of an input item that is sent to the model as text."""
+    item_type = _field(item, "type")
+    if item_type == "function_call_output":
+        return str(_field(item, "output", ""))
+    if item_type == "function_call":
+        return f"{_field(item, 'name', '')}({_field(item, 'arguments', '')})"
+    content = _field(item, "content")
+    if content is None and item_type == "reasoning":
+        content = _field(item, "summary")
+    if isinstance(content, str):
+        return content
+    if content is None:
+        return ""
+    if hasattr(content, "__iter__"):
+        parts = []
+        for part in content:
+            text = _field(part, "text")
+            parts.append(text if isinstance(text, str) else json.dumps(part, default=str))
+        return "\n".join(parts)
+    return str(content)
+
+
+class TokenBudgetContext:
+    """
+    Input list of the tool loop with a token budget.
+    Adding an item is O(1); eviction touches every item at most twice (stub, drop).
+    """
+
+    def __init__(self, max_tokens: int = CONTEXT_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.total_tokens = 0
+        self._entries: List[Dict[str, Any]] = []
+        self._turns: List[List[Dict[str, Any]]] = []
+        self._turn_by_call_id: Dict[str, List[Dict[str, Any]]] = {}
+        # Outputs in the order they were added, next one to stub at _next_stub
+        self._outputs: List[Dict[str, Any]] = []
+        self._next_stub = 0
+        self._next_drop = 0
+
+    def _add(self, item, turn: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        entry = {"item": item, "tokens": count_tokens(item_text(item)), "removed": False, "turn": turn}
+        self._entries.append(entry)
+        self.total_tokens += entry["tokens"]
+        if turn is not None:
+            turn.append(entry)
+        return entry
+
+    def append(self, item):
+        """Add a message (e.g. system or user) that is never evicted."""
+        self._add(item, None)
+        self._enforce_budget()
+
+    def add_response_output(self, output_items: Iterable):
+        """Add the output items of one model response as a new turn."""
+        turn: List[Dict[str, Any]] = []
+        self._turns.append(turn)
+        for item in output_items:
+            self._add(item, turn)
+            if _field(item, "type") == "function_call":
+                self._turn_by_call_id[_field(item, "call_id")] = turn
+        self._enforce_budget()
+
+    def add_tool_outputs(self, outputs: Iterable[Dict[str, Any]]):
+        """Add function_call_output items to the turns of their function calls."""
+        for output in outputs:
+            turn = self._turn_by_call_id.get(output.get("call_id"))
+            self._outputs.append(self._add(output, turn))
+        self._enforce_budget()
+
+    def items(self) -> List:
+        """The current input list, in order."""
+        return [entry["item"] for entry in self._entries if not entry["removed"]]
+
+    def _stub(self, entry: Dict[str, Any]):
+        output = str(entry["item"].get("output", ""))
+        preview = output[:STUB_PREVIEW_CHARS]
+        entry["item"] = {
+            **entry["item"],
+            "output": f"[Older tool output shortened to save context, {entry['tokens']} tokens] {preview}...",
+        }
+        new_tokens = count_tokens(entry["item"]["output"])
+        self.total_tokens += new_tokens - entry["tokens"]
+        entry["tokens"] = new_tokens
+
+    def _enforce_budget(self):
+        if self.total_tokens <= self.max_tokens:
+            return
+        latest_turn = self._turns[-1] if self._turns else None
+
+        # 1. Shorten old tool outputs, oldest first (outputs of the latest turn stay)
+        while self.total_tokens > self.max_tokens and self._next_stub < len(self._outputs):
+            entry = self._outputs[self._next_stub]
+            if entry["turn"] is latest_turn and entry["turn"] is not None:
+                break
+            self._next_stub += 1
+            # Outputs that are already short are not worth a stub
+            if not entry["removed"] and entry["tokens"] > STUB_PREVIEW_CHARS // 2:
+                self._stub(entry)
+
+        # 2. Drop whole old turns, oldest first (never the latest one)
+        while self.total_tokens > self.max_tokens and self._next_drop < len(self._turns) - 1:
+            turn = self._turns[self._next_drop]
+            self._next_drop += 1
+            for entry in turn:
+                if not entry["removed"]:
+                    entry["removed"] = True
+                    self.total_tokens -= entry["tokens"]
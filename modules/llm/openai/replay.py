@@ -0,0 +1,149 @@
+"""
+Record and replay of OpenAI HTTP traffic, for offline and reproducible measurements.
+RecordingTransport forwards requests to the API and appends every request/response
+pair to a JSONL fixture file. ReplayTransport serves the recorded responses without
+network access, with a configurable injected latency, so the tool loop and the
+agent can be benchmarked deterministically.
+
+Select the mode for the shared clients (see async_client.py) with
+OPENAI_HTTP_MODE=record|replay and OPENAI_FIXTURE_PATH (and
+OPENAI_REPLAY_LATENCY_SECONDS, "recorded" to replay the recorded latencies).
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import httpx
+
+# Response headers worth keeping; the rest (dates, request ids, cookies) only add noise
+KEPT_RESPONSE_HEADERS = ("content-type",)
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """Identifies a request by method, path and (canonical JSON) body."""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    return hashlib.sha256(method.encode() + b" " + path.encode() + b"\n" + body).hexdigest()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests and appends each request/response pair to a fixture file."""
+
+    def __init__(self, fixture_path: Union[str, Path], transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.fixture_path = Path(fixture_path)
+        self.fixture_path.parent.mkdir(parents=True, exist_ok=True)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        body = await request.aread()
+        response = await self.transport.handle_async_request(request)
+        # Streamed (SSE) responses are recorded as a whole and replayed as a whole
+        content = await response.aread()
+        entry = {
+            "method": request.method,
+            "path": request.url.path,
+            "fingerprint": request_fingerprint(request.method, request.url.path, body),
+            "request": body.decode("utf-8", errors="replace"),
+            "status_code": response.status_code,
+            "headers": {name: response.headers[name] for name in KEPT_RESPONSE_HEADERS if name in response.headers},
+            "response": content.decode("utf-8", errors="replace"),
+            "latency_seconds": round(time.perf_counter() - started, 4),
+        }
+        with self._lock, open(self.fixture_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        # The content is already decoded, so the encoding headers no longer apply
+        headers = [
+            (name, value) for name, value in response.headers.multi_items()
+            if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=headers,
+            content=content,
+            request=request,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves recorded responses. A request gets the next unused response recorded for
+    the same fingerprint; if its body differs from every recording (e.g. after a
+    prompt change), the next unused response for the same method and path is served
+    instead, unless strict is set.
+    """
+
+    def __init__(
+        self,
+        fixture_path: Union[str, Path],
+        latency_seconds: Union[float, str] = 0.0,
+        strict: bool = False,
+    ):
+        """
+        Args:
+            fixture_path: JSONL file written by RecordingTransport
+            latency_seconds: Delay injected before each response, or "recorded" to
+                replay the latency measured while recording
+            strict: Fail on requests without a recording of the exact same body
+        """
+        self.latency_seconds = latency_seconds
+        self.strict = strict
+        self.requests_served = 0
+        self.fallbacks = 0
+        self._by_fingerprint: Dict[str, deque] = defaultdict(deque)
+        self._by_route: Dict[tuple, deque] = defaultdict(deque)
+        self._used = set()
+        self._lock = threading.Lock()
+        with open(fixture_path) as f:
+            entries: List[Dict] = [json.loads(line) for line in f if line.strip()]
+        for index, entry in enumerate(entries):
+            self._by_fingerprint[entry["fingerprint"]].append((index, entry))
+            self._by_route[(entry["method"], entry["path"])].append((index, entry))
+
+    def _next_unused(self, queue: deque) -> Optional[Dict]:
+        while queue:
+            index, entry = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return entry
+        return None
+
+    def _delay(self, entry: Dict) -> float:
+        if self.latency_seconds == "recorded":
+            return entry.get("latency_seconds", 0.0)
+        return float(self.latency_seconds)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        fingerprint = request_fingerprint(request.method, request.url.path, body)
+        with self._lock:
+            entry = self._next_unused(self._by_fingerprint[fingerprint])
+            if entry is None and not self.strict:
+                entry = self._next_unused(self._by_route[(request.method, request.url.path)])
+                if entry is not None:
+                    self.fallbacks += 1
+            if entry is not None:
+                self.requests_served += 1
+        if entry is None:
+            raise RuntimeError(f"No recorded response left for {request.method} {request.url.path}")
+        delay = self._delay(entry)
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(
+            status_code=entry["status_code"],
+            headers=entry["headers"],
+            content=entry["response"].encode("utf-8"),
+            request=request,
+        )
@@ -0,0 +1,218 @@
+"""
+Compact schema digest for the system prompt of the tool loop.
+One line per relation with its relevant columns, foreign-key hints and a rounded
+row-count estimate, e.g.
+
+    videos [table, ~12k rows]: id text, title text, channel_id text -> channels.id, ...
+
+The digest has no timestamp and its relations, columns and rounded counts are
+sorted and formatted deterministically, so it is byte-identical between schema
+extractions unless the schema changes. That keeps the system prefix of every
+tool loop request stable, which is what provider-side prompt caching matches on.
+"""
+
+import math
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA_DIGEST_PATH = Path(__file__).resolve().parents[3] / "ask" / "cache" / "db_schema_digest.txt"
+SCHEMA_FILE_PATH = Path(__file__).resolve().parents[3] / "ask" / "cache" / "db_schema.txt"
+
+# Relations and bookkeeping columns that never help answering a question
+EXCLUDED_RELATIONS = set(filter(None, os.getenv("SCHEMA_DIGEST_EXCLUDED_RELATIONS", "test").split(",")))
+EXCLUDED_COLUMNS = set(filter(None, os.getenv(
+    "SCHEMA_DIGEST_EXCLUDED_COLUMNS",
+    "updated_at,updated_at_date,updated_at_timestamp,natural_key,ingestion_id",
+).split(",")))
+
+TYPE_ALIASES = {
+    "character varying": "text",
+    "character": "text",
+    "integer": "int",
+    "bigint": "bigint",
+    "smallint": "int",
+    "double precision": "float",
+    "real": "float",
+    "numeric": "numeric",
+    "boolean": "bool",
+    "timestamp with time zone": "timestamptz",
+    "timestamp without time zone": "timestamp",
+}
+
+COLUMNS_QUERY = """
+SELECT c.table_name, t.table_type, c.column_name, c.data_type
+FROM information_schema.columns c
+JOIN information_schema.tables t USING (table_schema, table_name)
+WHERE c.table_schema = 'public'
+ORDER BY c.table_name, c.ordinal_position
+"""
+
+FOREIGN_KEYS_QUERY = """
+SELECT kcu.table_name, kcu.column_name, ccu.table_name AS foreign_table, ccu.column_name AS foreign_column
+FROM information_schema.table_constraints tc
+JOIN information_schema.key_column_usage kcu
+    ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
+JOIN information_schema.constraint_column_usage ccu
+    ON tc.constraint_name = ccu.constraint_name AND tc.table_schema = ccu.table_schema
+WHERE tc.constraint_type = 'FOREIGN KEY' AND tc.table_schema = 'public'
+"""
+
+ROW_ESTIMATES_QUERY = """
+SELECT c.relname AS table_name, c.reltuples::bigint AS row_estimate
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public' AND c.relkind = 'r'
+"""
+
+
+def compact_type(data_type: str) -> str:
+    """Short name of a column type, e.g. 'character varying(500)' -> 'text'."""
+    base = re.sub(r"\(.*\)", "", data_type).strip().lower()
+    return TYPE_ALIASES.get(base, base)
+
+
+def round_row_count(count: Optional[float]) -> Optional[str]:
+    """
+    Row count rounded to two significant digits ('~12k', '~1.5M'), so small changes
+    of the table do not change the digest. None if the count is unknown.
+    """
+    if count is None or count < 0:
+        return None
+    if count < 10:
+        return f"~{int(count)}"
+    digits = int(math.floor(math.log10(count))) - 1
+    rounded = round(count, -digits)
+    for divisor, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "k")):
+        if rounded >= divisor:
+            return f"~{rounded / divisor:g}{suffix}"
+    return f"~{int(rounded)}"
+
+
+def format_digest(
+    relations: Dict[str, Tuple[str, List[Tuple[str, str]]]],
+    foreign_keys: Dict[Tuple[str, str], str],
+    row_estimates: Dict[str, float],
+) -> str:
+    """
+    Render the digest.
+
+    Args:
+        relations: Relation name -> (kind 'table'/'view', [(column, type), ...])
+        foreign_keys: (relation, column) -> 'table.column' it references
+        row_estimates: Table name -> estimated number of rows
+
+    Returns:
+        One line per relation, sorted by name
+    """
+    lines = []
+    for name in sorted(relations):
+        if name in EXCLUDED_RELATIONS:
+            continue
+        kind, columns = relations[name]
+        label = kind
+        rows = round_row_count(row_estimates.get(name))
+        if rows:
+            label = f"{kind}, {rows} rows"
+        parts = []
+        for column, data_type in columns:
+            if column in EXCLUDED_COLUMNS:
+                continue
+            part = f"{column} {compact_type(data_type)}"
+            if (name, column) in foreign_keys:
+                part += f" -> {foreign_keys[(name, column)]}"
+            parts.append(part)
+        lines.append(f"{name} [{label}]: {', '.join(parts)}")
+    return "\n".join(lines)
+
+
+def build_schema_digest(psql_client) -> str:
+    """Build the digest from the database's information schema and pg_class statistics."""
+    relations: Dict[str, Tuple[str, List[Tuple[str, str]]]] = {}
+    for row in psql_client.read_sql_query(COLUMNS_QUERY).itertuples(index=False):
+        kind = "view" if row.table_type == "VIEW" else "table"
+        relations.setdefault(row.table_name, (kind, []))[1].append((row.column_name, row.data_type))
+
+    foreign_keys = {
+        (row.table_name, row.column_name): f"{row.foreign_table}.{row.foreign_column}"
+        for row in psql_client.read_sql_query(FOREIGN_KEYS_QUERY).itertuples(index=False)
+    }
+    # reltuples is -1 for tables that were never analyzed
+    row_estimates = {
+        row.table_name: row.row_estimate
+        for row in psql_client.read_sql_query(ROW_ESTIMATES_QUERY).itertuples(index=False)
+        if row.row_estimate >= 0
+    }
+    return format_digest(relations, foreign_keys, row_estimates)
+
+
+def digest_from_schema_file(schema_text: str) -> str:
+    """
+    Build the digest from the verbose schema file (db_schema.txt) when there is no
+    database connection. It has no row counts or constraints, so foreign keys are
+    inferred from column names (video_id -> videos.id).
+    """
+    relations: Dict[str, Tuple[str, List[Tuple[str, str]]]] = {}
+    current = None
+    for line in schema_text.splitlines():
+        header = re.match(r"## (?:\w+\.)?(\w+) \((BASE TABLE|VIEW)\)", line)
+        if header:
+            current = header.group(1)
+            relations[current] = ("view" if header.group(2) == "VIEW" else "table", [])
+            continue
+        column = re.match(r"\s+- (\w+): (.+?) (?:NOT NULL|NULL)", line)
+        if column and current:
+            relations[current][1].append((column.group(1), column.group(2)))
+
+    tables = {name for name, (kind, _) in relations.items() if kind == "table"}
+    foreign_keys = {}
+    for name, (kind, columns) in relations.items():
+        if kind != "table":
+            continue
+        for column, _ in columns:
+            prefix = column[:-3] if column.endswith("_id") else None
+            for candidate in (f"{prefix}s", prefix):
+                if prefix and candidate in tables and candidate != name:
+                    foreign_keys[(name, column)] = f"{candidate}.id"
+                    break
+    return format_digest(relations, foreign_keys, {})
+
+
+def write_schema_digest(psql_client, path: Path = SCHEMA_DIGEST_PATH) -> bool:
+    """
+    Write the digest built from the database to path, leaving the file untouched if
+    its content is unchanged.
+
+    Returns:
+        Whether the file was changed
+    """
+    digest = build_schema_digest(psql_client)
+    path = Path(path)
+    if path.exists() and path.read_text() == digest:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(digest)
+    return True
+
+
+_loaded: Dict[str, Tuple[float, str]] = {}
+
+
+def load_schema_digest(path: Path = SCHEMA_DIGEST_PATH, schema_file_path: Path = SCHEMA_FILE_PATH) -> str:
+    """
+    Return the digest file's content (re-read only when the file changes), falling
+    back to a digest of the verbose schema file and to "" if neither exists.
+    """
+    for source in (Path(path), Path(schema_file_path)):
+        try:
+            mtime = source.stat().st_mtime
+        except OSError:
+            continue
+        cached = _loaded.get(str(source))
+        if cached is None or cached[0] != mtime:
+            text = source.read_text()
+            digest = text if source == Path(path) else digest_from_schema_file(text)
+            _loaded[str(source)] = (mtime, digest.strip())
+        return _loaded[str(source)][1]
+    return ""
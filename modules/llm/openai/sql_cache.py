@@ -0,0 +1,185 @@
+"""
+In-memory result cache for read-only SQL queries issued by the tool loop.
+Queries are keyed by their normalized text (whitespace and case folded outside of
+literals), entries expire after a TTL, the least recently used entry is evicted when
+the cache is full, and writers invalidate the entries of the tables they change.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, FrozenSet, Iterable, Iterator, Optional, Set
+
+import pandas as pd
+
+# Queries that may return a different result on every call are not cached
+NON_DETERMINISTIC_PATTERN = re.compile(
+    r"\b(now|random|clock_timestamp|current_date|current_time|current_timestamp|localtime|localtimestamp|gen_random_uuid)\b"
+)
+TABLE_PATTERN = re.compile(r'\b(?:from|join)\s+((?:"[^"]+"|\w+)(?:\s*\.\s*(?:"[^"]+"|\w+))?)')
+# Single-quoted literals ('' is an escaped quote) and double-quoted identifiers are kept as written
+QUOTED_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+
+_read_tables: ContextVar[Optional[Set[str]]] = ContextVar("sql_read_tables", default=None)
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Fold whitespace and case of a query outside of quoted literals and identifiers,
+    and drop trailing semicolons.
+    """
+    parts = QUOTED_PATTERN.split(query.strip().rstrip(";").strip())
+    # split() with a capturing group puts the quoted parts at odd indices
+    return "".join(
+        part if index % 2 else re.sub(r"\s+", " ", part.lower())
+        for index, part in enumerate(parts)
+    ).strip()
+
+
+def referenced_tables(normalized_query: str) -> FrozenSet[str]:
+    """Names of the tables and views a normalized query reads from (without schema)."""
+    without_literals = LITERAL_PATTERN.sub("''", normalized_query)
+    tables = set()
+    for match in TABLE_PATTERN.finditer(without_literals):
+        tables.add(match.group(1).split(".")[-1].strip().strip('"'))
+    return frozenset(tables)
+
+
+def is_cacheable(normalized_query: str) -> bool:
+    """Only deterministic SELECT queries are cached."""
+    if not normalized_query.startswith(("select", "with")):
+        return False
+    without_literals = LITERAL_PATTERN.sub("''", normalized_query)
+    return not NON_DETERMINISTIC_PATTERN.search(without_literals)
+
+
+def note_read_query(query: str):
+    """Add the tables a query reads from to the collect_read_tables block it runs in."""
+    tables = _read_tables.get()
+    if tables is not None:
+        tables.update(referenced_tables(normalize_sql(query)))
+
+
+@contextmanager
+def collect_read_tables() -> Iterator[Set[str]]:
+    """
+    Collect the tables read by all queries run inside the block (including worker
+    threads and asyncio tasks started from it), e.g. to know what an answer depends on.
+    """
+    tables: Set[str] = set()
+    token = _read_tables.set(tables)
+    try:
+        yield tables
+    finally:
+        _read_tables.reset(token)
+
+
+def cache_key(query: str, params: Optional[Dict] = None) -> str:
+    """Normalized query, followed by its bound parameters if there are any."""
+    key = normalize_sql(query)
+    if params:
+        key += "\n-- params: " + json.dumps(params, sort_keys=True, default=str)
+    return key
+
+
+class SQLResultCache:
+    """
+    Thread-safe TTL + LRU cache mapping normalized queries to result DataFrames.
+    Cached DataFrames are shared, callers must not modify them.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 256):
+        """
+        Args:
+            ttl_seconds: Time after which an entry is no longer returned
+            max_entries: Maximum number of cached queries
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str, params: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+        """Return the cached result of a query, or None if it is not cached or expired."""
+        key = cache_key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, query: str, result: pd.DataFrame, params: Optional[Dict] = None) -> bool:
+        """
+        Cache the result of a query (with its bound parameters) if it is cacheable.
+
+        Returns:
+            Whether the result was cached
+        """
+        normalized = normalize_sql(query)
+        if not is_cacheable(normalized):
+            return False
+        key = cache_key(query, params)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, referenced_tables(normalized), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        Drop the entries that read from any of the given tables.
+        Views (v_*) and queries whose tables could not be determined depend on unknown
+        base tables, so they are dropped as well.
+
+        Returns:
+            Number of dropped entries
+        """
+        tables = {table.split(".")[-1].lower() for table in tables}
+        with self._lock:
+            stale = [
+                key for key, (_, entry_tables, _) in self._entries.items()
+                if not entry_tables
+                or entry_tables & tables
+                or any(table.startswith("v_") for table in entry_tables)
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the number of cached queries."""
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+
+sql_result_cache = SQLResultCache(
+    ttl_seconds=float(os.getenv("SQL_CACHE_TTL_SECONDS", "300")),
+    max_entries=int(os.getenv("SQL_CACHE_MAX_ENTRIES", "256")),
+)
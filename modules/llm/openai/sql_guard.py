@@ -0,0 +1,136 @@
+"""
+Guarded execution of model-written SQL.
+Every query runs in a read-only transaction with a statement timeout, is checked
+with EXPLAIN against a cost budget before it runs, and at most max_rows + 1 rows
+are fetched. Rejected or failed queries raise GuardedQueryError with a short
+message the model can act on (it is returned to the model as the tool output).
+"""
+
+import os
+import re
+from typing import Dict, Optional
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import DBAPIError
+
+from modules.llm.openai.sql_cache import LITERAL_PATTERN, normalize_sql
+from modules.llm.openai.sql_output import SQL_TOOL_ROW_LIMIT
+
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "1000000"))
+
+# Postgres error codes (SQLSTATE)
+QUERY_CANCELED = "57014"
+READ_ONLY_SQL_TRANSACTION = "25006"
+
+WRITE_KEYWORD_PATTERN = re.compile(
+    r"\b(insert|update|delete|merge|truncate|drop|alter|create|grant|revoke|copy|vacuum|call|do|lock|refresh)\b"
+)
+
+
+class GuardedQueryError(Exception):
+    """A query was rejected or failed; the message is meant for the model."""
+
+
+def check_statement(query: str):
+    """
+    Reject anything but a single SELECT/WITH statement before it reaches the database.
+    The read-only transaction is the actual protection, this gives a clearer message.
+    """
+    normalized = normalize_sql(query)
+    without_literals = LITERAL_PATTERN.sub("''", normalized)
+    if not normalized.startswith(("select", "with")):
+        raise GuardedQueryError("Only read-only SELECT (or WITH ... SELECT) queries are allowed.")
+    if ";" in without_literals:
+        raise GuardedQueryError("Send exactly one statement per query, without ';'.")
+    match = WRITE_KEYWORD_PATTERN.search(without_literals)
+    if match:
+        raise GuardedQueryError(f"'{match.group(1).upper()}' is not allowed, the database is read-only for you.")
+
+
+def _statement(query: str, params: Optional[Dict]):
+    # Model SQL has no bind parameters and may contain ':' in literals, so it is passed
+    # to the driver as is; parameterized tool queries use :name placeholders
+    if not params:
+        return None
+    return text(query).bindparams(*[
+        bindparam(name, expanding=True) for name, value in params.items() if isinstance(value, (list, tuple))
+    ])
+
+
+def _execute(connection, query: str, statement, params: Optional[Dict]):
+    if statement is None:
+        # Without no_parameters the driver gets an empty parameter dict and reads every
+        # '%' (e.g. ILIKE '%detox%') as a placeholder
+        return connection.exec_driver_sql(query, execution_options={"no_parameters": True})
+    return connection.execute(statement, params)
+
+
+def run_guarded_query(
+    engine,
+    query: str,
+    params: Optional[Dict] = None,
+    max_rows: int = SQL_TOOL_ROW_LIMIT,
+    timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS,
+    max_cost: float = SQL_MAX_PLAN_COST,
+) -> pd.DataFrame:
+    """
+    Run a read-only query with a statement timeout, a plan cost budget and a row cap.
+
+    Args:
+        engine: SQLAlchemy engine of the database
+        query: SELECT query (with :name placeholders if params are given)
+        params: Bound parameters; list values are expanded to IN lists
+        max_rows: At most max_rows + 1 rows are fetched (the extra row tells whether
+            the result was cut)
+        timeout_ms: Statement timeout in milliseconds
+        max_cost: Maximum estimated total cost of the query plan
+
+    Returns:
+        The result rows
+
+    Raises:
+        GuardedQueryError: The query was rejected, timed out or failed
+    """
+    if not params:
+        check_statement(query)
+    statement = _statement(query, params)
+    explain_statement = _statement(f"EXPLAIN (FORMAT JSON) {query}", params)
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                # Both only apply to this transaction
+                connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+                connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+                plan = _execute(connection, f"EXPLAIN (FORMAT JSON) {query}", explain_statement, params).scalar()
+                cost = plan[0]["Plan"]["Total Cost"]
+                if cost > max_cost:
+                    raise GuardedQueryError(
+                        f"Query rejected: estimated cost {cost:.0f} exceeds the budget of {max_cost:.0f}. "
+                        "Filter early (WHERE on ids or dates), avoid joins without conditions, "
+                        "aggregate in SQL and only select the columns you need."
+                    )
+
+                result = _execute(connection, query, statement, params)
+                rows = result.fetchmany(max_rows + 1)
+                return pd.DataFrame(rows, columns=list(result.keys()))
+    except DBAPIError as e:
+        code = getattr(e.orig, "pgcode", None)
+        if code == QUERY_CANCELED:
+            raise GuardedQueryError(
+                f"Query cancelled after {timeout_ms / 1000:g}s (statement timeout). "
+                "Make it cheaper: add filters, aggregate, or read fewer/shorter columns."
+            ) from e
+        if code == READ_ONLY_SQL_TRANSACTION:
+            raise GuardedQueryError("The database is read-only for you, only SELECT queries are allowed.") from e
+        # Syntax and other errors: the driver's first line (without SQL echo and links)
+        message = str(e.orig).strip().splitlines()[0] if e.orig else str(e)
+        raise GuardedQueryError(f"Query failed: {message}") from e
+    except GuardedQueryError:
+        raise
+    except Exception as e:
+        # Driver and SQLAlchemy errors that are not DBAPI errors (e.g. bad parameters)
+        message = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+        raise GuardedQueryError(f"Query failed: {message}") from e
@@ -0,0 +1,115 @@
+"""
+Compact tool outputs for SQL results in the tool loop.
+Queries get a row LIMIT, small results are returned as CSV with truncated cells,
+and large results are replaced by a summary (row count, per-column statistics and
+sample rows), so a single tool output cannot blow up the model context.
+"""
+
+import os
+import re
+
+import pandas as pd
+
+SQL_TOOL_ROW_LIMIT = int(os.getenv("SQL_TOOL_ROW_LIMIT", "500"))
+SQL_TOOL_INLINE_ROWS = int(os.getenv("SQL_TOOL_INLINE_ROWS", "50"))
+SQL_TOOL_MAX_CELL_CHARS = int(os.getenv("SQL_TOOL_MAX_CELL_CHARS", "2000"))
+SQL_TOOL_MAX_OUTPUT_CHARS = int(os.getenv("SQL_TOOL_MAX_OUTPUT_CHARS", "16000"))
+SUMMARY_SAMPLE_ROWS = 5
+SUMMARY_TOP_VALUES = 5
+
+TRAILING_LIMIT_PATTERN = re.compile(r"\blimit\s+\d+(\s+offset\s+\d+)?\s*$", re.IGNORECASE)
+
+
+def limit_query(query: str, max_rows: int = SQL_TOOL_ROW_LIMIT) -> str:
+    """
+    Wrap a SELECT query so it returns at most max_rows + 1 rows (the extra row tells
+    whether the result was cut). Queries that already end with a small LIMIT and
+    statements that are not SELECT/WITH queries are returned unchanged.
+    """
+    query = query.strip().rstrip(";").strip()
+    if not re.match(r"(select|with)\b", query, re.IGNORECASE):
+        return query
+    match = TRAILING_LIMIT_PATTERN.search(query)
+    if match and int(re.search(r"\d+", match.group(0)).group(0)) <= max_rows:
+        return query
+    return f"SELECT * FROM (\n{query}\n) AS limited_result LIMIT {max_rows + 1}"
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _truncate_cell(value, max_chars: int):
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}...[{len(value) - max_chars} more chars]"
+    return value
+
+
+def to_compact_csv(df: pd.DataFrame, max_cell_chars: int = SQL_TOOL_MAX_CELL_CHARS) -> str:
+    """Encode rows as CSV with a header line, truncating long text cells."""
+    compact = df.copy()
+    for column in compact.columns:
+        if _is_text(compact[column]):
+            compact[column] = compact[column].map(lambda value: _truncate_cell(value, max_cell_chars))
+    return compact.to_csv(index=False).strip()
+
+
+def summarize_result(df: pd.DataFrame, truncated: bool) -> str:
+    """Describe a large result: row count, per-column statistics and a few sample rows."""
+    row_count = f"at least {len(df)}" if truncated else str(len(df))
+    lines = [f"{row_count} rows, {len(df.columns)} columns. Too many rows to list, summary:"]
+    for column in df.columns:
+        series = df[column]
+        parts = [f"{series.dtype}", f"{series.isna().sum()} null"]
+        try:
+            parts.append(f"{series.nunique()} distinct")
+        except TypeError:
+            # Unhashable values (e.g. JSON columns)
+            pass
+        if pd.api.types.is_numeric_dtype(series) and series.notna().any():
+            parts.append(f"min {series.min()}, max {series.max()}, mean {series.mean():.4g}")
+        elif _is_text(series) and series.notna().any():
+            try:
+                top = series.value_counts().head(SUMMARY_TOP_VALUES)
+                parts.append("top: " + ", ".join(
+                    f"{_truncate_cell(str(value), 40)} ({count})" for value, count in top.items()
+                ))
+            except TypeError:
+                pass
+        lines.append(f"- {column}: {'; '.join(parts)}")
+    lines.append(f"Sample rows:\n{to_compact_csv(df.head(SUMMARY_SAMPLE_ROWS), max_cell_chars=200)}")
+    lines.append("Use aggregations, filters or a smaller LIMIT to get specific rows.")
+    return "\n".join(lines)
+
+
+def format_result(
+    df: pd.DataFrame,
+    max_rows: int = SQL_TOOL_ROW_LIMIT,
+    inline_rows: int = SQL_TOOL_INLINE_ROWS,
+    max_chars: int = SQL_TOOL_MAX_OUTPUT_CHARS,
+) -> str:
+    """
+    Format a query result as a compact tool output.
+
+    Args:
+        df: Result of a query wrapped by limit_query (up to max_rows + 1 rows)
+        max_rows: Row limit the query was run with
+        inline_rows: Results with more rows are summarized instead of listed
+        max_chars: Maximum length of the output
+
+    Returns:
+        CSV of the rows, or a summary for large results
+    """
+    if df is None or df.empty:
+        return "0 rows"
+    truncated = len(df) > max_rows
+    df = df.head(max_rows)
+
+    if len(df) <= inline_rows:
+        output = f"{len(df)} rows (CSV):\n{to_compact_csv(df)}"
+        if len(output) <= max_chars:
+            return output
+    output = summarize_result(df, truncated)
+    if len(output) > max_chars:
+        output = f"{output[:max_chars]}...[output truncated]"
+    return output
@@ -1,21 +1,43 @@
-from openai import OpenAI
+import asyncio
+import contextvars
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import pandas as pd
 from collections import defaultdict
 from pydantic import BaseModel
 from pathlib import Path
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Dict, List, Optional
 
 # Load env
 load_dotenv()
 
 # Your Postgres client
 from modules.youtube_summarizer.src.utils.psql_client import PSQLClient
-
-# Init clients
+from modules.observability.usage import record_usage, track_usage
+from modules.llm.openai.context import TokenBudgetContext
+from modules.llm.openai.sql_cache import note_read_query, sql_result_cache
+from modules.llm.openai.sql_guard import GuardedQueryError, check_statement, run_guarded_query
+from modules.llm.openai.sql_output import SQL_TOOL_MAX_CELL_CHARS, SQL_TOOL_ROW_LIMIT, format_result, limit_query
+from modules.llm.openai.async_client import get_async_openai_client, run_sync
+from modules.llm.openai.schema_digest import load_schema_digest
+
+# Init clients (OpenAI: shared pooled client, see async_client.py)
 psql_client = PSQLClient(os.getenv("PSQL_CONNECTION_STRING"))
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Receives the progress events of a streamed tool loop (see stream_completion_with_tools).
+# Must be callable from any thread, the tools run on the tool call executor.
+_event_sink: ContextVar[Optional[Callable[[Dict], None]]] = ContextVar("tool_loop_event_sink", default=None)
+
+
+def emit_event(event: Dict):
+    """Send a progress event to the streaming client, if the loop is streamed."""
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event)
 
 
 def load_schema_file(schema_path: str) -> str:
@@ -33,64 +55,52 @@ def load_schema_file(schema_path: str) -> str:
 
 
 
+# Domain tools take lists of ids, so e.g. the titles of 50 videos take one call
+TOOL_MAX_BATCH_IDS = int(os.getenv("TOOL_MAX_BATCH_IDS", "50"))
+SUBTITLE_PREVIEW_CHARS = int(os.getenv("SUBTITLE_PREVIEW_CHARS", "1000"))
+
+
+def _ids_parameter(name: str, description: str) -> dict:
+    return {
+        "type": "object",
+        "properties": {
+            name: {
+                "type": "array",
+                "items": {"type": "string"},
+                "maxItems": TOOL_MAX_BATCH_IDS,
+                "description": f"{description} (up to {TOOL_MAX_BATCH_IDS} per call)",
+            }
+        },
+        "required": [name],
+    }
+
+
 # Tools schema (for the model)
 tools = [
     {
         "type": "function",
         "name": "get_video_title",
-        "description": "Get the title of a video.",
-        "parameters": {
-            "type": "object",
-            "properties": {"video_id": {"type": "string", "description": "A video id"}},
-            "required": ["video_id"],
-        },
+        "description": "Get title, channel and publish date of videos. Returns CSV: video_id,title,channel_id,published_at.",
+        "parameters": _ids_parameter("video_ids", "Video ids"),
     },
     {
         "type": "function",
         "name": "get_video_subtitle",
-        "description": "Get the subtitle of a video.",
-        "parameters": {
-            "type": "object",
-            "properties": {"video_id": {"type": "string", "description": "A video id"}},
-            "required": ["video_id"],
-        },
+        "description": f"Get the first {SUBTITLE_PREVIEW_CHARS} characters of the subtitles of videos. Returns CSV: video_id,subtitles.",
+        "parameters": _ids_parameter("video_ids", "Video ids"),
     },
     {
         "type": "function",
         "name": "get_topics_for_video",
-        "description": "Get the topics for a video.",
-        "parameters": {
-            "type": "object",
-            "properties": {"video_id": {"type": "string", "description": "A video id"}},
-            "required": ["video_id"],
-        },
+        "description": "Get the topics of videos. Returns CSV: video_id,topics (topics separated by '; ').",
+        "parameters": _ids_parameter("video_ids", "Video ids"),
     },
     {
         "type": "function",
         "name": "get_videos_for_channel",
-        "description": "Get the videos for a channel.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "channel_id": {"type": "string", "description": "A channel id"}
-            },
-            "required": ["channel_id"],
-        },
-    },
-    {
-        "type": "function",
-        "name": "execute_sql_query",
-        "description": "Execute a SQL query.",
-        "parameters": {
-            "type": "object",
-            "properties": {"query": {"type": "string", "description": "A SQL query"}},
-            "required": ["query"],
-        },
+        "description": "Get the videos of channels, newest first. Returns CSV: channel_id,video_id,title,published_at.",
+        "parameters": _ids_parameter("channel_ids", "Channel ids"),
     },
-]
-
-
-tools = [
     {
         "type": "function",
         "name": "execute_sql_query",
@@ -105,141 +115,389 @@ tools = [
             },
             "required": ["query"],
         },
-    }
+    },
 ]
 
 
 class LLMToolsResult(BaseModel):
     tools: list
     result: str
+    usage: dict = {}
+
+
+def read_sql_query_cached(query: str, params: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Run a read-only query, serving repeated queries from the SQL result cache.
+    Queries run guarded (read-only, statement timeout, plan cost budget, row cap),
+    see sql_guard.py. Parameterized queries use :name placeholders; list values are
+    expanded to IN lists and bound by the driver, never formatted into the SQL text.
+    """
+    note_read_query(query)
+    started = time.perf_counter()
+    df = sql_result_cache.get(query, params)
+    if df is not None:
+        emit_event({"type": "sql_executed", "query": query, "rows": len(df), "seconds": 0.0, "cached": True})
+        return df
+    try:
+        df = run_guarded_query(psql_client.engine, query, params)
+    except GuardedQueryError as e:
+        emit_event({
+            "type": "sql_executed",
+            "query": query,
+            "seconds": round(time.perf_counter() - started, 3),
+            "error": str(e),
+        })
+        raise
+    emit_event({
+        "type": "sql_executed",
+        "query": query,
+        "rows": len(df),
+        "seconds": round(time.perf_counter() - started, 3),
+        "cached": False,
+    })
+    if df is not None:
+        sql_result_cache.put(query, df, params)
+    return df
+
+
+def _unique_ids(ids) -> List[str]:
+    """Validate the id list of a domain tool (deduplicated, order kept)."""
+    if isinstance(ids, str):
+        ids = [ids]
+    ids = list(dict.fromkeys(str(value).strip() for value in ids if str(value).strip()))
+    if not ids:
+        raise ValueError("No ids given")
+    if len(ids) > TOOL_MAX_BATCH_IDS:
+        raise ValueError(f"At most {TOOL_MAX_BATCH_IDS} ids per call, got {len(ids)}")
+    return ids
+
+
+def _format_batch(df: pd.DataFrame, ids: List[str], id_column: str) -> str:
+    """Compact CSV of the rows, followed by the ids without rows."""
+    output = format_result(df)
+    found = set() if df is None or df.empty else set(df[id_column].astype(str))
+    missing = [value for value in ids if value not in found]
+    if missing:
+        output += f"\nNot found: {', '.join(missing)}"
+    return output
 
 
 # --- Actual tool implementations ---
-def get_video_title(video_id: str) -> str:
-    query = f"SELECT id, title, url, channel_id FROM videos WHERE id = '{video_id}'"
-    df = psql_client.read_sql_query(query)
-    if df is None or len(df) == 0:
-        return f"{video_id}: No video found."
-    return f"{video_id}: The video title is {df.iloc[0]['title']}."
-
-
-def get_video_subtitle(video_id: str) -> str:
-    query = f"SELECT subtitles FROM video_subtitles WHERE video_id = '{video_id}'"
-    df = psql_client.read_sql_query(query)
-    if df is None or len(df) == 0 or pd.isna(df.iloc[0].get("subtitles", None)):
-        return f"{video_id}: No subtitles found."
-    subtitle = str(df.iloc[0]["subtitles"])[:1000]  # trim long results
-    return f"{video_id}: The video subtitle is {subtitle}"
-
-
-def get_videos_for_channel(channel_id: str) -> str:
-    query = f"SELECT id, title, url, channel_id FROM videos WHERE channel_id = '{channel_id}'"
-    df = psql_client.read_sql_query(query)
-    if df is None or len(df) == 0:
-        return f"{channel_id}: No videos found."
-    # Return compact JSON-like string for the model to consume
-    return (
-        f"{channel_id}: The videos are {df[['id','title']].to_dict(orient='records')}"
+def get_video_title(video_ids: List[str]) -> str:
+    ids = _unique_ids(video_ids)
+    query = (
+        "SELECT id AS video_id, title, channel_id, published_at::date AS published_at "
+        "FROM videos WHERE id IN :ids ORDER BY id"
     )
+    return _format_batch(read_sql_query_cached(query, {"ids": ids}), ids, "video_id")
 
 
-def get_topics_for_video(video_id: str) -> str:
+def get_video_subtitle(video_ids: List[str]) -> str:
+    ids = _unique_ids(video_ids)
     query = (
-        "SELECT channel_id, video_id, topic_name, value "
-        f"FROM v_video_topic WHERE video_id = '{video_id}' AND value IS NOT NULL"
+        "SELECT video_id, LEFT(subtitles, :max_chars) AS subtitles "
+        "FROM video_subtitles WHERE video_id IN :ids AND subtitles IS NOT NULL ORDER BY video_id"
     )
-    df = psql_client.read_sql_query(query)
-    if df is None or len(df) == 0:
-        return f"{video_id}: No topics found."
-    return f"{video_id}: The topics are {df.to_dict(orient='records')}"
+    df = read_sql_query_cached(query, {"ids": ids, "max_chars": SUBTITLE_PREVIEW_CHARS})
+    return _format_batch(df, ids, "video_id")
+
+
+def get_videos_for_channel(channel_ids: List[str]) -> str:
+    ids = _unique_ids(channel_ids)
+    query = (
+        "SELECT channel_id, id AS video_id, title, published_at::date AS published_at "
+        "FROM videos WHERE channel_id IN :ids ORDER BY channel_id, published_at DESC NULLS LAST"
+    )
+    # Compact CSV, or a summary for large channels
+    return _format_batch(read_sql_query_cached(query, {"ids": ids}), ids, "channel_id")
+
+
+def get_topics_for_video(video_ids: List[str]) -> str:
+    ids = _unique_ids(video_ids)
+    query = (
+        "SELECT video_id, string_agg(topic_name, '; ' ORDER BY topic_name) AS topics "
+        "FROM v_video_topic WHERE video_id IN :ids AND value IS NOT NULL "
+        "GROUP BY video_id ORDER BY video_id"
+    )
+    return _format_batch(read_sql_query_cached(query, {"ids": ids}), ids, "video_id")
 
 
 def execute_sql_query(query: str) -> str:
-    NOT_ALLOWED_OPERATIONS = ["DELETE", "UPDATE", "INSERT", "CREATE", "ALTER"]
-    if any(query.upper().startswith(q) for q in NOT_ALLOWED_OPERATIONS):
-        return f"Those queries are not allowed: {NOT_ALLOWED_OPERATIONS}"
-    print("Executing query: ", query)
-    df = psql_client.read_sql_query(query)
-    return f"{query}: The result is {df.to_dict(orient='records')}"
-
-
-def truncate_input_list_by_chars(input_list, max_chars=600000):
-    """Ensure the combined text of all messages doesn't exceed max_chars."""
-    # Flatten and count characters
-    total_length = sum(len(str(msg.get("content", ""))) for msg in input_list if isinstance(msg, dict))
-    print(f"🧮 Current input size: {total_length} chars")
-
-    # If over the limit, remove oldest user/assistant/tool messages (keep system)
-    while total_length > max_chars and len(input_list) > 2:
-        for i, msg in enumerate(input_list):
-            if msg.get("role") != "system":
-                removed_len = len(str(msg.get("content", "")))
-                del input_list[i]
-                total_length -= removed_len
-                print(f"⚠️ Truncated {removed_len} chars, new size: {total_length}")
-                break
+    try:
+        check_statement(query)
+        # At most SQL_TOOL_ROW_LIMIT rows are fetched, large results are summarized
+        query = limit_query(query)
+        print("Executing query: ", query)
+        df = read_sql_query_cached(query)
+    except GuardedQueryError as e:
+        # Returned as the tool output, so the model can fix the query
+        return str(e)
+    return format_result(df)
+
+
+# Tool name -> (implementation, argument name, output key)
+TOOL_FUNCTIONS = {
+    "get_video_title": (get_video_title, "video_ids", "titles"),
+    "get_video_subtitle": (get_video_subtitle, "video_ids", "subtitles"),
+    "get_topics_for_video": (get_topics_for_video, "video_ids", "topics"),
+    "get_videos_for_channel": (get_videos_for_channel, "channel_ids", "videos"),
+    "execute_sql_query": (execute_sql_query, "query", "result"),
+}
+
+# Bounded pool for the tool calls of one turn (each call holds a DB connection)
+TOOL_CALL_MAX_WORKERS = int(os.getenv("TOOL_CALL_MAX_WORKERS", "5"))
+tool_call_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_MAX_WORKERS, thread_name_prefix="tool-call")
+
+
+def run_function_call(block) -> dict:
+    """Execute one function_call block and return its function_call_output item."""
+    fn_name = block.name
+    started = time.perf_counter()
+    if fn_name not in TOOL_FUNCTIONS:
+        output = {"error": f"Unknown tool: {fn_name}"}
+    else:
+        function, arg_name, output_key = TOOL_FUNCTIONS[fn_name]
+        try:
+            args = json.loads(block.arguments or "{}")
+            output = {output_key: function(args[arg_name])}
+        except Exception as e:
+            # Reported to the model instead of failing the other calls of the turn
+            output = {"error": f"{fn_name} failed: {e}"}
+    emit_event({
+        "type": "tool_call_finished",
+        "call_id": block.call_id,
+        "name": fn_name,
+        "seconds": round(time.perf_counter() - started, 3),
+        "error": output.get("error"),
+    })
+    return {
+        "type": "function_call_output",
+        "call_id": block.call_id,
+        "output": json.dumps(output),
+    }
+
+
+async def run_function_calls(function_calls: list) -> list:
+    """
+    Execute the function calls of one turn concurrently on the tool call executor
+    (the tools are blocking DB calls). The outputs are returned in the order of the calls.
+    """
+    loop = asyncio.get_running_loop()
+    return list(await asyncio.gather(*[
+        loop.run_in_executor(tool_call_executor, contextvars.copy_context().run, run_function_call, block)
+        for block in function_calls
+    ]))
 
-    return input_list
 
+async def create_tool_loop_response(input_list):
+    """
+    Call the Responses API with the tools and record the token usage of the call.
+    In a streamed loop the response is streamed and its answer tokens are emitted.
+    """
+    started = time.perf_counter()
+    client = get_async_openai_client()
+    if _event_sink.get() is None:
+        response = await client.responses.create(
+            model="gpt-5",
+            tools=tools,
+            input=input_list,
+        )
+    else:
+        response = None
+        stream = await client.responses.create(
+            model="gpt-5",
+            tools=tools,
+            input=input_list,
+            stream=True,
+        )
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                emit_event({"type": "answer_delta", "delta": event.delta})
+            elif event.type in ("response.completed", "response.incomplete"):
+                response = event.response
+            elif event.type == "response.failed":
+                raise RuntimeError(f"Response failed: {event.response.error}")
+        if response is None:
+            raise RuntimeError("Response stream ended without a response")
+    record_usage("tool_loop", "gpt-5", response.usage, time.perf_counter() - started)
+    return response
+
+
+async def create_final_completion(chat_messages: list) -> str:
+    """
+    Final answer without tools after the iteration limit is reached.
+    In a streamed loop the completion is streamed and its tokens are emitted.
+    """
+    started = time.perf_counter()
+    client = get_async_openai_client()
+    if _event_sink.get() is None:
+        completion = await client.chat.completions.create(
+            model="gpt-5",
+            messages=chat_messages
+        )
+        record_usage("tool_loop_final", "gpt-5", completion.usage, time.perf_counter() - started)
+        return completion.choices[0].message.content
+
+    parts = []
+    usage = None
+    stream = await client.chat.completions.create(
+        model="gpt-5",
+        messages=chat_messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+        if chunk.usage:
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            emit_event({"type": "answer_delta", "delta": chunk.choices[0].delta.content})
+    record_usage("tool_loop_final", "gpt-5", usage, time.perf_counter() - started)
+    return "".join(parts)
 
 
 def generate_completion_with_tools(prompt: str, max_iterations: int = 10) -> LLMToolsResult:
+    """
+    Generate completion with tools support (blocking).
+    Runs generate_completion_with_tools_async on the shared background event loop.
+    
+    Args:
+        prompt: The user prompt/question
+        max_iterations: Maximum number of tool iterations (default: 15)
+    """
+    return run_sync(generate_completion_with_tools_async(prompt, max_iterations))
+
+
+async def generate_completion_with_tools_async(prompt: str, max_iterations: int = 10) -> LLMToolsResult:
     """
     Generate completion with tools support.
+    The token usage of all model calls is returned in the result.
     
     Args:
         prompt: The user prompt/question
         max_iterations: Maximum number of tool iterations (default: 15)
     """
-    if not max_iterations:
-        print("No max_iterations provided, using default of 10")
-        max_iterations = 10
-        
-    print("\n********** Generating completion with tools, with max_iterations: ", max_iterations, "**********")
-    # --- Conversation starts here ---
-    response_early_exit = None
-    iterations_max = max_iterations
-    sql_text_limit = 50000
+    # Reuses the tracker of the calling request, if there is one
+    with track_usage("tool_loop") as usage_tracker:
+        llm_tools_result = await _generate_completion_with_tools(prompt, max_iterations)
+        llm_tools_result.usage = usage_tracker.summary()
+    return llm_tools_result
+
+
+async def stream_completion_with_tools(prompt: str, max_iterations: int = 10) -> AsyncIterator[Dict]:
+    """
+    Run the tool loop and yield its progress events as they happen:
+    tool_call_started, sql_executed, tool_call_finished and answer_delta (answer
+    tokens), followed by one done event with the result, the tools used and the
+    token usage, or an error event.
     
-    # Build system message
+    Args:
+        prompt: The user prompt/question
+        max_iterations: Maximum number of tool iterations (default: 10)
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def sink(event: Dict):
+        # Events come from the loop and from tool call threads
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    token = _event_sink.set(sink)
+    try:
+        # The task copies the current context, including the sink
+        task = asyncio.create_task(generate_completion_with_tools_async(prompt, max_iterations))
+    finally:
+        _event_sink.reset(token)
+    # Scheduled after all events the task emitted, so it ends the queue
+    task.add_done_callback(lambda _: loop.call_soon(queue.put_nowait, None))
+
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        try:
+            llm_tools_result = task.result()
+        except Exception as e:
+            yield {"type": "error", "error": str(e)}
+            return
+        yield {
+            "type": "done",
+            "result": llm_tools_result.result,
+            "tools": llm_tools_result.tools,
+            "usage": llm_tools_result.usage,
+        }
+    finally:
+        # The client went away before the loop finished
+        if not task.done():
+            task.cancel()
+
+
+def build_system_prefix(sql_text_limit: int = SQL_TOOL_MAX_CELL_CHARS) -> str:
+    """
+    System message shared by all tool loop requests. It only changes when the
+    settings or the schema digest change, so the provider can cache it as a prefix.
+    """
     system_content_parts = [
         "ONLY use the available tools to answer.",
         "If you don't understand my question, use the tools to check the data. Then you might understand the context better.",
         f"WHEN you have to query the column subtitles from the table video_subtitles, make sure to only read below 5 rows.",
         f"Also for each row limit the length of the text of the column to about {sql_text_limit} characters.",
+        f"Query results are returned as CSV and capped at {SQL_TOOL_ROW_LIMIT} rows; larger results are summarized, so prefer aggregations and filters.",
         "Start with reading the available views starting with v_*. They provide the best information.",
-        f"You will only have this amount of tool iterations: {iterations_max}. So make sure to use your tool requests wisely.",
+        f"For titles, subtitles and topics of videos and for the videos of channels, use the domain tools; they take up to {TOOL_MAX_BATCH_IDS} ids per call, so pass all ids you need at once.",
     ]
+    schema_digest = load_schema_digest()
+    if schema_digest:
+        system_content_parts.append(
+            "Database schema (relation [kind, estimated rows]: column type -> referenced table.column):\n"
+            + schema_digest
+        )
+    return "\n".join(system_content_parts)
+
+
+async def _generate_completion_with_tools(prompt: str, max_iterations: int = 10) -> LLMToolsResult:
+    if not max_iterations:
+        print("No max_iterations provided, using default of 10")
+        max_iterations = 10
+        
+    print("\n********** Generating completion with tools, with max_iterations: ", max_iterations, "**********")
+    # --- Conversation starts here ---
+    response_early_exit = None
+    iterations_max = max_iterations
+    sql_text_limit = SQL_TOOL_MAX_CELL_CHARS
     
-    input_list = [
-        {
-            "role": "system",
-            "content": "\n".join(system_content_parts),
-        },
-        {
-            "role": "user",
-            "content": prompt,
-        },
-    ]
+    # Token-budgeted input list: old tool outputs are shortened and old turns dropped
+    # when it grows over CONTEXT_MAX_TOKENS
+    context = TokenBudgetContext()
+    # Byte-stable prefix first (prompt caching), per-request content after it
+    context.append({
+        "role": "system",
+        "content": build_system_prefix(sql_text_limit),
+    })
+    context.append({
+        "role": "system",
+        "content": f"You will only have this amount of tool iterations: {iterations_max}. So make sure to use your tool requests wisely.",
+    })
+    context.append({
+        "role": "user",
+        "content": prompt,
+    })
 
     # Track tool usage
     tool_usage_order = []  # exact sequence of tool names used
     tool_usage_counts = defaultdict(int)  # per-tool counter
 
     # 1) First call
-    input_list = truncate_input_list_by_chars(input_list)
-    response = client.responses.create(
-        model="gpt-5",
-        tools=tools,
-        input=input_list,
-    )
+    response = await create_tool_loop_response(context.items())
 
     # print("Initial response:")
     # print(response.model_dump_json(indent=2))
     # print("\n" + (response.output_text or ""))
 
     # Append the model's content blocks (so function_call call_ids are present next turn)
-    input_list += response.output
+    context.add_response_output(response.output)
 
     # 2) Tool-calling loop
     iterations = 0
@@ -249,102 +507,56 @@ def generate_completion_with_tools(prompt: str, max_iterations: int = 10) -> LLM
         print(f"Iteration: {iterations}")
 
         # Collect tool outputs for THIS response
-        tool_outputs_this_turn = []
-        function_call_made = False
-
-        for block in response.output:
-            if getattr(block, "type", None) == "function_call":
-                function_call_made = True
-                fn_name = block.name
-                args = json.loads(block.arguments or "{}")
-
-                print(f"**Function call made: {fn_name}")
-
-                # Track usage
-                tool_usage_order.append(fn_name)
-                tool_usage_counts[fn_name] += 1
-
-                if fn_name == "get_video_title":
-                    result = get_video_title(args["video_id"])
-                    tool_outputs_this_turn.append(
-                        {
-                            "type": "function_call_output",
-                            "call_id": block.call_id,
-                            "output": json.dumps({"title": result}),
-                        }
-                    )
-
-                elif fn_name == "get_video_subtitle":
-                    result = get_video_subtitle(args["video_id"])
-                    tool_outputs_this_turn.append(
-                        {
-                            "type": "function_call_output",
-                            "call_id": block.call_id,
-                            "output": json.dumps({"subtitle": result}),
-                        }
-                    )
-
-                elif fn_name == "get_topics_for_video":
-                    result = get_topics_for_video(args["video_id"])
-                    tool_outputs_this_turn.append(
-                        {
-                            "type": "function_call_output",
-                            "call_id": block.call_id,
-                            "output": json.dumps({"topics": result}),
-                        }
-                    )
-
-                elif fn_name == "get_videos_for_channel":
-                    result = get_videos_for_channel(args["channel_id"])
-                    tool_outputs_this_turn.append(
-                        {
-                            "type": "function_call_output",
-                            "call_id": block.call_id,
-                            "output": json.dumps({"videos": result}),
-                        }
-                    )
-
-                elif fn_name == "execute_sql_query":
-                    result = execute_sql_query(args["query"])
-                    tool_outputs_this_turn.append(
-                        {
-                            "type": "function_call_output",
-                            "call_id": block.call_id,
-                            "output": json.dumps({"result": result}),
-                        }
-                    )
+        function_calls = [
+            block for block in response.output
+            if getattr(block, "type", None) == "function_call"
+        ]
+        function_call_made = bool(function_calls)
+
+        for block in function_calls:
+            fn_name = block.name
+            print(f"**Function call made: {fn_name}")
+
+            # Track usage
+            tool_usage_order.append(fn_name)
+            tool_usage_counts[fn_name] += 1
+            emit_event({
+                "type": "tool_call_started",
+                "call_id": block.call_id,
+                "name": fn_name,
+                "arguments": block.arguments,
+            })
+
+        # Run the calls of this turn concurrently; outputs keep the order of the calls
+        tool_outputs_this_turn = await run_function_calls(function_calls)
 
         if function_call_made:
             # Provide ALL tool outputs for this turn
-            input_list += tool_outputs_this_turn
+            context.add_tool_outputs(tool_outputs_this_turn)
             
             # Warning when only 2 iterations left
             if iterations == iterations_max - 2:
-                input_list.append({
+                context.append({
                     "role": "system",
                     "content": "WARNING: You only have 2 more tool iterations remaining. Make sure to use them efficiently."
                 })
             
             if iterations == iterations_max - 1:
-                input_list.append({
+                context.append({
                     "role": "system",
                     "content": "This is your last chance to use a tool. Make the most complete and final query you can. After this, no more tool calls will be allowed and you must give me the final answer."
                 })
 
             # Ask model again with the new information
-            input_list = truncate_input_list_by_chars(input_list)
-            response = client.responses.create(
-                model="gpt-5",
-                tools=tools,
-                input=input_list,
-            )
+            print(f"🧮 Current input size: {context.total_tokens} tokens")
+            response = await create_tool_loop_response(context.items())
 
             # print("Assistant response:")
             # print(response.model_dump_json(indent=2))
             # print("\n" + (response.output_text or ""))
 
             # Append new content blocks (may include more function calls)
-            input_list += response.output
+            context.add_response_output(response.output)
         else:
             # No more tool calls → final answer is in output_text
             break
@@ -354,7 +566,7 @@ def generate_completion_with_tools(prompt: str, max_iterations: int = 10) -> LLM
 
             # Convert input_list into chat messages (only keep system/user/assistant with text content)
             chat_messages = []
-            for msg in input_list:
+            for msg in context.items():
                 # Some blocks from `response.output` may be tool calls, skip those
                 if isinstance(msg, dict) and msg.get("type") == "function_call_output":
                         # convert tool output into assistant-readable context
@@ -371,12 +583,7 @@ def generate_completion_with_tools(prompt: str, max_iterations: int = 10) -> LLM
             })
 
             # Now make a plain chat completion call
-            completion = client.chat.completions.create(
-                model="gpt-5",
-                messages=chat_messages
-            )
-
-            response_early_exit = completion.choices[0].message.content
+            response_early_exit = await create_final_completion(chat_messages)
             break
     
     print("Final output:")
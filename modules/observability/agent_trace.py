@@ -0,0 +1,191 @@
+"""
+Trace of an agent run while it is in progress. Model turns are timed from the agents
+SDK's streaming run events; tool calls are timed when they actually execute, by run
+hooks (pass tracer.hooks to Runner.run_streamed), since stream events are only
+delivered when the consumer gets to them. Every model turn and every tool call gets
+start and end timestamps (seconds since the start of the run) and is added to the
+process-wide latency histograms ("model_turn", "tool:<name>"), so it can be seen
+whether the time of a run goes to model turns or to tools such as PDF rendering and Vision.
+"""
+
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from agents import RunHooks
+
+from modules.observability.latency import observe_latency
+from modules.observability.usage import normalize_usage
+
+RESULT_PREVIEW_CHARS = 500
+
+
+def _field(item, name: str):
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def _parse_arguments(arguments):
+    if isinstance(arguments, str):
+        try:
+            return json.loads(arguments)
+        except ValueError:
+            return arguments
+    return arguments
+
+
+class AgentTraceHooks(RunHooks):
+    """Run hooks that time every tool of a run on the tracer as it executes."""
+
+    def __init__(self, tracer: "AgentRunTracer"):
+        self.tracer = tracer
+
+    async def on_tool_start(self, context, agent, tool):
+        # Function tools get a ToolContext with the id of the call
+        self.tracer.on_tool_start(tool.name, getattr(context, "tool_call_id", None))
+
+    async def on_tool_end(self, context, agent, tool, result):
+        self.tracer.on_tool_end(tool.name, getattr(context, "tool_call_id", None))
+
+
+class AgentRunTracer:
+    """
+    Run the agent with Runner.run_streamed(agent, input, hooks=tracer.hooks) and feed
+    every event of its stream_events() to on_event. on_event returns a compact
+    progress event for the ones worth showing a client.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.model_turns: List[Dict[str, Any]] = []
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.hooks = AgentTraceHooks(self)
+        self._open_turn: Optional[Dict[str, Any]] = None
+        self._open_calls: Dict[str, Dict[str, Any]] = {}
+        # Tool executions timed by the hooks, until their stream events claim them
+        self._running_tools: List[Dict[str, Any]] = []
+        self._finished_tools: List[Dict[str, Any]] = []
+
+    def _now(self) -> float:
+        return round(time.perf_counter() - self.started, 4)
+
+    @staticmethod
+    def _take(timings: List[Dict[str, Any]], tool_name: str, call_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        # Match by call id if the SDK provides one, otherwise the oldest execution of the tool
+        for index, timing in enumerate(timings):
+            if (call_id is not None and timing["id"] == call_id) or (
+                (call_id is None or timing["id"] is None) and timing["tool_name"] == tool_name
+            ):
+                return timings.pop(index)
+        return None
+
+    def on_tool_start(self, tool_name: str, call_id: Optional[str] = None):
+        """Record that a tool started executing (called by the run hooks)."""
+        self._running_tools.append({"id": call_id, "tool_name": tool_name, "started_at": self._now()})
+
+    def on_tool_end(self, tool_name: str, call_id: Optional[str] = None):
+        """Record that a tool finished executing (called by the run hooks)."""
+        timing = self._take(self._running_tools, tool_name, call_id)
+        if timing is None:
+            return
+        timing["ended_at"] = self._now()
+        timing["duration_seconds"] = round(timing["ended_at"] - timing["started_at"], 4)
+        observe_latency(f"tool:{tool_name}", timing["duration_seconds"])
+        self._finished_tools.append(timing)
+
+    def on_event(self, event) -> Optional[Dict[str, Any]]:
+        """Record a stream event; returns a progress event or None."""
+        if event.type == "raw_response_event":
+            return self._on_model_event(event.data)
+        if event.type == "run_item_stream_event":
+            if event.name == "tool_called":
+                return self._on_tool_called(event.item.raw_item)
+            if event.name == "tool_output":
+                return self._on_tool_output(event.item.raw_item, getattr(event.item, "output", None))
+            return None
+        if event.type == "agent_updated_stream_event":
+            return {"type": "agent_updated", "agent": event.new_agent.name}
+        return None
+
+    def _on_model_event(self, data) -> Optional[Dict[str, Any]]:
+        data_type = getattr(data, "type", None)
+        if data_type == "response.output_text.delta":
+            return {"type": "answer_delta", "delta": data.delta}
+        if data_type == "response.created":
+            self._open_turn = {
+                "index": len(self.model_turns) + 1,
+                "started_at": self._now(),
+                "ended_at": None,
+                "duration_seconds": None,
+            }
+            self.model_turns.append(self._open_turn)
+            return None
+        if data_type in ("response.completed", "response.incomplete", "response.failed") and self._open_turn:
+            turn, self._open_turn = self._open_turn, None
+            turn["ended_at"] = self._now()
+            turn["duration_seconds"] = round(turn["ended_at"] - turn["started_at"], 4)
+            turn["status"] = data_type.split(".")[-1]
+            turn.update(normalize_usage(getattr(data.response, "usage", None)))
+            observe_latency("model_turn", turn["duration_seconds"])
+            return {"type": "model_turn_finished", "index": turn["index"], "seconds": turn["duration_seconds"]}
+        return None
+
+    def _on_tool_called(self, raw_item) -> Dict[str, Any]:
+        call = {
+            "id": _field(raw_item, "call_id"),
+            "tool_name": _field(raw_item, "name") or "unknown",
+            "arguments": _parse_arguments(_field(raw_item, "arguments")),
+            "result": None,
+            "turn": len(self.model_turns),
+            "started_at": None,
+            "ended_at": None,
+            "duration_seconds": None,
+        }
+        self.tool_calls.append(call)
+        self._open_calls[call["id"]] = call
+        return {
+            "type": "tool_call_started",
+            "call_id": call["id"],
+            "name": call["tool_name"],
+            "arguments": _field(raw_item, "arguments"),
+        }
+
+    def _on_tool_output(self, raw_item, output) -> Optional[Dict[str, Any]]:
+        call = self._open_calls.pop(_field(raw_item, "call_id"), None)
+        if call is None:
+            return None
+        # The hooks have timed the execution by the time its output is streamed
+        timing = self._take(self._finished_tools, call["tool_name"], call["id"])
+        if timing is not None:
+            call["started_at"] = timing["started_at"]
+            call["ended_at"] = timing["ended_at"]
+            call["duration_seconds"] = timing["duration_seconds"]
+        result = output if output is not None else _field(raw_item, "output")
+        call["result"] = str(result)[:RESULT_PREVIEW_CHARS] if result is not None else None
+        return {
+            "type": "tool_call_finished",
+            "call_id": call["id"],
+            "name": call["tool_name"],
+            "seconds": call["duration_seconds"],
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Tool calls, model turns and where the time of the run went."""
+        tool_seconds: Dict[str, float] = {}
+        for call in self.tool_calls:
+            if call["duration_seconds"] is not None:
+                tool_seconds[call["tool_name"]] = round(
+                    tool_seconds.get(call["tool_name"], 0.0) + call["duration_seconds"], 4
+                )
+        return {
+            "tool_calls": self.tool_calls,
+            "tool_usage_summary": dict(Counter(call["tool_name"] for call in self.tool_calls)),
+            "model_turns": self.model_turns,
+            "timing": {
+                "run_seconds": self._now(),
+                "model_seconds": round(sum(turn["duration_seconds"] or 0.0 for turn in self.model_turns), 4),
+                "tool_seconds": tool_seconds,
+            },
+        }
@@ -0,0 +1,81 @@
+"""
+Process-wide latency histograms, e.g. per agent tool, per model turn, per rendered
+PDF page and per Vision API call, for the metrics endpoint.
+Each histogram counts samples in fixed (non-cumulative) buckets and keeps the
+most recent samples for percentiles.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict
+
+LATENCY_BUCKETS_SECONDS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RECENT_SAMPLES = 1024
+
+
+def _percentile(sorted_samples, fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+class LatencyHistogram:
+    """Bucketed latency counts plus the most recent samples of one operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_SECONDS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        index = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS_SECONDS) if seconds <= bound),
+            len(LATENCY_BUCKETS_SECONDS)
+        )
+        self.bucket_counts[index] += 1
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        labels = [f"<={bound}s" for bound in LATENCY_BUCKETS_SECONDS] + [f">{LATENCY_BUCKETS_SECONDS[-1]}s"]
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum_seconds, 3),
+            "mean_seconds": round(self.sum_seconds / self.count, 3) if self.count else 0.0,
+            "max_seconds": round(self.max_seconds, 3),
+            "p50_seconds": round(_percentile(recent, 0.5), 3),
+            "p95_seconds": round(_percentile(recent, 0.95), 3),
+            "buckets": dict(zip(labels, self.bucket_counts)),
+        }
+
+
+class LatencyHistograms:
+    """Thread-safe collection of latency histograms by name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+
+
+latency_histograms = LatencyHistograms()
+
+
+def observe_latency(name: str, seconds: float):
+    """Record the latency of one operation, e.g. "tool:read_pdf_with_vision" or "model_turn"."""
+    latency_histograms.observe(name, seconds)
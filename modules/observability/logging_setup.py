@@ -0,0 +1,116 @@
+"""
+Logging setup for the API and the upload pipeline.
+Loggers only put records on a queue (QueueHandler); a QueueListener thread does the
+formatting and the file/console I/O, so logging never blocks the event loop.
+The log file contains one JSON object per line.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Attributes every LogRecord has; anything else was passed via `extra` and is logged as a field
+_STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+DEFAULT_LOGGERS = ("api", "file_agent", "modules")
+DEFAULT_MAX_PAYLOAD_CHARS = 500
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single JSON line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def truncate(text, max_chars: int = DEFAULT_MAX_PAYLOAD_CHARS) -> str:
+    """
+    Shorten a payload (agent response, row dump) before it is logged.
+
+    Args:
+        text: Value to log, converted to str
+        max_chars: Maximum number of characters to keep
+
+    Returns:
+        The (possibly truncated) text
+    """
+    text = str(text)
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... ({len(text) - max_chars} more chars)"
+
+
+def setup_logging(
+    logs_dir: Path,
+    log_file_name: str = "api.log",
+    logger_names: Iterable[str] = DEFAULT_LOGGERS,
+    level: Optional[str] = None,
+) -> QueueListener:
+    """
+    Route the given loggers through a queue to a rotating JSON file and the console.
+    Calling it again returns the already running listener.
+
+    Args:
+        logs_dir: Directory of the log file
+        log_file_name: Name of the log file
+        logger_names: Loggers to attach the queue handler to
+        level: Log level, defaults to the LOG_LEVEL env var (INFO)
+
+    Returns:
+        The started QueueListener
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    # Create file handler with rotation (max 10MB per file, keep 5 backups)
+    file_handler = RotatingFileHandler(
+        logs_dir / log_file_name,
+        maxBytes=10 * 1024 * 1024,  # 10MB
+        backupCount=5,
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    # Console stays human readable
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    for name in logger_names:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    # Flush the queue on shutdown
+    atexit.register(_listener.stop)
+    return _listener
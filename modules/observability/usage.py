@@ -0,0 +1,198 @@
+"""
+Token and latency accounting for OpenAI calls.
+Every model call is recorded with its pipeline stage, token counts and wall time.
+Records go to the UsageTracker of the current request (a context variable, so it
+follows asyncio tasks and threads started with asyncio.to_thread) and to process-wide
+totals per endpoint and stage.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+UNSCOPED_ENDPOINT = "unscoped"
+
+_current_tracker: ContextVar[Optional["UsageTracker"]] = ContextVar("usage_tracker", default=None)
+
+
+def _empty_totals() -> Dict[str, float]:
+    return {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0,
+        "wall_time_seconds": 0.0,
+    }
+
+
+def _add(totals: Dict[str, float], record: Dict[str, Any]):
+    for key in totals:
+        totals[key] += record[key]
+
+
+def _rounded(totals: Dict[str, float]) -> Dict[str, float]:
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in totals.items()}
+
+
+def _details_value(details, name: str) -> int:
+    if details is None:
+        return 0
+    if isinstance(details, dict):
+        return details.get(name) or 0
+    return getattr(details, name, 0) or 0
+
+
+def normalize_usage(usage) -> Dict[str, int]:
+    """
+    Read token counts from the usage of a Chat Completions response, a Responses API
+    response or an agents SDK run (dict or object).
+
+    Returns:
+        Dictionary with prompt_tokens, completion_tokens and cached_tokens
+    """
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+
+    def value(name: str):
+        return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+    # Chat Completions: prompt/completion_tokens; Responses API and agents SDK: input/output_tokens
+    prompt_tokens = value("prompt_tokens") or value("input_tokens") or 0
+    completion_tokens = value("completion_tokens") or value("output_tokens") or 0
+    cached_tokens = (
+        _details_value(value("prompt_tokens_details"), "cached_tokens")
+        or _details_value(value("input_tokens_details"), "cached_tokens")
+    )
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+    }
+
+
+class UsageTracker:
+    """Collects the model calls of one request (or one pipeline run)."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started_at = time.perf_counter()
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            first_record = not self.records
+            self.records.append(record)
+        if first_record:
+            # Only requests that call a model are counted
+            usage_totals.count_request(self.endpoint)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals of the request, per stage and per model."""
+        with self._lock:
+            records = list(self.records)
+        totals = _empty_totals()
+        by_stage = defaultdict(_empty_totals)
+        by_model = defaultdict(_empty_totals)
+        for record in records:
+            _add(totals, record)
+            _add(by_stage[record["stage"]], record)
+            _add(by_model[record["model"]], record)
+        return {
+            "endpoint": self.endpoint,
+            "request_wall_time_seconds": round(time.perf_counter() - self.started_at, 3),
+            "totals": _rounded(totals),
+            "by_stage": {stage: _rounded(t) for stage, t in by_stage.items()},
+            "by_model": {model: _rounded(t) for model, t in by_model.items()},
+        }
+
+
+class UsageTotals:
+    """Process-wide usage totals per endpoint and per stage, for the metrics endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_endpoint = defaultdict(lambda: defaultdict(_empty_totals))
+        self._requests = defaultdict(int)
+        self._since = time.time()
+
+    def add(self, endpoint: str, record: Dict[str, Any]):
+        with self._lock:
+            _add(self._by_endpoint[endpoint][record["stage"]], record)
+
+    def count_request(self, endpoint: str):
+        with self._lock:
+            self._requests[endpoint] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {}
+            for endpoint, stages in self._by_endpoint.items():
+                totals = _empty_totals()
+                for stage_totals in stages.values():
+                    _add(totals, stage_totals)
+                endpoints[endpoint] = {
+                    "requests": self._requests.get(endpoint, 0),
+                    "totals": _rounded(totals),
+                    "by_stage": {stage: _rounded(t) for stage, t in stages.items()},
+                }
+            return {"since": self._since, "endpoints": endpoints}
+
+
+usage_totals = UsageTotals()
+
+
+def record_usage(stage: str, model: str, usage, wall_time_seconds: float, calls: int = 1) -> Dict[str, Any]:
+    """
+    Record one model call (or several, e.g. an agent run) for the current request.
+
+    Args:
+        stage: Pipeline stage, e.g. "vision_page", "agent" or "tool_loop"
+        model: Model name
+        usage: The response's usage object (see normalize_usage)
+        wall_time_seconds: Wall time of the call
+        calls: Number of model calls the usage covers
+
+    Returns:
+        The recorded entry
+    """
+    record = {
+        "stage": stage,
+        "model": model,
+        "calls": calls,
+        "wall_time_seconds": wall_time_seconds,
+        **normalize_usage(usage),
+    }
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.add(record)
+    usage_totals.add(tracker.endpoint if tracker else UNSCOPED_ENDPOINT, record)
+    return record
+
+
+@contextmanager
+def track_usage(endpoint: str) -> Iterator[UsageTracker]:
+    """
+    Collect the usage of all model calls made inside the block, including calls made
+    by asyncio tasks and worker threads started from it.
+    A block nested in another one reuses the outer tracker.
+    """
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        yield tracker
+        return
+    tracker = UsageTracker(endpoint)
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+def current_usage_summary() -> Optional[Dict[str, Any]]:
+    """Summary of the current request's usage, or None outside of track_usage."""
+    tracker = _current_tracker.get()
+    return tracker.summary() if tracker else None
@@ -0,0 +1,105 @@
+"""
+Testing results extraction with the file agent.
+The agent returns a TestingResultsExtraction (structured output), which is validated
+by the SDK, so no CSV has to be recovered from free text. The run is streamed only
+for its trace; callers need the complete rows before anything is written.
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.testing_results.schema import TestingResultsExtraction
+
+from agents import Runner, trace
+from agent.sdk.file_agent import file_agent, build_trace_info, print_trace_statistics, record_agent_usage
+from modules.observability.usage import track_usage
+from modules.observability.agent_trace import AgentRunTracer
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+AGENT_SDK_DIR = REPO_ROOT / "agent" / "sdk"
+INSTRUCTIONS_PATH = AGENT_SDK_DIR / "testing_results_instructions.txt"
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.webp']
+SUPPORTED_EXTENSIONS = ['.pdf', '.csv'] + IMAGE_EXTENSIONS
+
+# Same tools as the file agent, but the final answer must match TestingResultsExtraction
+testing_results_agent = file_agent.clone(
+    name="Testing Results Agent",
+    output_type=TestingResultsExtraction,
+)
+
+
+def load_instructions() -> str:
+    """Load the testing results extraction instructions for the agent."""
+    if not INSTRUCTIONS_PATH.exists():
+        raise FileNotFoundError(f"Instructions file not found: {INSTRUCTIONS_PATH}")
+    with open(INSTRUCTIONS_PATH, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def build_agent_prompt(file_path: Path, instructions: str) -> Tuple[str, str]:
+    """
+    Build the agent prompt for a testing results file.
+
+    Args:
+        file_path: Path to the uploaded file
+        instructions: The extraction instructions
+
+    Returns:
+        Tuple of (agent prompt, read command)
+    """
+    # NOTE: For PDFs, we use Vision API (read_pdf_with_vision) instead of read_pdf
+    # to handle scanned/image-based PDFs better. The read_pdf tool is kept but deactivated.
+    file_ext = file_path.suffix.lower()
+    if file_ext == '.pdf':
+        read_command = f"read_pdf_with_vision('{file_path}')"
+    elif file_ext in IMAGE_EXTENSIONS:
+        read_command = f"read_image('{file_path}')"
+    elif file_ext == '.csv':
+        read_command = f"read_csv('{file_path}')"
+    else:
+        read_command = f"read_file('{file_path}')"
+
+    agent_prompt = f"""{instructions}
+
+Now, please read the file at '{file_path}' using the {read_command} tool and extract all testing results into the rows of your structured response.
+
+IMPORTANT: You MUST extract at least one test result row. If you cannot find any test results, explain why in the notes field."""
+    return agent_prompt, read_command
+
+
+async def extract_testing_results(
+    agent_prompt: str
+) -> Tuple[List[Dict[str, Any]], Optional[str], Dict[str, Any]]:
+    """
+    Run the testing results agent.
+
+    Args:
+        agent_prompt: The prompt built by build_agent_prompt
+
+    Returns:
+        Tuple of (rows of the validated final output, notes, trace_info)
+    """
+    # Reuses the tracker of the calling request, if there is one
+    with track_usage("testing_results") as usage_tracker, trace("Testing Results Extraction") as current_trace:
+        logger.info("🔍 Testing results extraction started", extra={"trace_id": current_trace.trace_id})
+        started = time.perf_counter()
+        tracer = AgentRunTracer()
+        result = Runner.run_streamed(testing_results_agent, agent_prompt, hooks=tracer.hooks)
+        async for event in result.stream_events():
+            tracer.on_event(event)
+
+        record_agent_usage(result, testing_results_agent, started, stage="testing_results_extraction")
+        extraction: TestingResultsExtraction = result.final_output
+        rows = [row.model_dump() for row in extraction.rows]
+
+        trace_info = build_trace_info(result, tracer, current_trace)
+        trace_info["usage"] = usage_tracker.summary()
+
+    print_trace_statistics(trace_info)
+    # The final output is a model instance, keep the trace JSON serializable
+    trace_info["final_output"] = extraction.model_dump()
+    return rows, extraction.notes, trace_info
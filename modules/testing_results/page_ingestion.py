@@ -0,0 +1,194 @@
+"""
+Incremental ingestion of long PDFs.
+Instead of reading the whole document into one tool result and extracting all rows
+in a single answer, small groups of pages are extracted, validated and inserted.
+A small window of groups is extracted concurrently (Vision and the model of the next
+group overlap the current one); groups are validated and inserted in page order.
+All rows of a document share an ingestion_id; rows repeated across pages (e.g. in
+page headers) are deduplicated by the natural key on insert.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import Runner, trace
+
+from agent.sdk.file_agent import count_pdf_pages, extract_pdf_pages_with_vision, record_agent_usage
+from modules.testing_results.extraction import load_instructions, testing_results_agent
+from modules.testing_results.schema import TestingResultsExtraction
+from modules.testing_results.validation import validate_rows
+from modules.testing_results.writer import bulk_upsert_testing_results
+
+logger = logging.getLogger(__name__)
+
+PAGES_PER_CHUNK = int(os.getenv("TESTING_RESULTS_PAGES_PER_CHUNK", "2"))
+# PDFs with at least this many pages are ingested page by page
+PAGE_INGESTION_MIN_PAGES = int(os.getenv("TESTING_RESULTS_PAGE_INGESTION_MIN_PAGES", "5"))
+# Groups of pages extracted at the same time (bounds Vision/model concurrency and memory)
+MAX_CONCURRENT_CHUNKS = int(os.getenv("TESTING_RESULTS_MAX_CONCURRENT_CHUNKS", "2"))
+
+# The page content is part of the prompt, so the chunk agent needs no tools
+page_chunk_agent = testing_results_agent.clone(name="Testing Results Page Agent", tools=[])
+
+
+def should_ingest_by_pages(file_path: Path) -> bool:
+    """Whether a file is a PDF long enough for page-by-page ingestion."""
+    if file_path.suffix.lower() != '.pdf':
+        return False
+    try:
+        return count_pdf_pages(file_path) >= PAGE_INGESTION_MIN_PAGES
+    except Exception as e:
+        logger.warning(f"⚠️  Could not count pages of {file_path.name}: {str(e)}")
+        return False
+
+
+def build_chunk_prompt(instructions: str, file_name: str, first_page: int, last_page: int,
+                       total_pages: int, page_content: str) -> str:
+    """Build the extraction prompt for one group of pages (page numbers are one-based)."""
+    return f"""{instructions}
+
+Below is the content of pages {first_page}-{last_page} of {total_pages} of '{file_name}', already extracted from the page images.
+Do not call any tools. Extract all testing results on these pages into the rows of your structured response.
+If these pages contain no test results, return an empty rows list and explain why in the notes field.
+
+{page_content}"""
+
+
+async def extract_chunk(
+    file_path: Path,
+    first_page: int,
+    last_page: int,
+    total_pages: int,
+    instructions: str,
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Extract the testing results of one group of pages (zero-based, last page exclusive).
+
+    Returns:
+        Tuple of (extracted rows, page numbers the Vision API failed for)
+    """
+    page_contents, failed_pages = await extract_pdf_pages_with_vision(
+        file_path, first_page, last_page, total_pages
+    )
+    if len(failed_pages) == last_page - first_page:
+        raise RuntimeError(f"Vision API failed for page(s) {failed_pages}")
+
+    prompt = build_chunk_prompt(
+        instructions, file_path.name, first_page + 1, last_page, total_pages,
+        "\n\n".join(page_contents)
+    )
+    started = time.perf_counter()
+    result = await Runner.run(page_chunk_agent, prompt)
+    record_agent_usage(result, page_chunk_agent, started, stage="page_chunk_extraction")
+    extraction: TestingResultsExtraction = result.final_output
+    return [row.model_dump() for row in extraction.rows], failed_pages
+
+
+async def ingest_pdf_by_pages(
+    psql_client,
+    file_path: Path,
+    pages_per_chunk: int = PAGES_PER_CHUNK,
+    instructions: Optional[str] = None,
+    ingestion_id: Optional[str] = None,
+    max_concurrent_chunks: int = MAX_CONCURRENT_CHUNKS,
+) -> Dict[str, Any]:
+    """
+    Extract, validate and insert the testing results of a PDF one group of pages at a time.
+    Up to max_concurrent_chunks groups are extracted concurrently, and groups are
+    validated and inserted in page order as they finish. Each group is committed on
+    its own, so a failing group does not lose the others, and at most
+    max_concurrent_chunks groups of pages are held in memory at a time.
+
+    Args:
+        psql_client: PSQLClient connected to the database
+        file_path: Path to the PDF file
+        pages_per_chunk: Number of pages extracted together
+        instructions: The extraction instructions (see load_instructions)
+        ingestion_id: Document-level ID stored with the rows, generated if not given
+        max_concurrent_chunks: Number of groups of pages extracted at the same time
+
+    Returns:
+        Dictionary with the ingestion_id, row totals and a summary per chunk
+    """
+    instructions = instructions or load_instructions()
+    ingestion_id = ingestion_id or str(uuid.uuid4())
+    total_pages = await asyncio.to_thread(count_pdf_pages, file_path)
+
+    summary = {
+        "ingestion_id": ingestion_id,
+        "file": file_path.name,
+        "total_pages": total_pages,
+        "rows_extracted": 0,
+        "rows_inserted": 0,
+        "rows_skipped": 0,
+        "rows_invalid": 0,
+        "invalid_row_numbers": [],
+        "chunks": [],
+    }
+    logger.info(
+        f"📄 Ingesting {file_path.name} page by page ({total_pages} pages, {pages_per_chunk} per chunk)",
+        extra={"ingestion_id": ingestion_id}
+    )
+
+    page_ranges = iter(
+        (first_page, min(first_page + pages_per_chunk, total_pages))
+        for first_page in range(0, total_pages, pages_per_chunk)
+    )
+    pending = deque()
+
+    def start_next_chunk():
+        for first_page, last_page in page_ranges:
+            task = asyncio.create_task(extract_chunk(file_path, first_page, last_page, total_pages, instructions))
+            pending.append((first_page, last_page, task))
+            return
+
+    with trace("Testing Results Page Ingestion", group_id=ingestion_id):
+        for _ in range(max(1, max_concurrent_chunks)):
+            start_next_chunk()
+        try:
+            while pending:
+                # The oldest group is written first, so row numbers follow the pages
+                first_page, last_page, task = pending.popleft()
+                chunk = {"pages": [first_page + 1, last_page], "success": False, "rows_inserted": 0, "error": None}
+                summary["chunks"].append(chunk)
+                await asyncio.wait([task])
+                start_next_chunk()
+                try:
+                    rows, failed_pages = task.result()
+
+                    # Row numbers continue across chunks
+                    validated_df, invalid_rows = validate_rows(rows, first_row_number=summary["rows_extracted"] + 1)
+                    summary["rows_extracted"] += len(rows)
+                    summary["rows_invalid"] += len(invalid_rows)
+                    summary["invalid_row_numbers"].extend(r["row_number"] for r in invalid_rows)
+
+                    write_result = await asyncio.to_thread(
+                        bulk_upsert_testing_results, psql_client, validated_df, ingestion_id
+                    )
+                    chunk.update(success=True, rows_inserted=write_result["inserted"], failed_pages=failed_pages)
+                    summary["rows_inserted"] += write_result["inserted"]
+                    summary["rows_skipped"] += write_result["skipped"]
+                    logger.info(
+                        f"✅ Pages {first_page + 1}-{last_page}: {len(rows)} rows extracted, "
+                        f"{write_result['inserted']} inserted",
+                        extra={"ingestion_id": ingestion_id}
+                    )
+                except Exception as e:
+                    chunk["error"] = str(e)
+                    logger.exception(
+                        f"❌ Pages {first_page + 1}-{last_page} failed: {str(e)}",
+                        extra={"ingestion_id": ingestion_id}
+                    )
+        finally:
+            # Only left over if the ingestion itself was cancelled
+            for _, _, task in pending:
+                task.cancel()
+
+    summary["chunks_failed"] = sum(1 for chunk in summary["chunks"] if not chunk["success"])
+    return summary
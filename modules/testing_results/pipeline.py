@@ -0,0 +1,183 @@
+"""
+Testing results upload pipeline for several files at once.
+Files are extracted and validated concurrently (bounded by a semaphore shared by all
+callers), and the valid rows of all files are written with a single bulk upsert.
+Long PDFs take the page-by-page path instead (see page_ingestion.py), which inserts
+each group of pages on its own.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from modules.testing_results.extraction import build_agent_prompt, extract_testing_results, load_instructions
+from modules.testing_results.page_ingestion import ingest_pdf_by_pages, should_ingest_by_pages
+from modules.testing_results.validation import validate_rows
+from modules.testing_results.writer import bulk_upsert_testing_results_by_source
+
+logger = logging.getLogger(__name__)
+
+
+def new_file_result(file_name: str) -> Dict[str, Any]:
+    """Return the summary of a file that has not been processed yet."""
+    return {
+        "file": file_name,
+        "success": False,
+        "rows_extracted": 0,
+        "rows_inserted": 0,
+        "rows_skipped": 0,
+        "rows_invalid": 0,
+        "invalid_row_numbers": [],
+        "trace_id": None,
+        "error": None,
+    }
+
+
+async def extract_and_validate_file(
+    file_path: Path,
+    instructions: str,
+    file_name: Optional[str] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Tuple[Dict[str, Any], Optional[pd.DataFrame]]:
+    """
+    Extract and validate the testing results of one file, without writing them.
+
+    Args:
+        file_path: Path to the file
+        instructions: The extraction instructions (see load_instructions)
+        file_name: Name reported in the summary, defaults to the file name on disk
+        semaphore: Limits the number of concurrently running extractions
+
+    Returns:
+        Tuple of (file summary, DataFrame of valid rows or None)
+    """
+    result = new_file_result(file_name or file_path.name)
+    try:
+        agent_prompt, _ = build_agent_prompt(file_path, instructions)
+        if semaphore:
+            async with semaphore:
+                rows_list, agent_notes, trace_info = await extract_testing_results(agent_prompt)
+        else:
+            rows_list, agent_notes, trace_info = await extract_testing_results(agent_prompt)
+        result["rows_extracted"] = len(rows_list)
+        result["trace_id"] = trace_info.get("trace_id")
+
+        if not rows_list:
+            result["error"] = f"No data rows extracted (agent notes: {agent_notes or 'none'})"
+            return result, None
+
+        validated_df, invalid_rows = validate_rows(rows_list)
+        result["rows_invalid"] = len(invalid_rows)
+        result["invalid_row_numbers"] = [r["row_number"] for r in invalid_rows]
+
+        if validated_df.empty:
+            result["error"] = f"No valid rows found after validation ({len(invalid_rows)} rows were invalid)"
+            return result, None
+    except Exception as e:
+        logger.exception(f"❌ Error processing {result['file']}: {str(e)}")
+        result["error"] = str(e)
+        return result, None
+
+    logger.info(
+        f"✅ {result['file']}: {len(validated_df)} valid, {result['rows_invalid']} invalid rows",
+        extra={"file": result["file"], "trace_id": result["trace_id"]}
+    )
+    return result, validated_df
+
+
+async def ingest_file_by_pages(
+    psql_client,
+    file_path: Path,
+    instructions: str,
+    file_name: Optional[str] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> Dict[str, Any]:
+    """
+    Ingest a long PDF page by page (extracted, validated and inserted per group of pages).
+
+    Returns:
+        The file summary, plus the ingestion_id and the summary per page group
+    """
+    result = new_file_result(file_name or file_path.name)
+    try:
+        if semaphore:
+            async with semaphore:
+                summary = await ingest_pdf_by_pages(psql_client, file_path, instructions=instructions)
+        else:
+            summary = await ingest_pdf_by_pages(psql_client, file_path, instructions=instructions)
+    except Exception as e:
+        logger.exception(f"❌ Error processing {result['file']}: {str(e)}")
+        result["error"] = str(e)
+        return result
+
+    for key in ("rows_extracted", "rows_inserted", "rows_skipped", "rows_invalid", "invalid_row_numbers"):
+        result[key] = summary[key]
+    result["ingestion_id"] = summary["ingestion_id"]
+    result["chunks"] = summary["chunks"]
+    if summary["chunks_failed"]:
+        result["error"] = f"{summary['chunks_failed']} of {len(summary['chunks'])} page groups failed"
+    elif not summary["rows_extracted"]:
+        result["error"] = f"No data rows extracted from {summary['total_pages']} pages"
+    else:
+        result["success"] = True
+    return result
+
+
+async def process_testing_results_files(
+    psql_client,
+    file_paths: List[Path],
+    file_names: Optional[List[str]] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Extract and validate several files concurrently and insert all valid rows at once.
+    Long PDFs are ingested page by page instead. A failing file does not affect the others.
+
+    Args:
+        psql_client: PSQLClient connected to the database
+        file_paths: Files to process
+        file_names: Names reported in the summaries (e.g. the original upload names)
+        semaphore: Limits the number of concurrently running extractions
+
+    Returns:
+        One summary per file, in the order of file_paths
+    """
+    instructions = load_instructions()
+    file_names = file_names or [path.name for path in file_paths]
+
+    by_pages = await asyncio.gather(*[asyncio.to_thread(should_ingest_by_pages, path) for path in file_paths])
+
+    async def process_file(path: Path, name: str, page_by_page: bool):
+        if page_by_page:
+            return await ingest_file_by_pages(psql_client, path, instructions, name, semaphore), None
+        return await extract_and_validate_file(path, instructions, name, semaphore)
+
+    extracted = await asyncio.gather(*[
+        process_file(path, name, page_by_page)
+        for path, name, page_by_page in zip(file_paths, file_names, by_pages)
+    ])
+    results = [result for result, _ in extracted]
+
+    to_write = [(result, df) for result, df in extracted if df is not None]
+    if not to_write:
+        return results
+
+    try:
+        # One COPY and one INSERT for all files; counts are attributed per file
+        write_results = await asyncio.to_thread(
+            bulk_upsert_testing_results_by_source, psql_client, [df for _, df in to_write]
+        )
+    except Exception as e:
+        logger.exception(f"❌ Database write error: {str(e)}")
+        for result, _ in to_write:
+            result["error"] = f"Database write failed: {str(e)}"
+        return results
+
+    for (result, _), write_result in zip(to_write, write_results):
+        result["success"] = True
+        result["rows_inserted"] = write_result["inserted"]
+        result["rows_skipped"] = write_result["skipped"]
+    return results
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+
+
+class TestingResultRow(BaseModel):
+    # id is auto-generated by database, not returned by the agent
+    test_object: Optional[str] = None
+    result_value: Optional[float] = None
+    result_unit: Optional[str] = None
+    reference_value: Optional[float] = None
+    comments: Optional[str] = None
+    flag: Optional[Literal["low", "high", "normal"]] = None
+    testing_date: Optional[str] = None  # DATE format: YYYY-MM-DD
+    testing_institution: Optional[str] = None
+    testing_location: Optional[str] = None
+
+    @field_validator("flag", mode="before")
+    @classmethod
+    def normalize_flag(cls, value):
+        # " High" is "high"; an empty flag means "not available"
+        if isinstance(value, str):
+            return value.strip().lower() or None
+        return value
+
+
+class TestingResultsExtraction(BaseModel):
+    """Structured output of the testing results extraction agent."""
+    # rows comes first so it is generated (and streamed) before the notes
+    rows: List[TestingResultRow] = Field(
+        description="All test results found in the document, one entry per test result"
+    )
+    notes: Optional[str] = Field(
+        default=None,
+        description="Explanation of why no (or only some) test results could be extracted"
+    )
+
+
+TESTING_RESULT_COLUMNS = list(TestingResultRow.model_fields.keys())
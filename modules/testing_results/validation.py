@@ -0,0 +1,91 @@
+"""
+Columnar validation of extracted testing results.
+All rows are checked at once with pandas instead of coercing and validating them one by one.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+from modules.testing_results.schema import TESTING_RESULT_COLUMNS
+
+NUMERIC_COLUMNS = ["result_value", "reference_value"]
+TEXT_COLUMNS = [c for c in TESTING_RESULT_COLUMNS if c not in NUMERIC_COLUMNS]
+VALID_FLAGS = ["low", "high", "normal"]
+DATE_PATTERN = r"\d{4}-\d{2}-\d{2}"
+
+
+def _add_errors(errors: pd.Series, mask: pd.Series, messages: pd.Series):
+    """Record an error for masked rows, keeping the first error of each row."""
+    mask = mask & errors.isna()
+    errors[mask] = messages[mask]
+
+
+def validate_rows(rows: List[Dict[str, Any]], first_row_number: int = 1) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Coerce and validate extracted rows column by column.
+
+    Args:
+        rows: Extracted rows (dictionaries with TestingResultRow fields)
+        first_row_number: Row number of the first row in the error report
+
+    Returns:
+        Tuple of (DataFrame with the valid rows in TESTING_RESULT_COLUMNS order,
+        list of invalid rows as {"row_number", "error", "row_data"})
+    """
+    # Only schema columns are kept (id and reference_unit are dropped if present)
+    df = pd.DataFrame.from_records(rows, columns=TESTING_RESULT_COLUMNS)
+    df.index = pd.RangeIndex(first_row_number, first_row_number + len(df))
+    if df.empty:
+        return df, []
+
+    # Empty strings mean "not available"
+    df = df.astype(object).where(df.notna() & df.ne(""), None)
+    errors = pd.Series(None, index=df.index, dtype=object)
+
+    # Numeric fields - must be valid floats if present
+    for column in NUMERIC_COLUMNS:
+        raw = df[column]
+        numeric = pd.to_numeric(raw, errors="coerce")
+        _add_errors(
+            errors,
+            raw.notna() & numeric.isna(),
+            f"{column} must be a valid float, got: " + raw.astype(str),
+        )
+        df[column] = numeric.astype(float)
+
+    # testing_date must be a real date in YYYY-MM-DD format if present
+    raw_dates = df["testing_date"]
+    dates = raw_dates.astype("string")
+    well_formed = dates.str.fullmatch(DATE_PATTERN).fillna(False).astype(bool)
+    parsed = pd.to_datetime(dates.where(well_formed), format="%Y-%m-%d", errors="coerce")
+    _add_errors(
+        errors,
+        raw_dates.notna() & parsed.isna(),
+        "testing_date must be in YYYY-MM-DD format, got: " + raw_dates.astype(str),
+    )
+
+    # flag must be one of the allowed values if present ("High " counts as "high")
+    raw_flags = df["flag"]
+    flags = raw_flags.where(raw_flags.isna(), raw_flags.astype(str).str.strip().str.lower())
+    flags = flags.where(flags.notna() & flags.ne(""), None)
+    _add_errors(
+        errors,
+        flags.notna() & ~flags.isin(VALID_FLAGS),
+        f"flag must be one of {VALID_FLAGS}, got: " + raw_flags.astype(str),
+    )
+    df["flag"] = flags
+
+    for column in TEXT_COLUMNS:
+        df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+
+    invalid_mask = errors.notna()
+    invalid_rows = [
+        {
+            "row_number": int(row_number),
+            "error": errors[row_number],
+            "row_data": dict(rows[row_number - first_row_number]),
+        }
+        for row_number in df.index[invalid_mask]
+    ]
+    return df[~invalid_mask], invalid_rows
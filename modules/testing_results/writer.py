@@ -0,0 +1,166 @@
+"""
+Bulk, idempotent writes to public.testing_results.
+Rows are streamed with COPY into a temporary staging table and merged on a natural key,
+so retries and re-runs do not create duplicate rows.
+Requires migrations/sql/add_testing_results_natural_key.sql and
+migrations/sql/add_testing_results_ingestion_id.sql (see ensure_writer_schema).
+"""
+
+import io
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from modules.llm.openai.answer_cache import answer_cache
+from modules.llm.openai.sql_cache import sql_result_cache
+from modules.testing_results.schema import TESTING_RESULT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+TABLE = "public.testing_results"
+STAGING_TABLE = "testing_results_staging"
+
+# A test result is identified by what was measured, when, the value and where
+NATURAL_KEY_SQL = (
+    "md5(concat_ws('|', coalesce(test_object, ''), coalesce(testing_date::text, ''), "
+    "coalesce(result_value::text, ''), coalesce(result_unit, ''), coalesce(testing_institution, '')))"
+)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations" / "sql"
+REQUIRED_MIGRATIONS = ("add_testing_results_natural_key.sql", "add_testing_results_ingestion_id.sql")
+
+
+def ensure_writer_schema(psql_client):
+    """
+    Apply the migrations the writer depends on (the unique natural key index for
+    ON CONFLICT and the ingestion_id column). They are idempotent, so this is safe
+    to run on every startup.
+
+    Raises:
+        RuntimeError: A migration could not be applied
+    """
+    for migration_name in REQUIRED_MIGRATIONS:
+        migration_sql = (MIGRATIONS_DIR / migration_name).read_text()
+        statements = [statement.strip() for statement in migration_sql.split(";") if statement.strip()]
+        try:
+            for statement in statements:
+                try:
+                    psql_client.execute_query(statement)
+                except Exception as e:
+                    if "already exists" not in str(e).lower():
+                        raise
+        except Exception as e:
+            raise RuntimeError(
+                f"Could not apply migrations/sql/{migration_name} to testing_results: {e}. "
+                "Testing results cannot be written until it is applied."
+            ) from e
+        logger.info(f"Migration applied: {migration_name}")
+
+
+def bulk_upsert_testing_results(
+    psql_client,
+    df: pd.DataFrame,
+    ingestion_id: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Insert validated testing results, skipping rows that already exist.
+
+    Args:
+        psql_client: PSQLClient connected to the database
+        df: Validated rows with TESTING_RESULT_COLUMNS
+        ingestion_id: Document-level ID stored with the inserted rows
+
+    Returns:
+        Dictionary with the number of "inserted" and "skipped" (already existing) rows
+    """
+    return bulk_upsert_testing_results_by_source(psql_client, [df], ingestion_id)[0]
+
+
+def bulk_upsert_testing_results_by_source(
+    psql_client,
+    frames: List[pd.DataFrame],
+    ingestion_id: Optional[str] = None
+) -> List[Dict[str, int]]:
+    """
+    Insert validated testing results of several sources (e.g. uploaded files) in one
+    COPY and one INSERT, and count inserted/skipped rows per source.
+    A row that occurs in several sources is attributed to the first one.
+
+    Args:
+        psql_client: PSQLClient connected to the database
+        frames: Validated rows with TESTING_RESULT_COLUMNS, one DataFrame per source
+        ingestion_id: Document-level ID stored with the inserted rows
+
+    Returns:
+        One dictionary with the number of "inserted" and "skipped" rows per source, in order
+    """
+    total_rows = sum(len(df) for df in frames)
+    if total_rows == 0:
+        return [{"inserted": 0, "skipped": 0} for _ in frames]
+
+    columns = ", ".join(TESTING_RESULT_COLUMNS)
+    buffer = io.StringIO()
+    # Missing values are written as unquoted empty fields, which COPY reads as NULL
+    for source_index, df in enumerate(frames):
+        if df.empty:
+            continue
+        df[TESTING_RESULT_COLUMNS].assign(source_index=source_index).to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    connection = psql_client.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # Same column types as the target table, dropped at the end of the transaction
+        cursor.execute(
+            f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {TABLE} WITH NO DATA"
+        )
+        cursor.execute(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN source_index integer")
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({columns}, source_index) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        cursor.execute(
+            f"""
+            WITH keyed AS (
+                SELECT DISTINCT ON (natural_key) *
+                FROM (SELECT {columns}, source_index, {NATURAL_KEY_SQL} AS natural_key FROM {STAGING_TABLE}) s
+                ORDER BY natural_key, source_index
+            ), inserted AS (
+                INSERT INTO {TABLE} ({columns}, natural_key, ingestion_id)
+                SELECT {columns}, natural_key, %(ingestion_id)s::uuid FROM keyed
+                ON CONFLICT (natural_key) DO NOTHING
+                RETURNING natural_key
+            )
+            SELECT keyed.source_index, COUNT(*)
+            FROM keyed JOIN inserted USING (natural_key)
+            GROUP BY keyed.source_index
+            """,
+            {"ingestion_id": ingestion_id}
+        )
+        inserted_by_source = dict(cursor.fetchall())
+        cursor.close()
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    if sum(inserted_by_source.values()):
+        # Cached tool loop queries and /ask answers over testing_results (and views) are stale now
+        sql_result_cache.invalidate_tables([TABLE])
+        answer_cache.invalidate_tables([TABLE])
+
+    results = []
+    for source_index, df in enumerate(frames):
+        inserted = inserted_by_source.get(source_index, 0)
+        results.append({"inserted": inserted, "skipped": len(df) - inserted})
+
+    total_inserted = sum(r["inserted"] for r in results)
+    logger.info(
+        f"Upserted {total_rows} rows from {len(frames)} source(s) into {TABLE}: "
+        f"{total_inserted} inserted, {total_rows - total_inserted} skipped"
+    )
+    return results
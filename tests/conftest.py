@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add the repository root to path for imports (modules/ is not an installed package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+import pytest
+
+from modules.llm.openai.answer_cache import AnswerCache, normalize_prompt
+
+PROMPT = "For the channel id: ByronHerbalist give me all video titles about the topic: detox"
+
+
+@pytest.fixture
+def cache():
+    cache = AnswerCache(ttl_seconds=60, max_entries=10, similarity_threshold=0.9)
+    cache.put(PROMPT, None, "detox answer", tables=["videos"])
+    return cache
+
+
+def test_exact_hit_ignores_case_whitespace_and_trailing_punctuation(cache):
+    assert cache.get("  for the CHANNEL id: ByronHerbalist give me all video titles about the topic: detox?") == "detox answer"
+    assert cache.exact_hits == 1
+    assert normalize_prompt("What is  this?!") == "what is this"
+
+
+def test_filler_words_may_differ(cache):
+    assert cache.get("For channel id ByronHerbalist show all the video titles on topic detox") == "detox answer"
+    assert cache.similar_hits == 1
+
+
+@pytest.mark.parametrize("prompt", [
+    PROMPT.replace("detox", "sleep"),
+    PROMPT.replace("ByronHerbalist", "DoctorOz"),
+    PROMPT.replace("about the topic", "not about the topic"),
+    PROMPT + " before 2023",
+    PROMPT.replace("give me all video titles", "how many video titles are"),
+])
+def test_changed_content_is_a_miss(cache, prompt):
+    assert cache.get(prompt) is None
+    assert cache.misses == 1
+
+
+def test_entity_swap_in_a_larger_cache_is_a_miss():
+    cache = AnswerCache(similarity_threshold=0.5)
+    for topic in ["detox", "sleep", "fasting", "liver", "stress"]:
+        cache.put(PROMPT.replace("detox", topic), None, f"{topic} answer")
+    assert cache.get(PROMPT.replace("detox", "immunity")) is None
+    assert cache.get(PROMPT.replace("ByronHerbalist", "DoctorOz")) is None
+
+
+def test_preferences_are_part_of_the_key(cache):
+    assert cache.get(PROMPT, {"language": "de"}) is None
+    cache.put(PROMPT, {"language": "de"}, "german answer")
+    assert cache.get(PROMPT, {"language": "de"}) == "german answer"
+    assert cache.get(PROMPT) == "detox answer"
+
+
+def test_similarity_lookup_can_be_disabled():
+    cache = AnswerCache(similarity_threshold=1.1)
+    cache.put(PROMPT, None, "detox answer")
+    assert cache.get("For channel id ByronHerbalist show all the video titles on topic detox") is None
+
+
+def test_writes_invalidate_answers_of_their_tables(cache):
+    cache.put("How many testing results are there", None, "42", tables=["public.testing_results"])
+    cache.put("Which topics exist", None, "topics", tables=["v_video_topic"])
+    assert cache.invalidate_tables(["testing_results"]) == 2
+    assert cache.get("How many testing results are there") is None
+    assert cache.get("Which topics exist") is None
+    assert cache.get(PROMPT) == "detox answer"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2, similarity_threshold=1.1)
+    cache.put("first question", None, 1)
+    cache.put("second question", None, 2)
+    cache.get("first question")
+    cache.put("third question", None, 3)
+    assert cache.get("second question") is None
+    assert cache.get("first question") == 1
+
+
+def test_expired_entries_are_not_returned(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("modules.llm.openai.answer_cache.time.monotonic", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=10)
+    cache.put(PROMPT, None, "detox answer")
+    now[0] += 11
+    assert cache.get(PROMPT) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,56 @@
+from modules.llm.openai.context import TokenBudgetContext, count_tokens
+
+
+def call(call_id):
+    return {"type": "function_call", "call_id": call_id, "name": "execute_sql_query", "arguments": "{}"}
+
+
+def output(call_id, text):
+    return {"type": "function_call_output", "call_id": call_id, "output": text}
+
+
+def add_turn(context, call_id, text):
+    context.add_response_output([call(call_id)])
+    context.add_tool_outputs([output(call_id, text)])
+
+
+def call_ids(context, item_type):
+    return [item["call_id"] for item in context.items() if item.get("type") == item_type]
+
+
+def test_running_total_matches_items():
+    context = TokenBudgetContext(max_tokens=10_000)
+    context.append({"role": "user", "content": "hello"})
+    add_turn(context, "a", "some rows")
+    assert context.total_tokens == count_tokens("hello") + count_tokens("execute_sql_query({})") + count_tokens("some rows")
+    assert len(context.items()) == 3
+
+
+def test_old_outputs_are_shortened_before_turns_are_dropped():
+    big = "word " * 2000
+    context = TokenBudgetContext(max_tokens=count_tokens(big) + 500)
+    context.append({"role": "user", "content": "question"})
+    add_turn(context, "a", big)
+    add_turn(context, "b", big)
+
+    assert call_ids(context, "function_call") == ["a", "b"]
+    first, latest = [item["output"] for item in context.items() if item.get("type") == "function_call_output"]
+    assert first.startswith("[Older tool output shortened to save context")
+    assert latest == big
+    assert context.total_tokens <= context.max_tokens
+
+
+def test_turns_are_dropped_whole_and_never_the_latest_or_messages():
+    text = "word " * 200
+    context = TokenBudgetContext(max_tokens=count_tokens(text) + 60)
+    context.append({"role": "user", "content": "question"})
+    for call_id in "abc":
+        add_turn(context, call_id, text)
+
+    # Every remaining function_call still has its output
+    assert call_ids(context, "function_call") == call_ids(context, "function_call_output") == ["c"]
+    assert context.items()[0] == {"role": "user", "content": "question"}
+    assert context.total_tokens == sum(
+        count_tokens(item.get("content") or item.get("output") or "execute_sql_query({})")
+        for item in context.items()
+    )
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+llm_processor = pytest.importorskip("modules.llm.llm_processor")
+CompiledTemplate = llm_processor.CompiledTemplate
+LLMProcessor = llm_processor.LLMProcessor
+
+
+def test_render_injects_values_and_keeps_unknown_placeholders():
+    template = CompiledTemplate("Title: ** title **\nTopic: ** topic **\n")
+    assert template.keys == {"title", "topic"}
+    assert template.render({"title": "Detox"}) == "Title: Detox\nTopic: ** topic **\n"
+
+
+def test_render_converts_values_with_str():
+    template = CompiledTemplate("** count ** videos, ** ratio **, ** ids **")
+    assert template.render({"count": 3, "ratio": 0.5, "ids": ["a", "b"]}) == "3 videos, 0.5, ['a', 'b']"
+
+
+def test_placeholders_inside_injected_values_are_not_expanded():
+    template = CompiledTemplate("Subtitles: ** subtitles **\nTopic: ** topic **")
+    rendered = template.render({"subtitles": "say ** topic ** twice", "topic": "sleep"})
+    assert rendered == "Subtitles: say ** topic ** twice\nTopic: sleep"
+
+
+def test_load_template_recompiles_changed_files(tmp_path):
+    path = tmp_path / "prompt.txt"
+    path.write_text("Hello ** name **")
+    first = llm_processor.load_template(str(path))
+    assert llm_processor.load_template(str(path)) is first
+
+    path.write_text("Bye ** name **")
+    os.utime(path, (os.path.getmtime(path) + 1,) * 2)
+    assert llm_processor.load_template(str(path)).render({"name": "Ana"}) == "Bye Ana"
+
+
+@pytest.mark.parametrize("response, return_format, expected", [
+    ('```json\n{"a": 1}\n```', "json", '{"a": 1}'),
+    ("not json", "json", None),
+    ("", "text", None),
+    ("plain answer", "text", "plain answer"),
+])
+def test_only_usable_answers_are_memoized(response, return_format, expected):
+    processor = LLMProcessor.__new__(LLMProcessor)
+    assert processor._memoizable_answer(response, return_format) == expected
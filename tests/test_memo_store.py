@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from modules.llm.memo_store import LLMMemoStore, memo_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LLMMemoStore(tmp_path / "memo" / "llm_memo.sqlite", ttl_seconds=60, max_entries=2)
+    yield store
+    store.close()
+
+
+def test_memo_key_covers_template_values_model_and_format():
+    key = memo_key("Summarize ** text **", {"text": "a"}, "gpt-4o", "json")
+    assert key == memo_key("Summarize ** text **", {"text": "a"}, "gpt-4o", "json")
+    assert key != memo_key("Summarize ** text ** briefly", {"text": "a"}, "gpt-4o", "json")
+    assert key != memo_key("Summarize ** text **", {"text": "b"}, "gpt-4o", "json")
+    assert key != memo_key("Summarize ** text **", {"text": "a"}, "gpt-4o-mini", "json")
+    assert key != memo_key("Summarize ** text **", {"text": "a"}, "gpt-4o", "text")
+
+
+def test_put_get_and_persistent_stats(store, tmp_path):
+    assert store.get("a") is None
+    store.put("a", "answer", model="gpt-4o")
+    assert store.get("a") == "answer"
+    store.close()
+
+    reopened = LLMMemoStore(tmp_path / "memo" / "llm_memo.sqlite")
+    assert reopened.get("a") == "answer"
+    stats = reopened.stats()
+    reopened.close()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+
+
+def test_expired_answers_are_not_returned(store, monkeypatch):
+    store.put("a", "answer")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert store.get("a") is None
+    store.put("b", "answer")
+    assert store.stats()["entries"] == 1
+
+
+def test_least_recently_used_answers_are_evicted(store, monkeypatch):
+    now = time.time()
+    for offset, key in enumerate(["a", "b"]):
+        monkeypatch.setattr(time, "time", lambda offset=offset: now + offset)
+        store.put(key, key)
+    monkeypatch.setattr(time, "time", lambda: now + 2)
+    store.get("a")
+    monkeypatch.setattr(time, "time", lambda: now + 3)
+    store.put("c", "c")
+    assert store.get("b") is None
+    assert store.get("a") == "a"
+    assert store.get("c") == "c"
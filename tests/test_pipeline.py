@@ -0,0 +1,65 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+pipeline = pytest.importorskip("modules.testing_results.pipeline")
+
+ROW = {"test_object": "Vitamin D", "result_value": 42.0, "result_unit": "ng/ml", "flag": "normal"}
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    calls = {"extracted": [], "paged": [], "written": []}
+
+    async def extract_testing_results(agent_prompt):
+        calls["extracted"].append(agent_prompt)
+        return [dict(ROW)], None, {"trace_id": "trace"}
+
+    async def ingest_pdf_by_pages(psql_client, file_path, instructions=None):
+        calls["paged"].append(file_path.name)
+        return {
+            "ingestion_id": "ingestion", "total_pages": 12, "rows_extracted": 3, "rows_inserted": 3,
+            "rows_skipped": 0, "rows_invalid": 0, "invalid_row_numbers": [], "chunks": [{}] * 6,
+            "chunks_failed": 0,
+        }
+
+    def bulk_upsert_testing_results_by_source(psql_client, frames):
+        calls["written"].append(len(frames))
+        return [{"inserted": len(df), "skipped": 0} for df in frames]
+
+    monkeypatch.setattr(pipeline, "load_instructions", lambda: "instructions")
+    monkeypatch.setattr(pipeline, "extract_testing_results", extract_testing_results)
+    monkeypatch.setattr(pipeline, "ingest_pdf_by_pages", ingest_pdf_by_pages)
+    monkeypatch.setattr(pipeline, "should_ingest_by_pages", lambda path: path.name.startswith("long"))
+    monkeypatch.setattr(pipeline, "bulk_upsert_testing_results_by_source", bulk_upsert_testing_results_by_source)
+    return calls
+
+
+def test_long_pdfs_are_ingested_page_by_page(fake_pipeline):
+    paths = [Path("short.csv"), Path("long.pdf"), Path("photo.png")]
+    results = asyncio.run(pipeline.process_testing_results_files(None, paths, ["a.csv", "b.pdf", "c.png"]))
+
+    assert [result["file"] for result in results] == ["a.csv", "b.pdf", "c.png"]
+    assert all(result["success"] for result in results)
+    assert fake_pipeline["paged"] == ["long.pdf"]
+    assert len(fake_pipeline["extracted"]) == 2
+    # The other files share one bulk write
+    assert fake_pipeline["written"] == [2]
+    assert results[1]["ingestion_id"] == "ingestion"
+    assert results[1]["rows_inserted"] == 3
+
+
+def test_failed_page_groups_fail_the_file(fake_pipeline, monkeypatch):
+    async def ingest_pdf_by_pages(psql_client, file_path, instructions=None):
+        return {
+            "ingestion_id": "ingestion", "total_pages": 4, "rows_extracted": 1, "rows_inserted": 1,
+            "rows_skipped": 0, "rows_invalid": 0, "invalid_row_numbers": [], "chunks": [{}, {}],
+            "chunks_failed": 1,
+        }
+
+    monkeypatch.setattr(pipeline, "ingest_pdf_by_pages", ingest_pdf_by_pages)
+    [result] = asyncio.run(pipeline.process_testing_results_files(None, [Path("long.pdf")]))
+    assert not result["success"]
+    assert result["error"] == "1 of 2 page groups failed"
+    assert fake_pipeline["written"] == []
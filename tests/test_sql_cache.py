@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from modules.llm.openai.sql_cache import (
+    SQLResultCache,
+    cache_key,
+    collect_read_tables,
+    is_cacheable,
+    normalize_sql,
+    note_read_query,
+    referenced_tables,
+)
+
+RESULT = pd.DataFrame({"title": ["a"]})
+
+
+def test_normalize_sql_folds_whitespace_and_case_outside_quotes():
+    query = "SELECT  Title\n FROM \"Videos\" WHERE name = 'Detox  Tea';"
+    assert normalize_sql(query) == "select title from \"Videos\" where name = 'Detox  Tea'"
+
+
+def test_referenced_tables_ignores_schema_and_literals():
+    query = normalize_sql("select * from public.videos v join \"v_video_topic\" t on 1=1 where x = 'from fake'")
+    assert referenced_tables(query) == {"videos", "v_video_topic"}
+
+
+def test_only_deterministic_selects_are_cacheable():
+    assert is_cacheable(normalize_sql("WITH t AS (SELECT 1) SELECT * FROM t"))
+    assert not is_cacheable(normalize_sql("UPDATE videos SET title = 'x'"))
+    assert not is_cacheable(normalize_sql("SELECT * FROM videos WHERE created < now()"))
+    assert is_cacheable(normalize_sql("SELECT * FROM videos WHERE title = 'now()'"))
+
+
+def test_hit_on_normalized_query():
+    cache = SQLResultCache()
+    assert cache.put("SELECT title FROM videos", RESULT)
+    assert cache.get("select   title\nfrom videos;") is RESULT
+    assert cache.stats()["hits"] == 1
+
+
+def test_bound_parameters_are_part_of_the_key():
+    cache = SQLResultCache()
+    query = "SELECT title FROM videos WHERE video_id IN :ids"
+    cache.put(query, RESULT, {"ids": ["a"]})
+    assert cache.get(query, {"ids": ["b"]}) is None
+    assert cache.get(query, {"ids": ["a"]}) is RESULT
+    assert cache_key(query) != cache_key(query, {"ids": ["a"]})
+
+
+def test_write_queries_are_not_cached():
+    cache = SQLResultCache()
+    assert not cache.put("DELETE FROM videos", RESULT)
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    cache = SQLResultCache(ttl_seconds=10)
+    cache.put("SELECT 1 FROM videos", RESULT)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get("SELECT 1 FROM videos") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SQLResultCache(max_entries=2)
+    cache.put("SELECT 1 FROM a", RESULT)
+    cache.put("SELECT 1 FROM b", RESULT)
+    cache.get("SELECT 1 FROM a")
+    cache.put("SELECT 1 FROM c", RESULT)
+    assert cache.get("SELECT 1 FROM b") is None
+    assert cache.get("SELECT 1 FROM a") is RESULT
+
+
+def test_invalidate_tables_drops_readers_and_views():
+    cache = SQLResultCache()
+    cache.put("SELECT 1 FROM testing_results", RESULT)
+    cache.put("SELECT 1 FROM videos", RESULT)
+    cache.put("SELECT 1 FROM v_video_topic", RESULT)
+    cache.put("SELECT 1", RESULT)
+    assert cache.invalidate_tables(["public.testing_results"]) == 3
+    assert cache.get("SELECT 1 FROM videos") is RESULT
+
+
+def test_collect_read_tables_includes_tasks_started_in_the_block():
+    async def read(query):
+        note_read_query(query)
+
+    async def main():
+        with collect_read_tables() as tables:
+            await asyncio.gather(read("SELECT * FROM videos"), read("SELECT * FROM channels"))
+        note_read_query("SELECT * FROM outside")
+        return tables
+
+    assert asyncio.run(main()) == {"videos", "channels"}
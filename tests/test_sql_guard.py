@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from modules.llm.openai.sql_guard import GuardedQueryError, check_statement, run_guarded_query
+
+
+class FakeResult:
+    def __init__(self, rows=None, columns=None, scalar=None):
+        self.rows = rows or []
+        self.columns = columns or []
+        self._scalar = scalar
+
+    def scalar(self):
+        return self._scalar
+
+    def fetchmany(self, size):
+        return self.rows[:size]
+
+    def keys(self):
+        return self.columns
+
+
+class FakeConnection:
+    """Mimics psycopg2 behind SQLAlchemy: a '%' in SQL sent with a parameter set fails."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    def exec_driver_sql(self, query, parameters=None, execution_options=None):
+        self.engine.statements.append(query)
+        if "%" in query and not (execution_options or {}).get("no_parameters"):
+            raise TypeError("immutabledict is not a sequence")
+        if self.engine.error is not None and not query.startswith(("SET", "EXPLAIN")):
+            raise self.engine.error
+        if query.startswith("EXPLAIN"):
+            return FakeResult(scalar=[{"Plan": {"Total Cost": self.engine.cost}}])
+        if query.startswith("SET"):
+            return FakeResult()
+        return FakeResult(rows=self.engine.rows, columns=["video_id", "title"])
+
+
+class FakeEngine:
+    def __init__(self, rows=(), cost=10.0, error=None):
+        self.rows = list(rows)
+        self.cost = cost
+        self.error = error
+        self.statements = []
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+def test_percent_literal_is_not_read_as_a_placeholder():
+    engine = FakeEngine(rows=[("vid1", "Detox tea"), ("vid2", "Liver detox")])
+    df = run_guarded_query(engine, "SELECT video_id, title FROM videos WHERE title ILIKE '%detox%'")
+    assert df["video_id"].tolist() == ["vid1", "vid2"]
+    assert any(statement.startswith("EXPLAIN") and "%detox%" in statement for statement in engine.statements)
+
+
+def test_rows_are_capped_at_max_rows_plus_one():
+    engine = FakeEngine(rows=[(f"vid{index}", "title") for index in range(10)])
+    assert len(run_guarded_query(engine, "SELECT video_id, title FROM videos", max_rows=3)) == 4
+
+
+def test_cost_over_budget_is_rejected():
+    engine = FakeEngine(cost=5e6)
+    with pytest.raises(GuardedQueryError, match="exceeds the budget"):
+        run_guarded_query(engine, "SELECT * FROM videos", max_cost=1000)
+    assert not any(statement == "SELECT * FROM videos" for statement in engine.statements)
+
+
+def test_non_dbapi_errors_become_guarded_query_errors():
+    engine = FakeEngine(error=TypeError("bad parameter"))
+    with pytest.raises(GuardedQueryError, match="Query failed: bad parameter"):
+        run_guarded_query(engine, "SELECT video_id FROM videos")
+
+
+@pytest.mark.parametrize("query, message", [
+    ("DELETE FROM videos", "Only read-only SELECT"),
+    ("SELECT 1; DROP TABLE videos", "exactly one statement"),
+    ("WITH d AS (DELETE FROM videos RETURNING *) SELECT * FROM d", "'DELETE' is not allowed"),
+])
+def test_check_statement_rejects_writes(query, message):
+    with pytest.raises(GuardedQueryError, match=message):
+        check_statement(query)
+
+
+def test_check_statement_allows_keywords_inside_literals():
+    check_statement("SELECT title FROM videos WHERE title ILIKE '%drop; delete%'")
+
+
+@pytest.mark.skipif(not os.getenv("TEST_PSQL_CONNECTION_STRING"), reason="needs TEST_PSQL_CONNECTION_STRING")
+def test_like_query_against_postgres():
+    from sqlalchemy import create_engine
+
+    engine = create_engine(os.environ["TEST_PSQL_CONNECTION_STRING"])
+    df = run_guarded_query(engine, "SELECT 'Liver detox' AS title WHERE 'Liver detox' ILIKE '%detox%'")
+    assert df["title"].tolist() == ["Liver detox"]
+    df = run_guarded_query(engine, "SELECT x FROM unnest(ARRAY[1, 2, 3]) AS x WHERE x IN :ids", {"ids": [1, 3]})
+    assert df["x"].tolist() == [1, 3]
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from modules.llm.openai.sql_output import format_result, limit_query
+
+
+def test_limit_query_wraps_selects_with_one_extra_row():
+    assert limit_query("SELECT * FROM videos;", max_rows=10) == (
+        "SELECT * FROM (\nSELECT * FROM videos\n) AS limited_result LIMIT 11"
+    )
+
+
+def test_limit_query_keeps_small_limits_and_non_selects():
+    assert limit_query("select * from videos limit 5 offset 10", max_rows=10) == "select * from videos limit 5 offset 10"
+    assert limit_query("SELECT * FROM videos LIMIT 50", max_rows=10).endswith("LIMIT 11")
+    assert limit_query("EXPLAIN SELECT 1", max_rows=10) == "EXPLAIN SELECT 1"
+
+
+def test_empty_result():
+    assert format_result(pd.DataFrame()) == "0 rows"
+    assert format_result(None) == "0 rows"
+
+
+def test_small_results_are_listed_as_csv_with_truncated_cells():
+    df = pd.DataFrame({"video_id": ["a", "b"], "subtitles": ["x" * 30, "short"]})
+    output = format_result(df, inline_rows=5)
+    assert output.startswith("2 rows (CSV):\nvideo_id,subtitles\n")
+    assert "short" in output
+    assert len(format_result(df.assign(subtitles="y" * 3000))) < 3 * 2100
+
+
+def test_large_results_are_summarized():
+    df = pd.DataFrame({"n": range(20), "topic": ["detox"] * 20})
+    output = format_result(df, max_rows=10, inline_rows=5)
+    assert output.startswith("at least 10 rows, 2 columns.")
+    assert "- n: int64; 0 null; 10 distinct; min 0, max 9" in output
+    assert "top: detox (10)" in output
+    assert "Sample rows:" in output
+
+
+def test_output_is_capped():
+    df = pd.DataFrame({f"column_{i}": ["value"] * 100 for i in range(50)})
+    output = format_result(df, max_rows=100, inline_rows=5, max_chars=500)
+    assert len(output) == 500 + len("...[output truncated]")
@@ -0,0 +1,52 @@
+import math
+
+from modules.testing_results.schema import TESTING_RESULT_COLUMNS
+from modules.testing_results.validation import validate_rows
+
+
+def row(**fields):
+    return {"test_object": "Glucose", "result_value": "5.4", "result_unit": "mmol/L", **fields}
+
+
+def test_valid_rows_are_coerced():
+    valid, invalid = validate_rows([row(flag=" High ", testing_date="2024-02-29", reference_value="", id=7)])
+    assert invalid == []
+    assert list(valid.columns) == TESTING_RESULT_COLUMNS
+    record = valid.iloc[0]
+    assert record["result_value"] == 5.4
+    assert math.isnan(record["reference_value"])
+    assert record["flag"] == "high"
+    assert record["testing_date"] == "2024-02-29"
+
+
+def test_row_numbers_are_one_based():
+    rows = [row(), row(result_value="n/a"), row(), row(flag="elevated")]
+    valid, invalid = validate_rows(rows)
+    assert len(valid) == 2
+    assert [item["row_number"] for item in invalid] == [2, 4]
+    assert invalid[0]["error"] == "result_value must be a valid float, got: n/a"
+    assert invalid[0]["row_data"] == rows[1]
+    assert invalid[1]["error"] == "flag must be one of ['low', 'high', 'normal'], got: elevated"
+
+
+def test_row_numbers_continue_from_first_row_number():
+    _, invalid = validate_rows([row(), row(testing_date="2024-02-30")], first_row_number=11)
+    assert invalid[0]["row_number"] == 12
+
+
+def test_dates_must_be_real_iso_dates():
+    dates = ["2024-13-01", "2024-02-30", "01.02.2024", "2024-1-01"]
+    _, invalid = validate_rows([row(testing_date=date) for date in dates])
+    assert [item["error"] for item in invalid] == [
+        f"testing_date must be in YYYY-MM-DD format, got: {date}" for date in dates
+    ]
+
+
+def test_first_error_of_a_row_is_reported():
+    _, invalid = validate_rows([row(result_value="x", reference_value="y", flag="bad")])
+    assert invalid[0]["error"] == "result_value must be a valid float, got: x"
+
+
+def test_empty_input():
+    valid, invalid = validate_rows([])
+    assert valid.empty and invalid == []